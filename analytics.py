@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from storage import function_missing
+
+ANALYTICS_RPC = 'user_task_analytics'
+COUNT_FIELDS = ('total_tasks', 'completed_tasks', 'pending_tasks', 'overdue_tasks',
+                'career_advice_sessions', 'learning_roadmaps')
+
+
+def parse_due(due_date, due_time=None):
+    """Combine a task's due_date and due_time into a naive datetime; None when unparseable"""
+    if not due_date:
+        return None
+    try:
+        due = datetime.fromisoformat(str(due_date).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if due.tzinfo is not None:
+        due = due.astimezone().replace(tzinfo=None)
+    if len(str(due_date)) <= 10:
+        # Date-only values take the task's due_time, defaulting to end of day like create_task does
+        try:
+            hours, minutes = str(due_time or '23:59').split(':')[:2]
+            due = due.replace(hour=int(hours), minute=int(minutes))
+        except ValueError:
+            due = due.replace(hour=23, minute=59)
+    return due
+
+
+def summarize_tasks(rows, now):
+    """Count total/completed/pending/overdue in a single pass over (status, due_date, due_time) rows"""
+    total = completed = pending = overdue = 0
+    for row in rows:
+        total += 1
+        status = row.get('status')
+        if status == 'completed':
+            completed += 1
+        elif status == 'pending':
+            pending += 1
+            due = parse_due(row.get('due_date'), row.get('due_time'))
+            if due is not None and due < now:
+                overdue += 1
+    return {'total_tasks': total, 'completed_tasks': completed, 'pending_tasks': pending, 'overdue_tasks': overdue}
+
+
+def with_productivity(counts):
+    total = counts['total_tasks']
+    counts['productivity_score'] = round((counts['completed_tasks'] / total * 100) if total > 0 else 0)
+    return counts
+
+
+class AnalyticsEngine:
+    """Computes the dashboard analytics with as little data transfer as possible.
+
+    The preferred path is the `user_task_analytics` database function
+    (sql/user_task_analytics.sql), which returns every count in one round
+    trip. When it is not installed the engine remembers that for
+    `rpc_retry_seconds` and falls back to one narrow projection of the
+    user's tasks plus count-only queries for the history tables; any other
+    failed call falls back for that request alone.
+    """
+
+    def __init__(self, rpc_retry_seconds=300):
+        self.rpc_retry_seconds = rpc_retry_seconds
+        self._rpc_unavailable_until = 0.0
+
+    def compute(self, client, user_id, now=None):
+        now = now or datetime.now()
+        if time.monotonic() >= self._rpc_unavailable_until:
+            try:
+                return self._compute_rpc(client, user_id, now)
+            except Exception as e:
+                # A transient failure falls back for this request only; the next one tries the function again
+                if function_missing(e):
+                    self._rpc_unavailable_until = time.monotonic() + self.rpc_retry_seconds
+                else:
+                    print(f"Analytics RPC failed, computing from the tables: {e}")
+        return self._compute_scan(client, user_id, now)
+
+    def _compute_rpc(self, client, user_id, now):
+        response = client.rpc(ANALYTICS_RPC, {'p_user_id': user_id, 'p_now': now.isoformat()}).execute()
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        return with_productivity({field: int(row.get(field) or 0) for field in COUNT_FIELDS})
+
+    def _compute_scan(self, client, user_id, now):
+        tasks = client.table('tasks').select("status, due_date, due_time").eq('user_id', user_id).execute()
+        counts = summarize_tasks(tasks.data, now)
+        counts['career_advice_sessions'] = self._count(client, 'career_advice', user_id)
+        counts['learning_roadmaps'] = self._count(client, 'learning_roadmaps', user_id)
+        return with_productivity(counts)
+
+    @staticmethod
+    def _count(client, table, user_id):
+        response = client.table(table).select("id", count='exact', head=True).eq('user_id', user_id).execute()
+        return response.count or 0
+
+
+class _UserSummary:
+    __slots__ = ('tasks', 'total', 'completed', 'pending', 'advice', 'roadmaps', 'built_at', 'read_at')
+
+    def __init__(self):
+        self.tasks = {}
+        self.total = self.completed = self.pending = self.advice = self.roadmaps = 0
+        self.built_at = self.read_at = time.monotonic()
+
+    def add(self, task_id, status):
+        self.tasks[task_id] = status
+        self.total += 1
+        if status == 'completed':
+            self.completed += 1
+        elif status == 'pending':
+            self.pending += 1
+
+    def remove(self, task_id):
+        status = self.tasks.pop(task_id)
+        self.total -= 1
+        if status == 'completed':
+            self.completed -= 1
+        elif status == 'pending':
+            self.pending -= 1
+
+    def snapshot(self, overdue):
+        return with_productivity({
+            'total_tasks': self.total,
+            'completed_tasks': self.completed,
+            'pending_tasks': self.pending,
+            'overdue_tasks': overdue,
+            'career_advice_sessions': self.advice,
+            'learning_roadmaps': self.roadmaps,
+        })
+
+
+class AnalyticsCounters:
+    """Per-user analytics summaries kept current by the write paths.
+
+    The first read for a user builds a summary from the source tables; after
+    that create/update/delete and AI history inserts adjust it in place, and
+    the overdue count is a bisect in the user's DeadlineScheduler list
+    (refreshed by the same read), so a dashboard read costs O(log n)
+    regardless of task history. Summaries are process-local, so writes
+    handled by other workers are picked up when the summary is reconciled:
+    on read once it is older than `max_age` and by the background reconcile
+    job for recently read users. At most `max_users` summaries are kept,
+    least recently read first out. A write that lands while a rebuild is
+    reading the tables marks the rebuilt summary stale, so it is not lost.
+
+    Because of the cross-worker lag (a user whose read lands on another
+    worker than their write sees the old totals until a reconcile), the
+    counters are opt-in (ANALYTICS_COUNTERS=1) for single-worker deployments;
+    the default is AnalyticsEngine, which reads the database every time.
+    """
+
+    def __init__(self, deadlines, max_age=300, max_users=10000):
+        self.deadlines = deadlines
+        self.max_age = max_age
+        self.max_users = max_users
+        self._users = OrderedDict()
+        # user id -> [in-flight rebuild marker]; a write while a rebuild reads the tables marks it stale
+        self._rebuilding = {}
+        self._lock = threading.Lock()
+        self._reconciler_pid = None
+
+    def read(self, client, user_id, now=None):
+        with self._lock:
+            summary = self._users.get(user_id)
+            if summary is not None and time.monotonic() - summary.built_at < self.max_age:
+                summary.read_at = time.monotonic()
+                self._users.move_to_end(user_id)
+            else:
+                summary = None
+        if summary is None:
+            summary = self.rebuild(client, user_id)
+        return summary.snapshot(self.deadlines.overdue_count(client, user_id, now))
+
+    def rebuild(self, client, user_id):
+        """Recompute a user's summary from the source tables, replacing any drifted state"""
+        marker = {'stale': False}
+        with self._lock:
+            self._rebuilding.setdefault(user_id, []).append(marker)
+        try:
+            with self.deadlines.loading(user_id) as deadlines_marker:
+                tasks = client.table('tasks').select("id, status, due_date, due_time").eq('user_id', user_id) \
+                    .execute()
+                # The same read refreshes the user's due list, so status and overdue counts agree
+                self.deadlines.set_user(user_id, [row for row in tasks.data if row.get('status') == 'pending'],
+                                        deadlines_marker)
+            summary = _UserSummary()
+            for row in tasks.data:
+                summary.add(row['id'], row.get('status'))
+            summary.advice = AnalyticsEngine._count(client, 'career_advice', user_id)
+            summary.roadmaps = AnalyticsEngine._count(client, 'learning_roadmaps', user_id)
+        finally:
+            with self._lock:
+                markers = self._rebuilding[user_id]
+                markers.remove(marker)
+                if not markers:
+                    del self._rebuilding[user_id]
+
+        with self._lock:
+            if marker['stale']:
+                # The reads may or may not include that write, so this summary only serves the current
+                # read and the next one rebuilds
+                summary.built_at = float('-inf')
+            self._users[user_id] = summary
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return summary
+
+    def _apply(self, user_id, change):
+        # Users without a summary are rebuilt on their next read, so there is nothing to update
+        with self._lock:
+            for marker in self._rebuilding.get(user_id, ()):
+                marker['stale'] = True
+            summary = self._users.get(user_id)
+            if summary is not None:
+                change(summary)
+
+    def task_saved(self, user_id, task):
+        """Record a created or updated task row (status transitions included)"""
+        def change(summary):
+            if task['id'] in summary.tasks:
+                summary.remove(task['id'])
+            summary.add(task['id'], task.get('status'))
+        self._apply(user_id, change)
+
+    def task_deleted(self, user_id, task_id):
+        def change(summary):
+            if task_id in summary.tasks:
+                summary.remove(task_id)
+        self._apply(user_id, change)
+
+    def advice_added(self, user_id):
+        def change(summary):
+            summary.advice += 1
+        self._apply(user_id, change)
+
+    def roadmap_added(self, user_id):
+        def change(summary):
+            summary.roadmaps += 1
+        self._apply(user_id, change)
+
+    def reconcile(self, client):
+        """Rebuild summaries of users read since their last build; drop the idle ones"""
+        with self._lock:
+            users = list(self._users.items())
+        rebuilt = 0
+        for user_id, summary in users:
+            if summary.read_at <= summary.built_at:
+                with self._lock:
+                    if self._users.get(user_id) is summary:
+                        del self._users[user_id]
+                continue
+            try:
+                self.rebuild(client, user_id)
+                rebuilt += 1
+            except Exception as e:
+                print(f"Analytics reconcile failed for user {user_id}: {e}")
+        return rebuilt
+
+    def start_reconciler(self, client_getter, interval):
+        """Run reconcile() every `interval` seconds on a daemon thread (once per process)"""
+        with self._lock:
+            # Threads do not survive a fork, so each gunicorn worker starts its own
+            if self._reconciler_pid == os.getpid():
+                return
+            self._reconciler_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reconcile(client_getter())
+
+        threading.Thread(target=loop, name='analytics-reconciler', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._users), 'max_users': self.max_users, 'max_age': self.max_age}
@@ -1,27 +1,240 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g, has_request_context
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from groq import Groq
 from datetime import datetime, timedelta
 import json
-import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
+import time
+from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
-import re
+from formatter import format_ai_response_with_tables, IncrementalFormatter
+from llm_cache import build_cache_key, create_cache_from_env
+from singleflight import SingleFlight
+from analytics import AnalyticsEngine, AnalyticsCounters
+from task_queries import (InvalidQuery, parse_fields, parse_limit, apply_task_filters, apply_keyset, encode_cursor,
+                          last_modified, utc_now, encode_sync_cursor, decode_sync_cursor)
+from prompts import (GENERATION_PARAMS, timeline_prompt, career_education_context, career_prompt,
+                     roadmap_education_context, roadmap_prompt, skills_text)
+from user_context import TokenCache, ProfileCache, PROFILE_FIELDS
+from history import HistoryStore, HISTORY_PAGE_SIZE
+from clients import ClientPool, PoolSettings, LazyClient, LazyModule
+from jobs import JobQueue, JOB_PRIORITIES
+from ratelimit import GroqRateLimiter, RateLimited, AttemptLimiter, estimate_tokens, parse_duration
+from passwords import PasswordHasher, HasherBusy, DEFAULT_METHOD
+from auth_tokens import TokenService
+from compression import Compressor, StaticAssets
+from search import SearchIndex, HistorySearch, parse_kinds
+from storage import SQLiteStorage, CachedStorage, STORAGE_BACKENDS
+from deadlines import DeadlineScheduler, WebhookSink, log_sink
+from warmup import Warmup, ReadinessCheck
+from metrics import (registry as metrics_registry, RequestTimer, init_flask, span, timed, upstream_observer,
+                     record_span, record_groq_usage, groq_calls)
+from urllib.parse import urlsplit
+import hashlib
+import hmac
+import math
+import tempfile
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this')
 
-# Initialize Supabase client
+# Behind reverse proxies, take the client address from X-Forwarded-For (login throttling is per IP)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
+# Per-route latency histograms; requests over SLOW_REQUEST_SECONDS are sampled into the log with their spans
+request_timer = RequestTimer(slow_seconds=float(os.getenv('SLOW_REQUEST_SECONDS', '1.0')),
+                             sample_rate=float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', '0.1')))
+init_flask(app, request_timer)
+# Bearer token required by /metrics and /internal/stats when set
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Negotiated gzip/brotli for responses over COMPRESS_MIN_SIZE bytes (COMPRESSION=0 when a proxy compresses)
+compressor = Compressor(min_size=int(os.getenv('COMPRESS_MIN_SIZE', '1024')))
+COMPRESSION_ENABLED = os.getenv('COMPRESSION', '1') != '0'
+if COMPRESSION_ENABLED:
+    compressor.init_flask(app)
+
+# Static files get ?v=<content hash> URLs, cached as immutable, with precompressed variants
+static_assets = StaticAssets(app.static_folder, compressor)
+static_assets.init_flask(app)
+
+# Formatting is a hot path of every AI route, so it is timed as a span
+format_ai_response_with_tables = timed('format_response')(format_ai_response_with_tables)
+
+# Client-side Groq budget; calls beyond it are paced, or shed with 429 when they would wait too long
+groq_limiter = GroqRateLimiter(requests_per_minute=int(os.getenv('GROQ_RPM', '30')),
+                               tokens_per_minute=int(os.getenv('GROQ_TPM', '30000')),
+                               max_wait=float(os.getenv('GROQ_LIMIT_MAX_WAIT', '10')),
+                               max_queue=int(os.getenv('GROQ_LIMIT_MAX_QUEUE', '64')),
+                               max_queue_per_user=int(os.getenv('GROQ_LIMIT_MAX_QUEUE_PER_USER', '4')))
+
+# Pooled, keep-alive HTTP clients per upstream (SUPABASE_* / GROQ_* settings, see clients.PoolSettings)
+client_pool = ClientPool()
+client_pool.configure('supabase', PoolSettings('SUPABASE', read_timeout=30), observer=upstream_observer('supabase'))
+client_pool.configure('groq', PoolSettings('GROQ', read_timeout=60), on_response=groq_limiter.observe,
+                      observer=upstream_observer('groq'))
+# Webhook URLs come from clients (host-checked against JOB_WEBHOOK_HOSTS), so redirects are not followed
+client_pool.configure('webhook', PoolSettings('JOB_WEBHOOK', read_timeout=10, retries=0, follow_redirects=False))
+
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
 
-# Initialize Groq client
-groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# The SDKs are imported on first use: together they are most of the app's import time
+groq_sdk = LazyModule('groq')
+
+
+def create_supabase():
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+    if not supabase_url or not supabase_key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set")
+    return create_client(supabase_url, supabase_key,
+                         options=SyncClientOptions(httpx_client=client_pool.http_client('supabase')))
+
+
+def create_groq():
+    settings = client_pool.settings('groq')
+    # The SDK retries completions itself (with jittered backoff), bounded by GROQ_RETRIES
+    return groq_sdk.Groq(api_key=os.getenv('GROQ_API_KEY'), http_client=client_pool.http_client('groq'),
+                         timeout=settings.timeout(), max_retries=settings.retries)
+
+
+# Storage engine for every table read and write: the hosted Supabase client or an embedded SQLite database
+# (STORAGE_BACKEND=sqlite, SQLITE_PATH), optionally behind a per-user read cache (STORAGE_CACHE_TTL seconds)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+if STORAGE_BACKEND not in STORAGE_BACKENDS:
+    raise RuntimeError(f"STORAGE_BACKEND must be one of: {', '.join(STORAGE_BACKENDS)}")
+STORAGE_CACHE_TTL = float(os.getenv('STORAGE_CACHE_TTL', '0'))
+
+
+def create_storage():
+    if STORAGE_BACKEND == 'sqlite':
+        engine = SQLiteStorage(os.getenv('SQLITE_PATH', 'intellitrack.db'))
+    else:
+        engine = create_supabase()
+    if STORAGE_CACHE_TTL > 0:
+        return CachedStorage(engine, ttl=STORAGE_CACHE_TTL,
+                             max_users=int(os.getenv('STORAGE_CACHE_MAX_USERS', '10000')))
+    return engine
+
+
+def get_storage():
+    return storage.get()
+
+
+# Both clients are built on first use in each process, so importing the app needs no credentials and a
+# gunicorn worker (forked with or without --preload) never shares the parent's connections
+storage = LazyClient(create_storage)
+groq_client = LazyClient(create_groq)
+GROQ_MODEL = "llama3-8b-8192"
+
+# Verified token claims and user profiles, so auth and AI prompts skip repeated work
+token_cache = TokenCache(max_entries=int(os.getenv('TOKEN_CACHE_SIZE', '4096')))
+profile_cache = ProfileCache(ttl=int(os.getenv('PROFILE_CACHE_TTL', '60')))
+
+# Short-lived access tokens backed by server-side refresh sessions (sql/refresh_tokens.sql)
+token_service = TokenService(app.config['JWT_SECRET_KEY'],
+                             access_ttl=int(os.getenv('ACCESS_TOKEN_TTL', '900')),
+                             refresh_ttl=int(os.getenv('REFRESH_TOKEN_TTL_DAYS', '30')) * 86400,
+                             sync_interval=int(os.getenv('REVOCATION_SYNC_SECONDS', '30')),
+                             accept_legacy=os.getenv('ACCEPT_LEGACY_TOKENS', '1') != '0')
+
+# Password hashing cost (any Werkzeug method string) and the bounded per-process pool that runs it
+password_hasher = PasswordHasher(method=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                                 workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+                                 max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32')))
+
+# Login attempts allowed per email and per client IP in a sliding window
+LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', '300'))
+login_email_limiter = AttemptLimiter(int(os.getenv('LOGIN_MAX_PER_EMAIL', '10')), LOGIN_THROTTLE_WINDOW)
+login_ip_limiter = AttemptLimiter(int(os.getenv('LOGIN_MAX_PER_IP', '100')), LOGIN_THROTTLE_WINDOW)
+LOGIN_FIELDS = PROFILE_FIELDS + ', password_hash'
+
+# Response cache for deterministic-enough AI generations (timeline, roadmap)
+llm_cache = create_cache_from_env()
+
+# Identical concurrent completions share a single upstream call
+groq_flights = SingleFlight()
+
+# Dashboard counts computed in the database where possible
+analytics_engine = AnalyticsEngine()
+
+# Where task reminders go: REMINDER_SINK=log (default), webhook (REMINDER_WEBHOOK_URL) or none
+REMINDER_SINKS = {
+    'log': lambda: log_sink,
+    'webhook': lambda: WebhookSink(os.environ['REMINDER_WEBHOOK_URL'], lambda: client_pool.http_client('webhook')),
+    'none': lambda: (lambda event: None),
+}
+
+# Per-user due-moment lists for overdue/due-soon queries (loaded on demand, DEADLINE_INDEX_MAX_AGE seconds),
+# and reminders REMINDER_LEAD_MINUTES before each due moment and at it, sent by one process per host (the
+# holder of REMINDER_LOCK_PATH), which reloads the upcoming window every DEADLINE_RECONCILE_SECONDS
+deadline_scheduler = DeadlineScheduler(
+    sink=REMINDER_SINKS[os.getenv('REMINDER_SINK', 'log')](),
+    lead_times=[int(minutes) * 60 for minutes in os.getenv('REMINDER_LEAD_MINUTES', '60').split(',') if minutes],
+    reconcile_interval=int(os.getenv('DEADLINE_RECONCILE_SECONDS', '300')),
+    lock_path=os.getenv('REMINDER_LOCK_PATH', os.path.join(tempfile.gettempdir(), 'intellitrack-reminders.lock')),
+    max_age=int(os.getenv('DEADLINE_INDEX_MAX_AGE', '300')),
+    max_users=int(os.getenv('DEADLINE_INDEX_MAX_USERS', '10000')))
+
+# Per-user counters maintained by the write paths (ANALYTICS_COUNTERS=1). They are per process, so they are
+# off by default: with several workers a user could read totals that miss their own write on another worker
+analytics_counters = None
+if os.getenv('ANALYTICS_COUNTERS', '0') == '1':
+    analytics_counters = AnalyticsCounters(deadline_scheduler, max_age=int(os.getenv('ANALYTICS_MAX_AGE', '300')),
+                                           max_users=int(os.getenv('ANALYTICS_MAX_USERS', '10000')))
+ANALYTICS_RECONCILE_SECONDS = int(os.getenv('ANALYTICS_RECONCILE_SECONDS', '60'))
+
+# AI response history served from stored HTML renderings (sql/ai_history.sql)
+advice_history = HistoryStore('career_advice', 'ai_response', 'advice', ('user_input',))
+roadmap_history = HistoryStore('learning_roadmaps', 'roadmap_data', 'roadmap',
+                               ('career_goal', 'current_level', 'timeframe'))
+
+# Ranked search over tasks and AI history: the database function when installed, else a per-worker index
+history_search = HistorySearch(SearchIndex(max_age=int(os.getenv('SEARCH_INDEX_MAX_AGE', '300')),
+                                           max_users=int(os.getenv('SEARCH_INDEX_MAX_USERS', '1000'))),
+                               use_rpc=os.getenv('SEARCH_RPC', '1') != '0')
+
+# Upper bound on items per request to the /api/tasks/batch endpoints
+TASK_BATCH_MAX = int(os.getenv('TASK_BATCH_MAX', '100'))
+
+# Hosts that async generation jobs may deliver their result to (callback_url)
+JOB_WEBHOOK_HOSTS = {host.strip() for host in os.getenv('JOB_WEBHOOK_HOSTS', '').split(',') if host.strip()}
+
+# Delete tombstones older than this are purged; clients syncing from further back get a full reset
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv('TASK_TOMBSTONE_RETENTION_DAYS', '30')))
+_last_tombstone_purge = 0.0
+
+
+def verify_token(token):
+    """Return the user id from an Authorization header value; raises if the token is invalid"""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    data = token_cache.get(token)
+    if data is None:
+        with span('jwt_decode'):
+            data = token_service.decode(token)
+        token_cache.set(token, data)
+    # Cached claims are checked too: revocation is an in-memory lookup, not a database call
+    token_service.check(data)
+    return data['user_id']
+
+
+def load_user_profile(user_id):
+    """Profile row for the request's user, fetched at most once per request and cached briefly across requests"""
+    if 'user_profile' in g:
+        return g.user_profile
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        user_response = storage.table('users').select(PROFILE_FIELDS).eq('id', user_id).execute()
+        profile = user_response.data[0] if user_response.data else None
+        if profile is not None:
+            profile_cache.set(user_id, profile)
+    g.user_profile = profile
+    return profile
 
 
 # Authentication decorator
@@ -32,10 +245,7 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['user_id']
+            current_user_id = verify_token(token)
         except Exception as e:
             return jsonify({'error': 'Token is invalid'}), 401
         return f(current_user_id, *args, **kwargs)
@@ -64,10 +274,9 @@ def auth():
 def signup():
     try:
         data = request.json
-        print(f"Received signup data: {data}")
 
         # Check if user exists
-        existing_user = supabase.table('users').select("*").eq('email', data['email']).execute()
+        existing_user = storage.table('users').select("id").eq('email', data['email']).execute()
         if existing_user.data:
             return jsonify({'error': 'User already exists'}), 400
 
@@ -76,7 +285,7 @@ def signup():
             'name': data.get('name'),
             'email': data.get('email'),
             'education_level': data.get('education_level'),
-            'password_hash': generate_password_hash(data.get('password')),
+            'password_hash': password_hasher.hash(data.get('password')),
             'created_at': datetime.now().isoformat()
         }
 
@@ -105,65 +314,192 @@ def signup():
                 'school_grade': None
             })
 
-        print(f"Attempting to insert user data: {user_data}")
-
         # Insert user data (id will be auto-generated)
-        response = supabase.table('users').insert(user_data).execute()
-        print(f"Supabase response: {response}")
+        response = storage.table('users').insert(user_data).execute()
 
         if response.data:
             return jsonify({'message': 'User created successfully'}), 201
         else:
             return jsonify({'error': 'Failed to create user'}), 500
 
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Signup error: {str(e)}")
         return jsonify({'error': f'Signup failed: {str(e)}'}), 500
 
 
+def upgrade_password_hash(user_id, password):
+    """Re-hash a verified password with the configured cost; a failed write is simply retried next login"""
+    try:
+        storage.table('users').update({'password_hash': password_hasher.rehash(password)}).eq('id', user_id).execute()
+    except Exception as e:
+        print(f"Password rehash failed for user {user_id}: {e}")
+
+
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     try:
         data = request.json
+        email_key = data['email'].strip().lower()
 
-        # Get user
-        user_response = supabase.table('users').select("*").eq('email', data['email']).execute()
-        if not user_response.data:
-            return jsonify({'error': 'Invalid credentials'}), 401
+        # Throttled attempts are refused before any lookup or hashing
+        login_ip_limiter.hit(request.remote_addr or 'unknown', 'Too many login attempts, please retry later')
+        login_email_limiter.hit(email_key, 'Too many login attempts, please retry later')
 
-        user = user_response.data[0]
+        # Get user
+        user_response = storage.table('users').select(LOGIN_FIELDS).eq('email', data['email']).execute()
+        user = user_response.data[0] if user_response.data else None
 
-        # Check password
-        if not check_password_hash(user['password_hash'], data['password']):
+        # Check password; an unknown email costs the same hash, so every attempt costs the same CPU
+        if not password_hasher.verify(user['password_hash'] if user else None, data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        # Generate token
-        token = jwt.encode({
-            'user_id': user['id'],
-            'exp': datetime.utcnow() + timedelta(days=30)
-        }, app.config['JWT_SECRET_KEY'])
+        login_email_limiter.reset(email_key)
+        if password_hasher.needs_rehash(user['password_hash']):
+            upgrade_password_hash(user['id'], data['password'])
+
+        # Start a session: short-lived access token plus a refresh token
+        tokens = token_service.issue(storage, user['id'])
 
         # Remove password hash from user data
         user.pop('password_hash', None)
+        # What remains is the profile row, which the dashboard asks for next
+        profile_cache.set(user['id'], user)
 
-        return jsonify({
-            'token': token,
-            'user': user
-        })
+        return jsonify(dict(tokens, user=user))
 
+    except RateLimited as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': e.retry_after_header}
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
 
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh_session():
+    """Exchange a refresh token for a new access token; the refresh token is rotated"""
+    try:
+        data = request.json or {}
+        tokens = token_service.refresh(storage, data.get('refresh_token'))
+        if tokens is None:
+            return jsonify({'error': 'Invalid refresh token'}), 401
+        return jsonify(tokens)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/auth/logout', methods=['POST'])
+def logout():
+    """Revoke the refresh token's session, or every session of its user with {"all": true}"""
+    try:
+        data = request.json or {}
+        if not token_service.revoke(storage, data.get('refresh_token'), everywhere=bool(data.get('all'))):
+            return jsonify({'error': 'Invalid refresh token'}), 401
+        return jsonify({'message': 'Logged out'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Write-path hooks keeping derived per-user state current
+def on_task_saved(user_id, task):
+    if analytics_counters is not None:
+        analytics_counters.task_saved(user_id, task)
+    deadline_scheduler.task_saved(user_id, task)
+    history_search.index.task_saved(user_id, task)
+
+
+def on_task_deleted(user_id, task_id):
+    if analytics_counters is not None:
+        analytics_counters.task_deleted(user_id, task_id)
+    deadline_scheduler.task_deleted(user_id, task_id)
+    history_search.index.task_deleted(user_id, task_id)
+
+
+def on_advice_saved(user_id, record):
+    if analytics_counters is not None:
+        analytics_counters.advice_added(user_id)
+    history_search.index.history_saved(user_id, 'advice', record)
+
+
+def on_roadmap_saved(user_id, record):
+    if analytics_counters is not None:
+        analytics_counters.roadmap_added(user_id)
+    history_search.index.history_saved(user_id, 'roadmap', record)
+
+
+TASK_EDITABLE_FIELDS = {'title', 'description', 'due_date', 'due_time', 'priority', 'status'}
+TASK_PRIORITIES = {'low', 'medium', 'high'}
+
+
+def validate_task_item(item):
+    """Error message for an invalid new-task payload, or None"""
+    if not isinstance(item, dict):
+        return 'Task must be an object'
+    missing = [field for field in ('title', 'due_date') if not item.get(field)]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    if item.get('priority', 'medium') not in TASK_PRIORITIES:
+        return f"priority must be one of: {', '.join(sorted(TASK_PRIORITIES))}"
+    return None
+
+
+def build_task_record(user_id, data):
+    return {
+        'user_id': user_id,
+        'title': data['title'],
+        'description': data.get('description', ''),
+        'due_date': data['due_date'],
+        'due_time': data.get('due_time', '23:59'),  # Default to end of day
+        'priority': data.get('priority', 'medium'),
+        'status': 'pending',
+        'created_at': datetime.now().isoformat(),
+        'updated_at': utc_now().isoformat()
+    }
+
+
 # Task management routes
 @app.route('/api/tasks', methods=['GET'])
 @token_required
 def get_tasks(current_user_id):
+    """List tasks newest first.
+
+    Optional query parameters: `limit` + `cursor` for keyset pagination (the
+    next cursor is returned in the X-Next-Cursor header), `fields` for a
+    column projection, and `status`, `priority`, `due_from`, `due_to` filters.
+    Responses carry ETag/Last-Modified so an unchanged list revalidates as 304.
+    """
     try:
-        response = supabase.table('tasks').select("*").eq('user_id', current_user_id).order('created_at',
-                                                                                            desc=True).execute()
-        return jsonify(response.data)
+        args = request.args
+        limit = parse_limit(args.get('limit'))
+        paginated = limit is not None or bool(args.get('cursor'))
+
+        query = storage.table('tasks').select(parse_fields(args.get('fields'), paginated))
+        query = apply_task_filters(query.eq('user_id', current_user_id), args)
+        if args.get('cursor'):
+            query = apply_keyset(query, args['cursor'])
+        query = query.order('created_at', desc=True).order('id', desc=True)
+        if limit is not None:
+            # One extra row tells us whether another page exists
+            query = query.limit(limit + 1)
+        tasks = query.execute().data
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1])
+
+        response = jsonify(tasks)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.add_etag()
+        response.last_modified = last_modified(tasks)
+        return response.make_conditional(request)
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -173,19 +509,11 @@ def get_tasks(current_user_id):
 def create_task(current_user_id):
     try:
         data = request.json
-        task_data = {
-            'user_id': current_user_id,
-            'title': data['title'],
-            'description': data.get('description', ''),
-            'due_date': data['due_date'],
-            'due_time': data.get('due_time', '23:59'),  # Default to end of day
-            'priority': data.get('priority', 'medium'),
-            'status': 'pending',
-            'created_at': datetime.now().isoformat()
-        }
+        task_data = build_task_record(current_user_id, data)
 
-        response = supabase.table('tasks').insert(task_data).execute()
-        return jsonify(response.data[0]), 201
+        response = storage.table('tasks').insert(task_data).execute()
+        on_task_saved(current_user_id, response.data[0])
+        return jsonify(response.data[0]), 201, {'X-Sync-Cursor': encode_sync_cursor(utc_now())}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -195,8 +523,17 @@ def create_task(current_user_id):
 def update_task(current_user_id, task_id):
     try:
         data = request.json
-        response = supabase.table('tasks').update(data).eq('id', task_id).eq('user_id', current_user_id).execute()
-        return jsonify(response.data[0] if response.data else {})
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'No changes given'}), 400
+        # Same whitelist as the batch route, so id, user_id and timestamps cannot be overwritten
+        rejected = set(data) - TASK_EDITABLE_FIELDS
+        if rejected:
+            return jsonify({'error': f"Fields cannot be updated: {', '.join(sorted(rejected))}"}), 400
+        data = dict(data, updated_at=utc_now().isoformat())
+        response = storage.table('tasks').update(data).eq('id', task_id).eq('user_id', current_user_id).execute()
+        if response.data:
+            on_task_saved(current_user_id, response.data[0])
+        return jsonify(response.data[0] if response.data else {}), {'X-Sync-Cursor': encode_sync_cursor(utc_now())}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -205,12 +542,283 @@ def update_task(current_user_id, task_id):
 @token_required
 def delete_task(current_user_id, task_id):
     try:
-        supabase.table('tasks').delete().eq('id', task_id).eq('user_id', current_user_id).execute()
-        return jsonify({'message': 'Task deleted successfully'})
+        response = storage.table('tasks').delete().eq('id', task_id).eq('user_id', current_user_id).execute()
+        if response.data:
+            on_task_deleted(current_user_id, task_id)
+            record_tombstones(current_user_id, [task_id])
+        cursor = encode_sync_cursor(utc_now())
+        return jsonify({'message': 'Task deleted successfully', 'cursor': cursor}), {'X-Sync-Cursor': cursor}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def record_tombstones(user_id, task_ids):
+    """Remember deleted task ids so delta sync can tell clients to drop them"""
+    deleted_at = utc_now().isoformat()
+    try:
+        storage.table('task_tombstones').insert(
+            [{'task_id': task_id, 'user_id': user_id, 'deleted_at': deleted_at} for task_id in task_ids]).execute()
+    except Exception as e:
+        # The delete itself succeeded; clients will pick it up on their next full resync
+        print(f"Tombstone insert failed: {str(e)}")
+
+
+def purge_tombstones():
+    global _last_tombstone_purge
+    if time.monotonic() - _last_tombstone_purge < 3600:
+        return
+    _last_tombstone_purge = time.monotonic()
+    cutoff = (utc_now() - TOMBSTONE_RETENTION).isoformat()
+    try:
+        storage.table('task_tombstones').delete().lt('deleted_at', cutoff).execute()
+    except Exception as e:
+        print(f"Tombstone purge failed: {str(e)}")
+
+
+@app.route('/api/tasks/changes', methods=['GET'])
+@token_required
+def get_task_changes(current_user_id):
+    """Delta sync: tasks created or updated and ids deleted since `since`, plus the next cursor.
+
+    Without `since`, or when it predates tombstone retention, the full task
+    list is returned with `reset: true` and clients should replace their copy.
+    """
+    try:
+        issued_at = utc_now()
+        since = decode_sync_cursor(request.args['since']) if request.args.get('since') else None
+        reset = since is None or since < issued_at - TOMBSTONE_RETENTION
+
+        query = storage.table('tasks').select(parse_fields(request.args.get('fields'), True))
+        query = query.eq('user_id', current_user_id)
+        deleted = []
+        if not reset:
+            query = query.gte('updated_at', since.isoformat())
+            tombstones = storage.table('task_tombstones').select("task_id").eq('user_id', current_user_id).gte(
+                'deleted_at', since.isoformat()).execute()
+            deleted = sorted({row['task_id'] for row in tombstones.data})
+        changes = query.order('created_at', desc=True).order('id', desc=True).execute().data
+
+        purge_tombstones()
+        return jsonify({
+            'changes': changes,
+            'deleted': deleted,
+            'reset': reset,
+            'cursor': encode_sync_cursor(issued_at)
+        })
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tasks/deadlines', methods=['GET'])
+@token_required
+def get_task_deadlines(current_user_id):
+    """Ids and due moments of the user's overdue pending tasks and those due within `hours` (default 24)"""
+    try:
+        try:
+            hours = float(request.args.get('hours', 24))
+        except ValueError:
+            raise InvalidQuery('hours must be a number')
+        if not 0 < hours <= 24 * 366:
+            raise InvalidQuery('hours must be between 0 and 8784')
+        now = datetime.now()
+        return jsonify({
+            'overdue': [{'id': task_id, 'due': due.isoformat()}
+                        for task_id, due in deadline_scheduler.overdue(storage, current_user_id, now)],
+            'due_soon': [{'id': task_id, 'due': due.isoformat()}
+                         for task_id, due in deadline_scheduler.due_within(storage, current_user_id, hours * 3600,
+                                                                          now)]
+        })
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Bulk task operations: one multi-row Supabase call per request with per-item results
+def batch_items(data, key):
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        raise InvalidQuery(f'`{key}` must be a non-empty list')
+    if len(items) > TASK_BATCH_MAX:
+        raise InvalidQuery(f'At most {TASK_BATCH_MAX} items per batch')
+    return items
+
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@token_required
+def create_tasks_batch(current_user_id):
+    """Create many tasks: {"tasks": [{...}, ...]} -> per-item results in request order"""
+    try:
+        items = batch_items(request.json, 'tasks')
+        results = [None] * len(items)
+        records = []
+        for index, item in enumerate(items):
+            error = validate_task_item(item)
+            if error:
+                results[index] = {'index': index, 'ok': False, 'error': error}
+            else:
+                records.append((index, build_task_record(current_user_id, item)))
+
+        if records:
+            response = storage.table('tasks').insert([record for _, record in records]).execute()
+            # PostgREST returns inserted rows in the order they were sent
+            for (index, _), task in zip(records, response.data):
+                on_task_saved(current_user_id, task)
+                results[index] = {'index': index, 'ok': True, 'task': task}
+
+        created = sum(1 for result in results if result['ok'])
+        return jsonify({'created': created, 'failed': len(items) - created, 'results': results}), \
+            (201 if created else 400), {'X-Sync-Cursor': encode_sync_cursor(utc_now())}
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tasks/batch', methods=['PATCH'])
+@token_required
+def update_tasks_batch(current_user_id):
+    """Patch many tasks: {"updates": [{"id": 1, "status": "completed"}, ...]}.
+
+    Items carrying identical changes are applied with a single `id IN (...)`
+    update, so "mark all complete" is one round trip however many ids it has.
+    """
+    try:
+        items = batch_items(request.json, 'updates')
+        results = [None] * len(items)
+        groups = {}
+        for index, item in enumerate(items):
+            changes = {k: v for k, v in item.items() if k != 'id'} if isinstance(item, dict) else {}
+            error = None
+            if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+                error = 'Each update needs an integer `id`'
+            elif not changes:
+                error = 'No changes given'
+            elif set(changes) - TASK_EDITABLE_FIELDS:
+                error = f"Fields cannot be updated: {', '.join(sorted(set(changes) - TASK_EDITABLE_FIELDS))}"
+            if error:
+                results[index] = {'index': index, 'id': item.get('id') if isinstance(item, dict) else None,
+                                  'ok': False, 'error': error}
+                continue
+            key = json.dumps(changes, sort_keys=True)
+            groups.setdefault(key, (changes, []))[1].append((index, item['id']))
+
+        updated_at = utc_now().isoformat()
+        for changes, members in groups.values():
+            ids = [task_id for _, task_id in members]
+            response = storage.table('tasks').update(dict(changes, updated_at=updated_at)).in_(
+                'id', ids).eq('user_id', current_user_id).execute()
+            rows = {task['id']: task for task in response.data}
+            for index, task_id in members:
+                if task_id in rows:
+                    on_task_saved(current_user_id, rows[task_id])
+                    results[index] = {'index': index, 'id': task_id, 'ok': True, 'task': rows[task_id]}
+                else:
+                    results[index] = {'index': index, 'id': task_id, 'ok': False, 'error': 'Task not found'}
+
+        updated = sum(1 for result in results if result['ok'])
+        return jsonify({'updated': updated, 'failed': len(items) - updated, 'results': results}), \
+            {'X-Sync-Cursor': encode_sync_cursor(utc_now())}
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tasks/batch', methods=['DELETE'])
+@token_required
+def delete_tasks_batch(current_user_id):
+    """Delete many tasks: {"ids": [1, 2, ...]}"""
+    try:
+        ids = batch_items(request.json, 'ids')
+        if not all(isinstance(task_id, int) for task_id in ids):
+            raise InvalidQuery('`ids` must be integers')
+
+        response = storage.table('tasks').delete().in_('id', ids).eq('user_id', current_user_id).execute()
+        deleted = {task['id'] for task in response.data}
+        for task_id in deleted:
+            on_task_deleted(current_user_id, task_id)
+        if deleted:
+            record_tombstones(current_user_id, sorted(deleted))
+
+        results = [{'id': task_id, 'ok': True} if task_id in deleted
+                   else {'id': task_id, 'ok': False, 'error': 'Task not found'} for task_id in ids]
+        return jsonify({'deleted': len(deleted), 'failed': len(ids) - len(deleted), 'results': results}), \
+            {'X-Sync-Cursor': encode_sync_cursor(utc_now())}
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Groq completion helpers shared by the AI routes
+def completion_cache_key(endpoint, temperature, max_tokens, **inputs):
+    """Cache key for an endpoint's completion, or None when caching is off for this request"""
+    if not llm_cache.enabled_for(endpoint):
+        return None
+    return build_cache_key(endpoint, GROQ_MODEL, temperature, max_tokens, **inputs)
+
+
+def cached_completion(cache_key, fresh=None):
+    # Clients can force a fresh generation with `Cache-Control: no-cache`
+    if fresh is None:
+        fresh = has_request_context() and request.cache_control.no_cache
+    if cache_key is None or fresh:
+        return None
+    return llm_cache.get(cache_key)
+
+
+def prompt_fingerprint(prompt, temperature, max_tokens):
+    material = f'{GROQ_MODEL}|{temperature}|{max_tokens}|{prompt}'
+    return 'prompt:' + hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def generate_completion(prompt, temperature, max_tokens, cache_key=None, fresh=None, user_id=None, endpoint=None):
+    """Run a Groq chat completion, serving and filling the response cache when a key is given.
+
+    Concurrent calls with the same cache key (or, without one, the same
+    prompt) are coalesced so a burst of identical requests costs one upstream
+    completion; every waiter gets the shared result or the shared error.
+    Upstream calls go through groq_limiter on behalf of `user_id`.
+    """
+    ai_response = cached_completion(cache_key, fresh)
+    if ai_response is not None:
+        return ai_response
+
+    def complete():
+        with span('groq_rate_limit_wait'):
+            reservation = groq_limiter.acquire(user_id, prompt, max_tokens)
+        groq_calls.inc(1, endpoint, 'complete')
+        with span('groq_completion'):
+            chat_completion = groq_client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=GROQ_MODEL,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        if chat_completion.usage is not None:
+            groq_limiter.settle(reservation, chat_completion.usage.total_tokens)
+            record_groq_usage(endpoint, chat_completion.usage)
+        result = chat_completion.choices[0].message.content
+        if cache_key is not None and result:
+            llm_cache.set(cache_key, result)
+        return result
+
+    flight_key = cache_key or prompt_fingerprint(prompt, temperature, max_tokens)
+    return groq_flights.do(flight_key, complete)
+
+
+def rate_limited_response(e):
+    """429 for a call shed by groq_limiter, or an upstream 429 that outlasted the SDK's retries"""
+    if isinstance(e, RateLimited):
+        retry_after = e.retry_after_header
+    else:
+        retry_after = str(max(1, math.ceil(parse_duration(e.response.headers.get('retry-after')) or 1)))
+    return jsonify({'error': 'AI service is busy, please retry shortly'}), 429, {'Retry-After': retry_after}
+
+
 # NEW: AI Timeline Generation for Tasks
 @app.route('/api/tasks/ai-timeline', methods=['POST'])
 @token_required
@@ -221,79 +829,223 @@ def generate_task_timeline(current_user_id):
         description = data.get('description', '')
         priority = data.get('priority', 'medium')
 
-        prompt = f"""Analyze this student task and provide a realistic timeline estimate:
+        prompt = timeline_prompt(title, description, priority)
 
-Task: {title}
-Description: {description}
-Priority: {priority}
-
-Please provide:
-1. **Estimated Time to Complete** (be specific - hours/days)
-2. **Suggested Breakdown** (subtasks in table format)
-3. **Dependencies & Considerations**
-4. **Tips for Efficient Completion**
-
-Format your response with HTML tables and clear sections."""
-
-        chat_completion = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama3-8b-8192",
-            temperature=0.7,
-            max_tokens=1000
-        )
-
-        ai_response = chat_completion.choices[0].message.content
+        params = GENERATION_PARAMS['timeline']
+        cache_key = completion_cache_key('timeline', **params, title=title, description=description, priority=priority)
+        ai_response = generate_completion(prompt, **params, cache_key=cache_key, user_id=current_user_id,
+                                          endpoint='timeline')
         formatted_response = format_ai_response_with_tables(ai_response)
 
         return jsonify({'timeline': formatted_response})
 
+    except (RateLimited, groq_sdk.RateLimitError) as e:
+        return rate_limited_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def format_ai_response_with_tables(response):
-    """Enhanced formatting function for AI responses with proper HTML tables"""
-
-    # Convert markdown headers to HTML
-    response = re.sub(r'\*\*(.*?)\*\*', r'<h3>\1</h3>', response)
-    response = re.sub(r'#{1,3}\s*(.*?)(?:\n|$)', r'<h3>\1</h3>', response)
-
-    # Convert markdown tables to HTML tables
-    lines = response.split('\n')
-    formatted_lines = []
-    in_table = False
-
-    for i, line in enumerate(lines):
-        if '|' in line and line.strip().startswith('|') and line.strip().endswith('|'):
-            if not in_table:
-                formatted_lines.append('<table style="width:100%; border-collapse: collapse; margin: 1rem 0;">')
-                in_table = True
-                # Header row
-                cells = [cell.strip() for cell in line.split('|')[1:-1]]
-                formatted_lines.append('<thead><tr>')
-                for cell in cells:
-                    formatted_lines.append(
-                        f'<th style="background: rgba(102,126,234,0.3); color: #667eea; padding: 0.8rem; border: 1px solid rgba(102,126,234,0.2); text-align: left;">{cell}</th>')
-                formatted_lines.append('</tr></thead><tbody>')
-            elif line.strip().startswith('|') and '---' not in line:
-                # Data row
-                cells = [cell.strip() for cell in line.split('|')[1:-1]]
-                formatted_lines.append('<tr>')
-                for cell in cells:
-                    formatted_lines.append(
-                        f'<td style="padding: 0.8rem; border: 1px solid rgba(102,126,234,0.1); vertical-align: top;">{cell}</td>')
-                formatted_lines.append('</tr>')
-        else:
-            if in_table:
-                formatted_lines.append('</tbody></table>')
-                in_table = False
-            if line.strip() and '---' not in line:
-                formatted_lines.append(f'<p style="margin-bottom: 1rem; line-height: 1.6;">{line}</p>')
-
-    if in_table:
-        formatted_lines.append('</tbody></table>')
-
-    return '\n'.join(formatted_lines)
+# Streaming helpers for the long-running AI routes
+def wants_stream():
+    """True when the client asked for a token stream instead of a single JSON response"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream_ai_response(prompt, temperature, max_tokens, result_key, on_complete, cache_key=None, user_id=None,
+                       endpoint=None):
+    """Stream a Groq completion to the client as server-sent events.
+
+    Emits `token` events with raw text as it arrives, `html` events with
+    formatted paragraphs/table rows as they close, and a final `done` event
+    carrying the full rendering under `result_key`. `on_complete` receives the
+    complete raw response and its rendering once the upstream stream has
+    finished. A cache hit is replayed as a single token. The rate-limit
+    reservation is taken up front, so a shed call is still a plain 429.
+    """
+    cached = cached_completion(cache_key)
+    reservation = None
+    if cached is None:
+        reservation = groq_limiter.reserve(user_id, estimate_tokens(prompt, max_tokens))
+
+    def upstream_chunks():
+        if cached is not None:
+            yield cached
+            return
+        reservation.wait()
+        groq_calls.inc(1, endpoint, 'stream')
+        started = time.perf_counter()
+        stream = groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=GROQ_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        first_token = True
+        for chunk in stream:
+            # Groq reports usage on the final chunk
+            usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+            if usage is not None:
+                groq_limiter.settle(reservation, usage.total_tokens)
+                record_groq_usage(endpoint, usage)
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                if first_token:
+                    first_token = False
+                    record_span('groq_first_token', time.perf_counter() - started)
+                yield text
+        record_span('groq_stream', time.perf_counter() - started)
+
+    def generate():
+        formatter = IncrementalFormatter()
+        parts = []
+        # The streamed fragments concatenate to the full rendering, so it is never formatted twice
+        html_parts = []
+        # Flush headers straight away so the client sees its first byte before the model does
+        yield sse_event('start', {})
+        try:
+            for text in upstream_chunks():
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+                html = formatter.feed(text)
+                if html:
+                    html_parts.append(html)
+                    yield sse_event('html', {'html': html})
+
+            html = formatter.close()
+            if html:
+                html_parts.append(html)
+                yield sse_event('html', {'html': html})
+
+            ai_response = ''.join(parts)
+            formatted_response = ''.join(html_parts)
+            if cache_key is not None and cached is None and ai_response:
+                llm_cache.set(cache_key, ai_response)
+            on_complete(ai_response, formatted_response)
+            yield sse_event('done', {result_key: formatted_response})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    if reservation is not None:
+        # A client that leaves before the stream starts never waits on the reservation; drop it from the
+        # limiter's queue so it does not hold one of the user's slots (a no-op once it was granted)
+        response.call_on_close(lambda: groq_limiter.cancel(reservation))
+    return response
+
+
+def save_advice(user_id, fields, ai_response, formatted_response):
+    advice_data = advice_history.record({
+        'user_id': user_id,
+        'user_input': fields['user_input'],
+        'ai_response': ai_response,
+        'created_at': datetime.now().isoformat()
+    }, formatted_response)
+    response = storage.table('career_advice').insert(advice_data).execute()
+    on_advice_saved(user_id, response.data[0] if response.data else advice_data)
+
+
+def save_roadmap(user_id, fields, ai_response, formatted_response):
+    roadmap_record = roadmap_history.record({
+        'user_id': user_id,
+        'career_goal': fields['career_goal'],
+        'current_level': fields['current_level'],
+        'timeframe': fields['timeframe'],
+        'roadmap_data': ai_response,
+        'created_at': datetime.now().isoformat()
+    }, formatted_response)
+    response = storage.table('learning_roadmaps').insert(roadmap_record).execute()
+    on_roadmap_saved(user_id, response.data[0] if response.data else roadmap_record)
+
+
+# Background generation jobs: `?async=1` (or `Prefer: respond-async`) returns 202 with a job to poll
+GENERATION_JOBS = {
+    'career_advice': ('advice', save_advice),
+    'roadmap': ('roadmap', save_roadmap),
+}
+
+
+def wants_job():
+    if request.args.get('async') in ('1', 'true'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def webhook_url(url):
+    """Accept a job callback URL only for hosts allowed by JOB_WEBHOOK_HOSTS"""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or parts.hostname not in JOB_WEBHOOK_HOSTS:
+        raise InvalidQuery('callback_url host is not allowed')
+    return url
+
+
+def enqueue_generation(kind, user_id, prompt, fields, cache_key=None):
+    priority = JOB_PRIORITIES.get(request.args.get('priority', 'normal'))
+    if priority is None:
+        raise InvalidQuery(f"priority must be one of: {', '.join(JOB_PRIORITIES)}")
+    payload = {'user_id': user_id, 'prompt': prompt, 'fields': fields, 'cache_key': cache_key,
+               'fresh': bool(request.cache_control.no_cache)}
+    job, created = job_queue.submit(user_id, kind, payload, priority=priority,
+                                    callback_url=webhook_url(request.json.get('callback_url')))
+    response = jsonify(JobQueue.public(job))
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response
+
+
+def run_generation_job(job):
+    """Worker side of a generation job: completion, formatting and history insert"""
+    payload = job['payload']
+    result_key, save = GENERATION_JOBS[job['kind']]
+    ai_response = generate_completion(payload['prompt'], **GENERATION_PARAMS[job['kind']],
+                                      cache_key=payload['cache_key'], fresh=payload['fresh'],
+                                      user_id=payload['user_id'], endpoint=job['kind'])
+    formatted_response = format_ai_response_with_tables(ai_response)
+    save(payload['user_id'], payload['fields'], ai_response, formatted_response)
+    return {result_key: formatted_response}
+
+
+def send_job_webhook(job):
+    client_pool.http_client('webhook').post(job['callback_url'], json=JobQueue.public(job)).raise_for_status()
+
+
+# Background generation jobs live in a SQLite file shared by every worker on the host (JOB_QUEUE_PATH), so a
+# job can be polled from any worker; JOB_QUEUE_PATH=:memory: keeps a per-process queue (single worker only)
+job_queue = JobQueue(path=os.getenv('JOB_QUEUE_PATH', os.path.join(tempfile.gettempdir(), 'intellitrack-jobs.db')),
+                     workers=int(os.getenv('JOB_WORKERS', '2')),
+                     per_user_limit=int(os.getenv('JOB_USER_CONCURRENCY', '1')),
+                     max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', '3')),
+                     # Connection failures, timeouts, 429s (upstream or our own limiter) and 5xx are worth a retry
+                     retry_on=lambda: (groq_sdk.APIConnectionError, groq_sdk.RateLimitError,
+                                       groq_sdk.InternalServerError, RateLimited),
+                     notify=send_job_webhook)
+for job_kind in GENERATION_JOBS:
+    job_queue.register(job_kind, run_generation_job)
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(current_user_id, job_id):
+    try:
+        job = job_queue.get(job_id, user_id=current_user_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        response = jsonify(JobQueue.public(job))
+        if job['status'] in ('pending', 'running'):
+            response.headers['Retry-After'] = '2'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 
 # ENHANCED: Career counseling route with ChatGPT-style formatting
@@ -305,64 +1057,38 @@ def get_career_advice(current_user_id):
         user_input = data.get('input', '')
 
         # Get user education info for context
-        user_response = supabase.table('users').select(
-            "education_level, academic_year, school_grade, field_of_study").eq('id', current_user_id).execute()
-        user_info = user_response.data[0] if user_response.data else {}
+        user_info = load_user_profile(current_user_id) or {}
 
         # Create education-aware prompt
-        education_context = ""
-        if user_info.get('education_level') == 'school':
-            education_context = f"The student is in {user_info.get('school_grade', 'school')} studying {user_info.get('field_of_study', 'general subjects')}."
-        elif user_info.get('education_level') == 'college':
-            education_context = f"The student is in {user_info.get('academic_year', 'college')} studying {user_info.get('field_of_study', 'their chosen field')}."
-
-        prompt = f"""You are an expert AI career counselor and academic advisor. {education_context}
+        education_context = career_education_context(user_info)
 
-Based on the following student query, provide comprehensive, well-structured guidance that matches the quality and formatting of ChatGPT responses:
+        prompt = career_prompt(user_input, education_context)
+        fields = {'user_input': user_input}
 
-Student Query: {user_input}
+        if wants_job():
+            return enqueue_generation('career_advice', current_user_id, prompt, fields)
 
-IMPORTANT FORMATTING REQUIREMENTS:
-1. Use proper markdown formatting with headers (##, ###)
-2. Create detailed tables using markdown table syntax
-3. Use bullet points and numbered lists appropriately
-4. Structure your response with clear sections
-5. Make tables comprehensive with multiple columns and detailed information
-6. Use emojis strategically for visual appeal
-7. Provide actionable, specific advice
-
-Structure your response with sections like:
-- **🔥 Strategy Overview** (with emoji headers)
-- **📅 Detailed Plan** (with comprehensive tables)
-- **📚 Resources & Tools** (categorized tables)
-- **💡 Action Steps** (numbered list)
-- **🧠 Tips for Success**
-
-Make sure tables have proper headers, multiple columns, and detailed content. Format everything in clean markdown that will render beautifully."""
-
-        chat_completion = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama3-8b-8192",
-            temperature=0.7,
-            max_tokens=2500
-        )
+        if wants_stream():
+            return stream_ai_response(prompt, **GENERATION_PARAMS['career_advice'], result_key='advice',
+                                      on_complete=lambda ai_response, formatted_response: save_advice(
+                                          current_user_id, fields, ai_response, formatted_response),
+                                      user_id=current_user_id, endpoint='career_advice')
 
-        ai_response = chat_completion.choices[0].message.content
+        ai_response = generate_completion(prompt, **GENERATION_PARAMS['career_advice'], user_id=current_user_id,
+                                          endpoint='career_advice')
 
         # Enhanced HTML formatting
         formatted_response = format_ai_response_with_tables(ai_response)
 
         # Save to database
-        advice_data = {
-            'user_id': current_user_id,
-            'user_input': user_input,
-            'ai_response': ai_response,
-            'created_at': datetime.now().isoformat()
-        }
-        supabase.table('career_advice').insert(advice_data).execute()
+        save_advice(current_user_id, fields, ai_response, formatted_response)
 
         return jsonify({'advice': formatted_response})
 
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except (RateLimited, groq_sdk.RateLimitError) as e:
+        return rate_limited_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -379,128 +1105,99 @@ def generate_roadmap(current_user_id):
         interests = data.get('skills', [])  # Updated to handle array of skills
 
         # Get user education info
-        user_response = supabase.table('users').select(
-            "education_level, academic_year, school_grade, field_of_study").eq('id', current_user_id).execute()
-        user_info = user_response.data[0] if user_response.data else {}
-
-        education_context = ""
-        if user_info.get('education_level') == 'school':
-            education_context = f"The student is currently in {user_info.get('school_grade', 'school')}."
-        elif user_info.get('education_level') == 'college':
-            education_context = f"The student is currently in {user_info.get('academic_year', 'college')} studying {user_info.get('field_of_study')}."
-
-        skills_text = ', '.join(interests) if isinstance(interests, list) else str(interests)
-
-        prompt = f"""Create a comprehensive, professional learning roadmap for becoming a {career_goal}.
-
-Student Context: {education_context}
-Current Level: {current_level}
-Timeframe: {timeframe}
-Current Skills/Interests: {skills_text}
-
-Generate a detailed roadmap with the following structure using markdown formatting:
-
-## 🚀 {career_goal} Learning Roadmap
-
-### 📊 Overview
-| Aspect | Details |
-|--------|---------|
-| Duration | {timeframe} |
-| Starting Level | {current_level} |
-| Target Role | {career_goal} |
-| Total Phases | 3-4 phases |
-
-### 📅 Phase-wise Learning Plan
-
-#### 🔹 Phase 1: Foundation (Month 1-X)
-**Skills to Develop:**
-- Skill 1
-- Skill 2
-- Skill 3
-
-**Resources:**
-| Resource | Type | Description |
-|----------|------|-------------|
-| Resource 1 | Course | Detailed description |
-| Resource 2 | Book | Detailed description |
-
-**Projects:**
-- Project 1
-- Project 2
-
-**Milestones:**
-- Milestone 1
-- Milestone 2
-
-#### 🔹 Phase 2: Development (Month X-Y)
-[Similar structure]
-
-#### 🔹 Phase 3: Specialization (Month Y-Z)
-[Similar structure]
-
-### 🎯 Skills Matrix
-| Technical Skills | Soft Skills |
-|------------------|-------------|
-| Programming | Communication |
-| Databases | Problem Solving |
-
-### 📚 Resource Library
-| Category | Resources |
-|----------|-----------|
-| Free Courses | List of free courses |
-| Paid Certifications | List of certifications |
-| Books | List of books |
-| Practice Platforms | List of platforms |
-
-### 💡 Final Tips
-- Tip 1
-- Tip 2
-- Tip 3
-
-Make this comprehensive, realistic, and tailored to the student's level and timeframe."""
-
-        chat_completion = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama3-8b-8192",
-            temperature=0.3,
-            max_tokens=3000
-        )
+        user_info = load_user_profile(current_user_id) or {}
+
+        education_context = roadmap_education_context(user_info)
+        skills = skills_text(interests)
+
+        prompt = roadmap_prompt(career_goal, current_level, timeframe, skills, education_context)
+        fields = {'career_goal': career_goal, 'current_level': current_level, 'timeframe': timeframe}
 
-        ai_response = chat_completion.choices[0].message.content
+        params = GENERATION_PARAMS['roadmap']
+        cache_key = completion_cache_key('roadmap', **params,
+                                         career_goal=career_goal, current_level=current_level,
+                                         timeframe=timeframe, skills=skills.split(', '),
+                                         education_context=education_context)
+
+        if wants_job():
+            return enqueue_generation('roadmap', current_user_id, prompt, fields, cache_key)
+
+        if wants_stream():
+            return stream_ai_response(prompt, **params, result_key='roadmap',
+                                      on_complete=lambda ai_response, formatted_response: save_roadmap(
+                                          current_user_id, fields, ai_response, formatted_response),
+                                      cache_key=cache_key, user_id=current_user_id, endpoint='roadmap')
+
+        ai_response = generate_completion(prompt, **params, cache_key=cache_key, user_id=current_user_id,
+                                          endpoint='roadmap')
         formatted_response = format_ai_response_with_tables(ai_response)
 
         # Save roadmap to database
-        roadmap_record = {
-            'user_id': current_user_id,
-            'career_goal': career_goal,
-            'current_level': current_level,
-            'timeframe': timeframe,
-            'roadmap_data': ai_response,
-            'created_at': datetime.now().isoformat()
-        }
-        supabase.table('learning_roadmaps').insert(roadmap_record).execute()
+        save_roadmap(current_user_id, fields, ai_response, formatted_response)
 
         return jsonify({'roadmap': formatted_response})
 
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except (RateLimited, groq_sdk.RateLimitError) as e:
+        return rate_limited_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def history_response(store, user_id):
+    """Page through a user's AI history; the next cursor is returned in the X-Next-Cursor header"""
+    limit = parse_limit(request.args.get('limit')) or HISTORY_PAGE_SIZE
+    items, next_cursor = store.list(storage, user_id, limit=limit, cursor=request.args.get('cursor'))
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @app.route('/api/roadmap/user', methods=['GET'])
 @token_required
 def get_user_roadmaps(current_user_id):
     try:
-        response = supabase.table('learning_roadmaps').select("*").eq('user_id', current_user_id).order('created_at',
-                                                                                                        desc=True).execute()
-        roadmaps = []
-        for roadmap in response.data:
-            try:
-                if isinstance(roadmap['roadmap_data'], str):
-                    roadmap['roadmap_data'] = json.loads(roadmap['roadmap_data'])
-                roadmaps.append(roadmap)
-            except:
-                continue
-        return jsonify(roadmaps)
+        return history_response(roadmap_history, current_user_id)
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/career-advice/history', methods=['GET'])
+@token_required
+def get_career_advice_history(current_user_id):
+    try:
+        return history_response(advice_history, current_user_id)
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/search', methods=['GET'])
+@token_required
+def search_history(current_user_id):
+    """Ranked search over the user's tasks, career advice and roadmaps.
+
+    Query parameters: `q` (required), `types` (comma-separated subset of
+    task, advice, roadmap), `limit` and `offset` for pagination.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit')) or HISTORY_PAGE_SIZE
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+        except ValueError:
+            raise InvalidQuery('offset must be an integer')
+        with span('search'):
+            result = history_search.search(storage, current_user_id, request.args.get('q'),
+                                           kinds=parse_kinds(request.args.get('types')), limit=limit, offset=offset)
+        result['next_offset'] = offset + limit if offset + limit < result['total'] else None
+        return jsonify(result)
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -510,11 +1207,9 @@ def get_user_roadmaps(current_user_id):
 @token_required
 def get_user_profile(current_user_id):
     try:
-        user_response = supabase.table('users').select(
-            "id, name, email, education_level, academic_year, school_grade, field_of_study, institution_name").eq('id',
-                                                                                                                  current_user_id).execute()
-        if user_response.data:
-            return jsonify(user_response.data[0])
+        profile = load_user_profile(current_user_id)
+        if profile:
+            return jsonify(profile)
         else:
             return jsonify({'error': 'User not found'}), 404
     except Exception as e:
@@ -532,7 +1227,9 @@ def update_user_profile(current_user_id):
         data.pop('id', None)
         data.pop('created_at', None)
 
-        response = supabase.table('users').update(data).eq('id', current_user_id).execute()
+        response = storage.table('users').update(data).eq('id', current_user_id).execute()
+        profile_cache.invalidate(current_user_id)
+        g.pop('user_profile', None)
         if response.data:
             return jsonify(response.data[0])
         else:
@@ -546,56 +1243,152 @@ def update_user_profile(current_user_id):
 @token_required
 def get_analytics(current_user_id):
     try:
-        # Get tasks analytics
-        tasks_response = supabase.table('tasks').select("*").eq('user_id', current_user_id).execute()
-        tasks = tasks_response.data
-
-        total_tasks = len(tasks)
-        completed_tasks = len([t for t in tasks if t['status'] == 'completed'])
-        pending_tasks = len([t for t in tasks if t['status'] == 'pending'])
-
-        # Calculate overdue tasks
-        overdue_tasks = 0
-        for task in tasks:
-            if task['status'] == 'pending':
-                try:
-                    due_date = datetime.fromisoformat(task['due_date'].replace('Z', '+00:00'))
-                    if due_date < datetime.now():
-                        overdue_tasks += 1
-                except:
-                    pass
-
-        # Get career advice count
-        advice_response = supabase.table('career_advice').select("id").eq('user_id', current_user_id).execute()
-        advice_count = len(advice_response.data)
-
-        # Get roadmaps count
-        roadmaps_response = supabase.table('learning_roadmaps').select("id").eq('user_id', current_user_id).execute()
-        roadmaps_count = len(roadmaps_response.data)
-
-        productivity_score = round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0)
-
-        analytics = {
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'pending_tasks': pending_tasks,
-            'overdue_tasks': overdue_tasks,
-            'productivity_score': productivity_score,
-            'career_advice_sessions': advice_count,
-            'learning_roadmaps': roadmaps_count
-        }
+        if analytics_counters is None:
+            return jsonify(analytics_engine.compute(storage, current_user_id))
 
-        return jsonify(analytics)
+        analytics_counters.start_reconciler(get_storage, ANALYTICS_RECONCILE_SECONDS)
+        return jsonify(analytics_counters.read(storage, current_user_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 # Health check endpoint
+# WARMUP=1: each worker builds its clients, opens its upstream connections and primes the formatter and
+# password hasher before it accepts traffic (gunicorn.conf.py post_worker_init, or the ASGI lifespan)
+WARMUP_ENABLED = os.getenv('WARMUP', '0') == '1'
+warmup = Warmup()
+WARMUP_SAMPLE = "## Plan\n| Step | Time |\n|------|------|\n| **Draft** | `2h` |\n- one\n  1. two\n---\nDone."
+
+
+@warmup.step('storage')
+def warm_storage():
+    storage.table('users').select('id').limit(1).execute()
+
+
+@warmup.step('groq')
+def warm_groq():
+    # Opens the pooled TLS connection and checks the API key without spending completion tokens
+    groq_client.models.list()
+
+
+@warmup.step('formatter')
+def warm_formatter():
+    formatter = IncrementalFormatter()
+    formatter.feed(WARMUP_SAMPLE)
+    formatter.close()
+    format_ai_response_with_tables(WARMUP_SAMPLE)
+
+
+@warmup.step('password_hasher')
+def warm_password_hasher():
+    # The dummy hash an unknown-user login is checked against costs a full hash to generate
+    password_hasher.needs_rehash('')
+
+
+def start_background():
+    """Start this worker's revocation sync, reminder and job threads (gunicorn post_worker_init, ASGI lifespan)"""
+    token_service.start_sync(get_storage)
+    deadline_scheduler.start(get_storage)
+    # Not only on the first submit: jobs left in the shared queue by a restart, and expired leases, need a worker
+    job_queue.start()
+
+
+warmup.step('background')(start_background)
+
+
+def run_warmup():
+    if WARMUP_ENABLED:
+        warmup.run()
+
+
+# Readiness probe results are cached per worker for READINESS_CACHE_SECONDS
+readiness = ReadinessCheck(ttl=float(os.getenv('READINESS_CACHE_SECONDS', '5')))
+
+
+@readiness.check('config')
+def config_ready():
+    missing = [name for name in ('SUPABASE_URL', 'SUPABASE_KEY', 'GROQ_API_KEY') if not os.getenv(name)]
+    if STORAGE_BACKEND != 'supabase':
+        missing = [name for name in missing if not name.startswith('SUPABASE_')]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+@readiness.check('storage')
+def storage_ready():
+    storage.table('users').select('id').limit(1).execute()
+
+
 @app.route('/health')
 def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
 
+@app.route('/health/live')
+def liveness_check():
+    """Liveness: the process serves requests; never touches upstreams, so a slow database does not restart it"""
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
+
+
+@app.route('/health/ready')
+def readiness_check():
+    """Readiness: configuration is present, storage answers and warmup (when enabled) has finished"""
+    if WARMUP_ENABLED and not warmup.done:
+        return jsonify({'status': 'starting', 'checks': {'warmup': 'pending'}}), 503
+    ready, checks = readiness.run()
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
+
+
+def metrics_token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                                     f'Bearer {METRICS_TOKEN}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+# Internal counters for the performance layers; set METRICS_TOKEN to require a bearer token
+@app.route('/internal/stats')
+@metrics_token_required
+def internal_stats():
+    return jsonify(component_stats())
+
+
+def component_stats():
+    return {
+        'llm_cache': llm_cache.stats(),
+        'analytics_counters': analytics_counters.stats() if analytics_counters is not None else None,
+        'deadlines': deadline_scheduler.stats(),
+        'token_cache': token_cache.stats(),
+        'auth_tokens': token_service.stats(),
+        'profile_cache': profile_cache.stats(),
+        'password_hasher': password_hasher.stats(),
+        'login_throttle': {'email': login_email_limiter.stats(), 'ip': login_ip_limiter.stats()},
+        'groq_single_flight': groq_flights.stats(),
+        'http_pools': client_pool.stats(),
+        'jobs': job_queue.stats(),
+        'groq_rate_limiter': groq_limiter.stats(),
+        'advice_history': advice_history.stats(),
+        'roadmap_history': roadmap_history.stats(),
+        'search': history_search.stats(),
+        'storage': storage.stats() if storage.ready and hasattr(storage.get(), 'stats') else
+        {'engine': STORAGE_BACKEND, 'ready': storage.ready},
+        'compression': compressor.stats(),
+        'warmup': warmup.stats()
+    }
+
+
+metrics_registry.add_stats_collector(component_stats)
+
+
+@app.route('/metrics')
+@metrics_token_required
+def metrics():
+    """Prometheus exposition of this worker's metrics; set METRICS_TOKEN to require a bearer token"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -613,5 +1406,6 @@ def bad_request(error):
 
 
 if __name__ == '__main__':
+    start_background()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
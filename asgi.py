@@ -0,0 +1,519 @@
+"""ASGI entry point with an async execution path for the Groq-backed routes.
+
+The three AI routes are served natively on the event loop with the async Groq
+client and the async Supabase client, so a single process can keep hundreds
+of LLM calls in flight while waiting on I/O. Every other route is delegated
+to the Flask app unchanged.
+
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+
+Tuning:
+    AI_ASYNC_MAX_CONCURRENCY  in-flight AI requests per process (default 256)
+    AI_ASYNC_QUEUE_TIMEOUT    seconds a request may wait for a slot before a 503 (default 5)
+    AI_UPSTREAM_TIMEOUT       seconds allowed for a Groq completion before a 504 (default 60)
+    WARMUP                    1 to warm the worker up during lifespan startup, before it accepts connections
+"""
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from tempfile import SpooledTemporaryFile
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from app import (app as flask_app, verify_token, llm_cache, GROQ_MODEL, sse_event, completion_cache_key,
+                 prompt_fingerprint, on_advice_saved, on_roadmap_saved, profile_cache, advice_history,
+                 roadmap_history, client_pool, groq_limiter, request_timer, format_ai_response_with_tables,
+                 compressor, COMPRESSION_ENABLED, STORAGE_BACKEND, STORAGE_CACHE_TTL, get_storage, groq_sdk,
+                 WARMUP_ENABLED, run_warmup, start_background)
+from storage import AsyncStorage
+from metrics import span, record_span, record_groq_usage, groq_calls
+from formatter import IncrementalFormatter
+from prompts import (GENERATION_PARAMS, timeline_prompt, career_education_context, career_prompt,
+                     roadmap_education_context, roadmap_prompt, skills_text)
+from ratelimit import RateLimited, estimate_tokens, parse_duration
+from singleflight import AsyncSingleFlight
+from user_context import PROFILE_FIELDS
+
+MAX_CONCURRENCY = int(os.getenv('AI_ASYNC_MAX_CONCURRENCY', '256'))
+QUEUE_TIMEOUT = float(os.getenv('AI_ASYNC_QUEUE_TIMEOUT', '5'))
+UPSTREAM_TIMEOUT = float(os.getenv('AI_UPSTREAM_TIMEOUT', '60'))
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.args = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.body = body
+        self.user_id = None
+
+    @property
+    def json(self):
+        return json.loads(self.body or b'null')
+
+    def wants_stream(self):
+        return self.args.get('stream') in ('1', 'true') or 'text/event-stream' in self.headers.get('accept', '')
+
+    def no_cache(self):
+        return 'no-cache' in self.headers.get('cache-control', '')
+
+
+def is_job_submission(scope):
+    args = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if args.get('async', [''])[-1] in ('1', 'true'):
+        return True
+    return any(k.lower() == b'prefer' and b'respond-async' in v for k, v in scope.get('headers', []))
+
+
+async def send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                   + [(k.encode(), v.encode()) for k, v in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class ThreadedWsgiToAsgi:
+    """Serves a WSGI app under ASGI with each request on the event loop's thread pool, so they overlap.
+
+    asgiref's WsgiToAsgi runs the WSGI call thread-sensitively, which puts
+    every Flask request of the process on one shared thread. This is the same
+    translation built only on asgiref's public sync_to_async/async_to_sync.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"The WSGI app cannot serve a {scope['type']} connection")
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            await sync_to_async(self.run, thread_sensitive=False)(scope, body, async_to_sync(send))
+
+    @staticmethod
+    def environ(scope, body):
+        script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+        path_info = scope['path'].encode('utf-8').decode('latin-1')
+        if path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name,
+            'PATH_INFO': path_info,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f'HTTP_{name}'
+            value = value.decode('latin-1')
+            # Repeated headers are folded into one comma-separated value, as WSGI servers do
+            environ[name] = f'{environ[name]},{value}' if name in environ else value
+        return environ
+
+    def run(self, scope, body, send):
+        """Runs on a pool thread; `send` is the connection's send wrapped with async_to_sync"""
+        response = {'start': None, 'sent': False}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and response['sent']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                                 'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]}
+
+        def send_start():
+            if not response['sent']:
+                response['sent'] = True
+                send(response['start'])
+
+        result = self.wsgi_application(self.environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                send_start()
+                if chunk:
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_start()
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+class AsyncAIApp:
+    def __init__(self, wsgi_app):
+        self.fallback = ThreadedWsgiToAsgi(wsgi_app)
+        self.routes = {
+            ('POST', '/api/tasks/ai-timeline'): self.generate_task_timeline,
+            ('POST', '/api/career-advice'): self.get_career_advice,
+            ('POST', '/api/roadmap/generate'): self.generate_roadmap,
+        }
+        self.flights = AsyncSingleFlight()
+        self._groq = None
+        self._supabase = None
+        self._supabase_lock = None
+        self._slots = None
+
+    # Clients are created lazily on the worker's own event loop
+    @property
+    def groq(self):
+        if self._groq is None:
+            self._groq = groq_sdk.AsyncGroq(api_key=os.getenv('GROQ_API_KEY'), timeout=UPSTREAM_TIMEOUT,
+                                            http_client=client_pool.async_http_client('groq'),
+                                            max_retries=client_pool.settings('groq').retries)
+        return self._groq
+
+    async def supabase(self):
+        if self._supabase is None:
+            if self._supabase_lock is None:
+                self._supabase_lock = asyncio.Lock()
+            async with self._supabase_lock:
+                if self._supabase is None and (STORAGE_BACKEND != 'supabase' or STORAGE_CACHE_TTL > 0):
+                    # The app's own engine, so SQLite is shared and cached reads see these writes
+                    self._supabase = AsyncStorage(get_storage)
+                elif self._supabase is None:
+                    from supabase import acreate_client
+                    from supabase.lib.client_options import AsyncClientOptions
+                    options = AsyncClientOptions(httpx_client=client_pool.async_http_client('supabase'))
+                    self._supabase = await acreate_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'),
+                                                          options=options)
+        return self._supabase
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = None
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+            # Background job submissions return straight away, so the Flask routes enqueue them
+            if handler is not None and is_job_submission(scope):
+                handler = None
+        if handler is None:
+            return await self.fallback(scope, receive, send)
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        request = Request(scope, body)
+
+        # Same histogram as the Flask routes: time until the response headers go out
+        timing = request_timer.start()
+        client_send = send
+        if COMPRESSION_ENABLED:
+            client_send = compressor.asgi_send(send, request.headers.get('accept-encoding'))
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                request_timer.finish(timing, scope['method'], scope['path'], message['status'])
+            await client_send(message)
+
+        try:
+            token = request.headers.get('authorization')
+            if not token:
+                raise HTTPError(401, 'Token is missing')
+            try:
+                current_user_id = verify_token(token)
+                request.user_id = current_user_id
+            except Exception:
+                raise HTTPError(401, 'Token is invalid')
+
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(MAX_CONCURRENCY)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPError(503, 'Server is busy, please retry', [('retry-after', str(int(QUEUE_TIMEOUT) or 1))])
+
+            try:
+                await handler(request, send, current_user_id)
+            finally:
+                self._slots.release()
+        except HTTPError as e:
+            await send_json(send, e.status, {'error': str(e)}, e.headers)
+        except Exception as e:
+            await send_json(send, 500, {'error': str(e)})
+
+    async def warm_up(self):
+        await asyncio.to_thread(run_warmup)
+        try:
+            await self.supabase()
+            self.groq
+        except Exception as e:
+            print(f"Warmup of the async clients failed: {e}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                start_background()
+                if WARMUP_ENABLED:
+                    # The server starts accepting connections once startup completes
+                    await self.warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Closes the pooled connections under both the Groq and Supabase clients
+                await client_pool.aclose()
+                self._groq = None
+                self._supabase = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def education_info(self, user_id):
+        profile = profile_cache.get(user_id)
+        if profile is None:
+            client = await self.supabase()
+            response = await client.table('users').select(PROFILE_FIELDS).eq('id', user_id).execute()
+            profile = response.data[0] if response.data else None
+            if profile is not None:
+                profile_cache.set(user_id, profile)
+        return profile or {}
+
+    async def insert(self, table, record):
+        client = await self.supabase()
+        response = await client.table(table).insert(record).execute()
+        return response.data[0] if response.data else record
+
+    async def generate_completion(self, request, prompt, temperature, max_tokens, cache_key=None, endpoint=None):
+        if cache_key is not None and not request.no_cache():
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        async def complete():
+            with span('groq_rate_limit_wait'):
+                reservation = await self.acquire_budget(request, prompt, max_tokens)
+            groq_calls.inc(1, endpoint, 'complete')
+            try:
+                with span('groq_completion'):
+                    chat_completion = await asyncio.wait_for(self.groq.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model=GROQ_MODEL,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    ), UPSTREAM_TIMEOUT)
+            except (asyncio.TimeoutError, groq_sdk.APITimeoutError):
+                raise HTTPError(504, 'AI service timed out')
+            except groq_sdk.RateLimitError as e:
+                retry_after = max(1, math.ceil(parse_duration(e.response.headers.get('retry-after')) or 1))
+                raise HTTPError(429, 'AI service is busy, please retry shortly', [('retry-after', str(retry_after))])
+            if chat_completion.usage is not None:
+                groq_limiter.settle(reservation, chat_completion.usage.total_tokens)
+                record_groq_usage(endpoint, chat_completion.usage)
+            result = chat_completion.choices[0].message.content
+            if cache_key is not None and result:
+                llm_cache.set(cache_key, result)
+            return result
+
+        flight_key = cache_key or prompt_fingerprint(prompt, temperature, max_tokens)
+        return await self.flights.do(flight_key, complete)
+
+    @staticmethod
+    def reserve_budget(request, prompt, max_tokens):
+        try:
+            return groq_limiter.reserve(request.user_id, estimate_tokens(prompt, max_tokens))
+        except RateLimited as e:
+            raise HTTPError(429, str(e), [('retry-after', e.retry_after_header)])
+
+    @staticmethod
+    async def acquire_budget(request, prompt, max_tokens):
+        try:
+            return await groq_limiter.acquire_async(request.user_id, prompt, max_tokens)
+        except RateLimited as e:
+            raise HTTPError(429, str(e), [('retry-after', e.retry_after_header)])
+
+    async def stream_completion(self, request, send, prompt, temperature, max_tokens, result_key, on_complete,
+                                cache_key=None, endpoint=None):
+        """Async twin of app.stream_ai_response, written straight to the ASGI channel"""
+        cached = llm_cache.get(cache_key) if cache_key is not None and not request.no_cache() else None
+        # Reserved before the response starts, so a shed call is still a plain 429
+        reservation = self.reserve_budget(request, prompt, max_tokens) if cached is None else None
+
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')],
+            })
+
+            async def emit(event, payload):
+                await send({'type': 'http.response.body', 'body': sse_event(event, payload).encode('utf-8'),
+                            'more_body': True})
+
+            async def upstream_chunks():
+                if cached is not None:
+                    yield cached
+                    return
+                await reservation.wait_async()
+                groq_calls.inc(1, endpoint, 'stream')
+                started = time.perf_counter()
+                stream = await self.groq.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model=GROQ_MODEL,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                first_token = True
+                async for chunk in stream:
+                    usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+                    if usage is not None:
+                        groq_limiter.settle(reservation, usage.total_tokens)
+                        record_groq_usage(endpoint, usage)
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        if first_token:
+                            first_token = False
+                            record_span('groq_first_token', time.perf_counter() - started)
+                        yield text
+                record_span('groq_stream', time.perf_counter() - started)
+
+            await emit('start', {})
+            formatter = IncrementalFormatter()
+            parts = []
+            html_parts = []
+            try:
+                async for text in upstream_chunks():
+                    parts.append(text)
+                    await emit('token', {'text': text})
+                    html = formatter.feed(text)
+                    if html:
+                        html_parts.append(html)
+                        await emit('html', {'html': html})
+
+                html = formatter.close()
+                if html:
+                    html_parts.append(html)
+                    await emit('html', {'html': html})
+
+                ai_response = ''.join(parts)
+                formatted_response = ''.join(html_parts)
+                if cache_key is not None and cached is None and ai_response:
+                    llm_cache.set(cache_key, ai_response)
+                await on_complete(ai_response, formatted_response)
+                await emit('done', {result_key: formatted_response})
+            except Exception as e:
+                await emit('error', {'error': str(e)})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Dropped from the limiter's queue if the stream never waited on it (a no-op once granted)
+            if reservation is not None:
+                groq_limiter.cancel(reservation)
+
+    async def generate_task_timeline(self, request, send, current_user_id):
+        data = request.json
+        title = data.get('title', '')
+        description = data.get('description', '')
+        priority = data.get('priority', 'medium')
+
+        prompt = timeline_prompt(title, description, priority)
+        params = GENERATION_PARAMS['timeline']
+        cache_key = completion_cache_key('timeline', **params, title=title, description=description, priority=priority)
+        ai_response = await self.generate_completion(request, prompt, **params, cache_key=cache_key,
+                                                     endpoint='timeline')
+
+        await send_json(send, 200, {'timeline': format_ai_response_with_tables(ai_response)})
+
+    async def get_career_advice(self, request, send, current_user_id):
+        data = request.json
+        user_input = data.get('input', '')
+
+        user_info = await self.education_info(current_user_id)
+        prompt = career_prompt(user_input, career_education_context(user_info))
+
+        async def save_advice(ai_response, formatted_response):
+            advice_data = advice_history.record({
+                'user_id': current_user_id,
+                'user_input': user_input,
+                'ai_response': ai_response,
+                'created_at': datetime.now().isoformat()
+            }, formatted_response)
+            on_advice_saved(current_user_id, await self.insert('career_advice', advice_data))
+
+        params = GENERATION_PARAMS['career_advice']
+        if request.wants_stream():
+            return await self.stream_completion(request, send, prompt, **params, result_key='advice',
+                                                on_complete=save_advice, endpoint='career_advice')
+
+        ai_response = await self.generate_completion(request, prompt, **params, endpoint='career_advice')
+        formatted_response = format_ai_response_with_tables(ai_response)
+        await save_advice(ai_response, formatted_response)
+        await send_json(send, 200, {'advice': formatted_response})
+
+    async def generate_roadmap(self, request, send, current_user_id):
+        data = request.json
+        career_goal = data['career_goal']
+        current_level = data['current_level']
+        timeframe = data['timeframe']
+        interests = data.get('skills', [])
+
+        user_info = await self.education_info(current_user_id)
+        education_context = roadmap_education_context(user_info)
+        skills = skills_text(interests)
+        prompt = roadmap_prompt(career_goal, current_level, timeframe, skills, education_context)
+
+        async def save_roadmap(ai_response, formatted_response):
+            roadmap_record = roadmap_history.record({
+                'user_id': current_user_id,
+                'career_goal': career_goal,
+                'current_level': current_level,
+                'timeframe': timeframe,
+                'roadmap_data': ai_response,
+                'created_at': datetime.now().isoformat()
+            }, formatted_response)
+            on_roadmap_saved(current_user_id, await self.insert('learning_roadmaps', roadmap_record))
+
+        params = GENERATION_PARAMS['roadmap']
+        cache_key = completion_cache_key('roadmap', **params,
+                                         career_goal=career_goal, current_level=current_level,
+                                         timeframe=timeframe, skills=skills.split(', '),
+                                         education_context=education_context)
+        if request.wants_stream():
+            return await self.stream_completion(request, send, prompt, **params, result_key='roadmap',
+                                                on_complete=save_roadmap, cache_key=cache_key, endpoint='roadmap')
+
+        ai_response = await self.generate_completion(request, prompt, **params, cache_key=cache_key,
+                                                     endpoint='roadmap')
+        formatted_response = format_ai_response_with_tables(ai_response)
+        await save_roadmap(ai_response, formatted_response)
+        await send_json(send, 200, {'roadmap': formatted_response})
+
+
+application = AsyncAIApp(flask_app)
@@ -0,0 +1,217 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+SESSIONS_TABLE = 'refresh_tokens'
+ACCESS_TOKEN_TYPE = 'access'
+
+
+def _hash_secret(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+class RevokedSessions:
+    """Session ids revoked within the last access-token lifetime, kept in memory.
+
+    An access token outlives its session's revocation by at most its own
+    lifetime, so an entry is only needed until then; the set therefore stays
+    as small as the number of logouts in one access-token TTL.
+    """
+
+    def __init__(self):
+        # session id -> monotonic time after which no access token of the session can still be valid
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def add(self, session_id, ttl):
+        with self._lock:
+            self._until[session_id] = time.monotonic() + ttl
+
+    def __contains__(self, session_id):
+        until = self._until.get(session_id)
+        return until is not None and until > time.monotonic()
+
+    def merge(self, entries):
+        """Add synced (session id, remaining seconds) pairs and drop expired entries"""
+        now = time.monotonic()
+        with self._lock:
+            for session_id, remaining in entries:
+                self._until[session_id] = max(self._until.get(session_id, 0.0), now + remaining)
+            for session_id in [s for s, until in self._until.items() if until <= now]:
+                del self._until[session_id]
+
+    def __len__(self):
+        return len(self._until)
+
+
+class TokenService:
+    """Short-lived stateless access tokens backed by server-side refresh sessions.
+
+    Login creates a session row (sql/refresh_tokens.sql) holding the hash of
+    an opaque refresh token and returns it with an HS256 access token of
+    `access_ttl` seconds that names the session (`sid`). Access tokens are
+    verified without any database call: the signature and expiry by PyJWT,
+    revocation against an in-memory set of sessions revoked within the last
+    access-token lifetime. That set is updated immediately by logouts in
+    this process and synced from the sessions table every `sync_interval`
+    seconds, so a revoked session stops working everywhere within
+    min(sync_interval, access_ttl). Refreshing rotates the refresh token;
+    the previous one stops working.
+
+    Tokens issued before sessions existed carry no `typ`; they are accepted
+    while `accept_legacy` is set and cannot be revoked.
+    """
+
+    def __init__(self, secret, access_ttl=900, refresh_ttl=30 * 86400, sync_interval=30, accept_legacy=True):
+        self.secret = secret
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.sync_interval = sync_interval
+        self.accept_legacy = accept_legacy
+        self.revoked = RevokedSessions()
+        self._lock = threading.Lock()
+        self._sync_pid = None
+        self._counters = {'issued': 0, 'refreshed': 0, 'refresh_rejected': 0, 'revoked': 0, 'revoked_hits': 0,
+                          'syncs': 0, 'sync_errors': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def access_token(self, user_id, session_id):
+        return jwt.encode({'user_id': user_id, 'sid': session_id, 'typ': ACCESS_TOKEN_TYPE,
+                           'exp': int(time.time()) + self.access_ttl}, self.secret, algorithm='HS256')
+
+    def _tokens(self, user_id, session_id, secret):
+        return {'token': self.access_token(user_id, session_id), 'refresh_token': f'{session_id}.{secret}',
+                'expires_in': self.access_ttl}
+
+    def issue(self, client, user_id):
+        """Start a session for a user who just authenticated; returns the token response fields"""
+        session_id = str(uuid.uuid4())
+        secret = secrets.token_urlsafe(32)
+        now = datetime.now(timezone.utc)
+        client.table(SESSIONS_TABLE).insert({
+            'id': session_id, 'user_id': user_id, 'token_hash': _hash_secret(secret), 'created_at': now.isoformat(),
+            'expires_at': (now + timedelta(seconds=self.refresh_ttl)).isoformat()}).execute()
+        self._count('issued')
+        return self._tokens(user_id, session_id, secret)
+
+    def decode(self, token):
+        """Verify signature, expiry and type; raises jwt.InvalidTokenError (revocation is checked by check())"""
+        claims = jwt.decode(token, self.secret, algorithms=['HS256'])
+        if claims.get('typ', ACCESS_TOKEN_TYPE if self.accept_legacy else None) != ACCESS_TOKEN_TYPE:
+            raise jwt.InvalidTokenError('Not an access token')
+        return claims
+
+    def check(self, claims):
+        """Reject the claims of a revoked session; an in-memory lookup, run for cached claims too"""
+        session_id = claims.get('sid')
+        if session_id is not None and session_id in self.revoked:
+            self._count('revoked_hits')
+            raise jwt.InvalidTokenError('Session revoked')
+
+    def _session(self, client, refresh_token):
+        """The live session row a refresh token belongs to, or None"""
+        session_id, _, secret = (refresh_token or '').partition('.')
+        if not session_id or not secret:
+            return None
+        try:
+            uuid.UUID(session_id)
+        except ValueError:
+            return None
+        rows = client.table(SESSIONS_TABLE).select("id, user_id, token_hash, expires_at, revoked_at") \
+            .eq('id', session_id).execute().data
+        if not rows:
+            return None
+        row = rows[0]
+        if row.get('revoked_at') or _parse_time(row['expires_at']) <= datetime.now(timezone.utc):
+            return None
+        if not hmac.compare_digest(row['token_hash'], _hash_secret(secret)):
+            return None
+        return row
+
+    def refresh(self, client, refresh_token):
+        """New access token and rotated refresh token, or None when the refresh token is not valid"""
+        row = self._session(client, refresh_token)
+        if row is None:
+            self._count('refresh_rejected')
+            return None
+        secret = secrets.token_urlsafe(32)
+        # Conditional on the old hash, so two concurrent refreshes with one token cannot both succeed
+        updated = client.table(SESSIONS_TABLE).update({
+            'token_hash': _hash_secret(secret), 'last_used_at': datetime.now(timezone.utc).isoformat()}) \
+            .eq('id', row['id']).eq('token_hash', row['token_hash']).is_('revoked_at', 'null').execute().data
+        if not updated:
+            self._count('refresh_rejected')
+            return None
+        self._count('refreshed')
+        return self._tokens(row['user_id'], row['id'], secret)
+
+    def revoke(self, client, refresh_token, everywhere=False):
+        """End the refresh token's session (or all of its user's sessions); False if the token is not valid"""
+        row = self._session(client, refresh_token)
+        if row is None:
+            return False
+        query = client.table(SESSIONS_TABLE).update({'revoked_at': datetime.now(timezone.utc).isoformat()})
+        query = query.eq('user_id', row['user_id']) if everywhere else query.eq('id', row['id'])
+        revoked = query.is_('revoked_at', 'null').execute().data
+        for session in revoked:
+            self.revoked.add(session['id'], self.access_ttl)
+        self._count('revoked', len(revoked))
+        return True
+
+    def sync(self, client):
+        """Load sessions revoked within the last access-token lifetime from the sessions table"""
+        now = datetime.now(timezone.utc)
+        rows = client.table(SESSIONS_TABLE).select("id, revoked_at") \
+            .gte('revoked_at', (now - timedelta(seconds=self.access_ttl)).isoformat()).execute().data
+        entries = []
+        for row in rows:
+            remaining = self.access_ttl - (now - _parse_time(row['revoked_at'])).total_seconds()
+            if remaining > 0:
+                entries.append((row['id'], remaining))
+        self.revoked.merge(entries)
+        self._count('syncs')
+
+    def start_sync(self, client_getter):
+        """Run sync() now and every `sync_interval` seconds on a daemon thread (once per process)"""
+        if self._sync_pid == os.getpid():
+            return
+        with self._lock:
+            # Threads do not survive a fork, so each gunicorn worker starts its own
+            if self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+
+        def loop():
+            while True:
+                try:
+                    self.sync(client_getter())
+                except Exception as e:
+                    self._count('sync_errors')
+                    print(f"Revocation sync failed: {e}")
+                time.sleep(self.sync_interval)
+
+        threading.Thread(target=loop, name='revocation-sync', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['revoked_sessions'] = len(self.revoked)
+        stats['access_ttl'] = self.access_ttl
+        return stats
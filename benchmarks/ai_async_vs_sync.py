@@ -0,0 +1,147 @@
+"""Compare sync (gunicorn sync workers) and async (uvicorn workers) throughput on an AI route.
+
+Starts the stub LLM server, boots the app once per mode with the same number
+of worker processes and fires concurrent POST /api/tasks/ai-timeline
+requests at it. Titles are unique per request so the response cache and
+single-flight layer cannot short-circuit the upstream call. The app's
+client-side Groq budget is raised to --groq-rpm so the run measures the
+execution model rather than throttling; calls it sheds are counted apart
+from errors.
+
+    python benchmarks/ai_async_vs_sync.py --requests 400 --concurrency 200 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import jwt
+
+from stub_llm import start_stub_llm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = 'benchmark-secret-key-that-is-long-enough'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_app(mode, port, workers, stub_port, groq_rpm=100000, requests=200):
+    env = dict(os.environ,
+               GROQ_BASE_URL=f'http://127.0.0.1:{stub_port}',
+               GROQ_API_KEY='stub',
+               SUPABASE_URL='http://127.0.0.1:9',
+               SUPABASE_KEY='stub',
+               JWT_SECRET_KEY=JWT_SECRET,
+               LLM_CACHE_DISABLED='timeline',
+               # Every request comes from one user, so the limiter's queue caps must fit the whole run
+               GROQ_RPM=str(groq_rpm),
+               GROQ_TPM=str(groq_rpm * 2000),
+               GROQ_LIMIT_MAX_QUEUE=str(requests),
+               GROQ_LIMIT_MAX_QUEUE_PER_USER=str(requests))
+    command = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', '-w', str(workers),
+               '--timeout', '300', '--backlog', '2048']
+    if mode == 'async':
+        command += ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application']
+    else:
+        command += ['app:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+async def run_load(port, total, concurrency):
+    token = jwt.encode({'user_id': 1, 'exp': int(time.time()) + 3600}, JWT_SECRET)
+    headers = {'Authorization': f'Bearer {token}'}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    shed = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=300, limits=limits) as client:
+        async def one(i):
+            nonlocal errors, shed
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/api/tasks/ai-timeline', headers=headers,
+                                                 json={'title': f'Benchmark task {i}', 'priority': 'high'})
+                    if response.status_code == 429:
+                        shed += 1
+                    elif response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'shed': shed,
+        'seconds': elapsed,
+        'throughput': total / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=1.0, help='stub LLM latency in seconds')
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--groq-rpm', type=int, default=100000, help="the app's GROQ_RPM budget")
+    args = parser.parse_args()
+
+    stub = start_stub_llm(latency=args.latency)
+    print(f'stub LLM latency={args.latency}s workers={args.workers} '
+          f'requests={args.requests} concurrency={args.concurrency} groq rpm={args.groq_rpm}')
+    print(f'{"mode":<6} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"429s":>7} {"errors":>7}')
+
+    for mode in args.modes.split(','):
+        port = free_port()
+        process = start_app(mode, port, args.workers, stub.server_port, args.groq_rpm, args.requests)
+        try:
+            result = asyncio.run(run_load(port, args.requests, args.concurrency))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f'{mode:<6} {result["throughput"]:>8.1f} {result["p50"]:>7.2f}s {result["p95"]:>7.2f}s '
+              f'{result["p99"]:>7.2f}s {result["shed"]:>7} {result["errors"]:>7}')
+
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""pytest-benchmark suite for the AI response formatter.
+
+Measures throughput of format_ai_response_with_tables (whole text) and
+IncrementalFormatter (token-sized chunks) over the roadmap/career/timeline
+responses in benchmarks/corpus, next to the original two-regex formatter as
+a baseline. Output size is recorded in each benchmark's extra_info.
+test_not_slower_than_legacy, a wall-clock comparison against the baseline,
+only runs with BENCH_ASSERT_SPEED=1, so it stays out of runs on shared CI.
+Rendering correctness is covered by tests/test_formatter.py.
+
+    pip install pytest-benchmark
+    pytest benchmarks/bench_formatter.py --benchmark-columns=mean,ops
+    BENCH_ASSERT_SPEED=1 pytest benchmarks/bench_formatter.py -k not_slower
+"""
+import os
+import re
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatter import format_ai_response_with_tables, IncrementalFormatter  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+CORPUS = {name[:-3]: open(os.path.join(CORPUS_DIR, name), encoding='utf-8').read()
+          for name in sorted(os.listdir(CORPUS_DIR)) if name.endswith('.md')}
+# A long response the size of a max_tokens=3000 roadmap
+CORPUS['roadmap_x3'] = '\n'.join([CORPUS['roadmap_data_scientist']] * 3)
+
+
+def legacy_format(response):
+    """The original formatter, kept as the baseline for throughput and size"""
+    response = re.sub(r'\*\*(.*?)\*\*', r'<h3>\1</h3>', response)
+    response = re.sub(r'#{1,3}\s*(.*?)(?:\n|$)', r'<h3>\1</h3>', response)
+    lines = response.split('\n')
+    formatted_lines = []
+    in_table = False
+    for line in lines:
+        if '|' in line and line.strip().startswith('|') and line.strip().endswith('|'):
+            if not in_table:
+                formatted_lines.append('<table style="width:100%; border-collapse: collapse; margin: 1rem 0;">')
+                in_table = True
+                cells = [cell.strip() for cell in line.split('|')[1:-1]]
+                formatted_lines.append('<thead><tr>')
+                for cell in cells:
+                    formatted_lines.append(
+                        f'<th style="background: rgba(102,126,234,0.3); color: #667eea; padding: 0.8rem; border: 1px solid rgba(102,126,234,0.2); text-align: left;">{cell}</th>')
+                formatted_lines.append('</tr></thead><tbody>')
+            elif line.strip().startswith('|') and '---' not in line:
+                cells = [cell.strip() for cell in line.split('|')[1:-1]]
+                formatted_lines.append('<tr>')
+                for cell in cells:
+                    formatted_lines.append(
+                        f'<td style="padding: 0.8rem; border: 1px solid rgba(102,126,234,0.1); vertical-align: top;">{cell}</td>')
+                formatted_lines.append('</tr>')
+        else:
+            if in_table:
+                formatted_lines.append('</tbody></table>')
+                in_table = False
+            if line.strip() and '---' not in line:
+                formatted_lines.append(f'<p style="margin-bottom: 1rem; line-height: 1.6;">{line}</p>')
+    if in_table:
+        formatted_lines.append('</tbody></table>')
+    return '\n'.join(formatted_lines)
+
+
+def stream_format(text, chunk_size=12):
+    formatter = IncrementalFormatter()
+    parts = [formatter.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    parts.append(formatter.close())
+    return ''.join(parts)
+
+
+def _record(benchmark, text, html):
+    benchmark.extra_info['input_bytes'] = len(text.encode('utf-8'))
+    benchmark.extra_info['output_bytes'] = len(html.encode('utf-8'))
+    benchmark.extra_info['legacy_output_bytes'] = len(legacy_format(text).encode('utf-8'))
+
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_format_whole_response(benchmark, name):
+    benchmark.group = f'format:{name}'
+    text = CORPUS[name]
+    html = benchmark(format_ai_response_with_tables, text)
+    _record(benchmark, text, html)
+
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_format_streamed_response(benchmark, name):
+    benchmark.group = f'format:{name}'
+    text = CORPUS[name]
+    html = benchmark(stream_format, text)
+    assert html == format_ai_response_with_tables(text)
+    _record(benchmark, text, html)
+
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_legacy_formatter_baseline(benchmark, name):
+    benchmark.group = f'format:{name}'
+    text = CORPUS[name]
+    html = benchmark(legacy_format, text)
+    _record(benchmark, text, html)
+
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_output_smaller_than_legacy(name):
+    text = CORPUS[name]
+    assert len(format_ai_response_with_tables(text)) < len(legacy_format(text))
+
+
+def _best_of(fn, text, rounds=5, repeats=20, number=20):
+    """Per-call seconds: the minimum over `rounds` batches of `repeats` x `number` calls"""
+    best = float('inf')
+    for _ in range(rounds * repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(text)
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+@pytest.mark.skipif(os.environ.get('BENCH_ASSERT_SPEED') != '1',
+                    reason='wall-clock timing assertion; set BENCH_ASSERT_SPEED=1 to run it')
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_not_slower_than_legacy(name):
+    text = CORPUS[name]
+    # Interleaved, so a noisy neighbour slows both sides alike; the minimum is the least noisy estimate
+    new = legacy = float('inf')
+    for _ in range(5):
+        new = min(new, _best_of(format_ai_response_with_tables, text, rounds=1))
+        legacy = min(legacy, _best_of(legacy_format, text, rounds=1))
+    assert new <= legacy, f'{name}: {new * 1e6:.1f}us vs legacy {legacy * 1e6:.1f}us'
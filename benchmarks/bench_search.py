@@ -0,0 +1,84 @@
+"""pytest-benchmark suite for the local search index (search.py).
+
+Indexes synthetic histories of 1k, 10k and 50k documents (tasks plus career
+advice and roadmaps built from benchmarks/corpus) and measures a selective
+query (ten matches at every size), a common-term query (a sixth of the
+history matches) and an incremental task update at each size. Query latency
+follows the number of matches, not the history size, so the selective query
+and the update should stay flat.
+
+    pip install pytest-benchmark
+    pytest benchmarks/bench_search.py --benchmark-columns=mean,ops
+"""
+import os
+import random
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import _UserIndex, tokenize  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+CORPUS = [open(os.path.join(CORPUS_DIR, name), encoding='utf-8').read()
+          for name in sorted(os.listdir(CORPUS_DIR)) if name.endswith('.md')]
+SIZES = (1000, 10000, 50000)
+VOCABULARY = ('review', 'deploy', 'budget', 'interview', 'portfolio', 'migration', 'report', 'lecture', 'sprint',
+              'invoice', 'workshop', 'thesis', 'dataset', 'benchmark', 'onboarding', 'release', 'audit', 'demo')
+
+_indexes = {}
+
+
+def build_index(size, seed=42):
+    """One user's index: every 50th document is an AI response, the rest are tasks"""
+    if size in _indexes:
+        return _indexes[size]
+    rng = random.Random(seed)
+    index = _UserIndex()
+    for doc_id in range(1, size + 1):
+        if doc_id % 50 == 0:
+            kind = 'advice' if doc_id % 100 else 'roadmap'
+            title_column = 'user_input' if kind == 'advice' else 'career_goal'
+            body_column = 'ai_response' if kind == 'advice' else 'roadmap_data'
+            row = {title_column: f'{rng.choice(VOCABULARY)} plan', body_column: rng.choice(CORPUS)}
+        else:
+            kind = 'task'
+            words = rng.sample(VOCABULARY, 3)
+            row = {'title': f'{words[0]} {words[1]} #{doc_id}', 'description': f'Follow up on the {words[2]}'}
+            if doc_id % (size // 10) == 1:
+                # Ten documents at every size, so the selective query's matches stay constant
+                row['title'] += ' keynote'
+        row.update(id=doc_id, created_at=f'2025-01-01T00:00:{doc_id:06d}')
+        index.add(kind, row)
+    _indexes[size] = index
+    return index
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_selective_query(benchmark, size):
+    benchmark.group = 'search:selective'
+    index = build_index(size)
+    total, results = benchmark(index.search, tokenize('keynote'), None, 20, 0)
+    benchmark.extra_info['matches'] = total
+    assert total == 10
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_common_term_query(benchmark, size):
+    benchmark.group = 'search:common'
+    index = build_index(size)
+    total, results = benchmark(index.search, tokenize('review'), None, 20, 0)
+    benchmark.extra_info['matches'] = total
+    assert len(results) == 20
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_task_update(benchmark, size):
+    benchmark.group = 'search:update'
+    index = build_index(size)
+    row = {'id': 1, 'title': 'Review the migration plan', 'description': 'Follow up on the audit',
+           'created_at': '2025-01-01T00:00:000001'}
+    benchmark(index.add, 'task', row)
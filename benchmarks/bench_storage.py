@@ -0,0 +1,72 @@
+"""pytest-benchmark suite for the storage engines (storage.py).
+
+Seeds an SQLite database (WAL, on disk) with 500 users of 200 tasks each and
+measures the dashboard's first-page task read (GET /api/tasks?limit=20), a
+single-task update and the same read through CachedStorage, hot and right
+after a write.
+
+    pip install pytest-benchmark
+    pytest benchmarks/bench_storage.py --benchmark-columns=mean,ops
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CachedStorage, SQLiteStorage  # noqa: E402
+
+USERS = 500
+TASKS_PER_USER = 200
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    engine = SQLiteStorage(str(tmp_path_factory.mktemp('storage') / 'bench.db'))
+    start = datetime(2025, 1, 1)
+    for user_id in range(1, USERS + 1):
+        engine.table('tasks').insert([{
+            'user_id': user_id, 'title': f'Task {n}', 'description': 'Seeded task', 'due_date': '2025-02-01',
+            'due_time': '23:59', 'priority': 'medium', 'status': 'pending',
+            'created_at': (start + timedelta(minutes=n)).isoformat(),
+            'updated_at': (start + timedelta(minutes=n)).isoformat()} for n in range(TASKS_PER_USER)]).execute()
+    return engine
+
+
+def first_page(client, user_id):
+    return client.table('tasks').select('*').eq('user_id', user_id) \
+        .order('created_at', desc=True).order('id', desc=True).limit(21).execute().data
+
+
+def test_sqlite_first_page(benchmark, engine):
+    benchmark.group = 'storage:read'
+    rows = benchmark(first_page, engine, 250)
+    assert len(rows) == 21
+
+
+def test_cached_first_page(benchmark, engine):
+    benchmark.group = 'storage:read'
+    cached = CachedStorage(engine, ttl=60)
+    first_page(cached, 250)
+    rows = benchmark(first_page, cached, 250)
+    assert len(rows) == 21
+
+
+def test_sqlite_update(benchmark, engine):
+    benchmark.group = 'storage:write'
+    benchmark(lambda: engine.table('tasks').update({'status': 'completed'}).eq('id', 1).eq('user_id', 1).execute())
+
+
+def test_cached_read_after_write(benchmark, engine):
+    benchmark.group = 'storage:write'
+    cached = CachedStorage(engine, ttl=60)
+
+    def write_then_read():
+        cached.table('tasks').update({'status': 'pending'}).eq('id', 1).eq('user_id', 1).execute()
+        return first_page(cached, 1)
+
+    benchmark(write_then_read)
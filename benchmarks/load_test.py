@@ -0,0 +1,270 @@
+"""Scripted load scenarios against the app with local Supabase and Groq stand-ins.
+
+Seeds the stub Supabase server (stub_supabase.py), starts the stub LLM
+(stub_llm.py), boots the app under gunicorn and runs each scenario in turn,
+reporting throughput and p50/p95/p99 latency per route plus the upstream
+calls each scenario cost. Request schedules come from --seed, so two runs
+issue the same requests in the same order.
+
+Scenarios:
+    login      login storm: every virtual user logs in at once
+    dashboard  dashboard polling: each virtual user loads GET /api/tasks?limit=20
+               and GET /api/analytics every --poll-interval seconds for --duration
+    roadmap    roadmap burst: --burst concurrent POST /api/roadmap/generate
+               requests with distinct goals, so the response cache cannot help
+
+    python benchmarks/load_test.py --users 200 --workers 4
+    python benchmarks/load_test.py --scenarios dashboard --worker-class gthread --threads 8
+    python benchmarks/load_test.py --json baseline.json
+    python benchmarks/load_test.py --baseline baseline.json --max-regression 0.25
+
+With --baseline the run exits non-zero when any route's p95 grew, or its
+throughput fell, by more than --max-regression against the saved run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+import jwt
+
+from ai_async_vs_sync import free_port, percentile
+from stub_llm import start_stub_llm
+from stub_supabase import SEED_PASSWORD, start_stub_supabase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = 'benchmark-secret-key-that-is-long-enough'
+SCENARIOS = ('login', 'dashboard', 'roadmap')
+ROADMAP_LEVELS = ('beginner', 'intermediate', 'advanced')
+
+
+def start_app(args, port, supabase_port, llm_port):
+    env = dict(os.environ,
+               SUPABASE_URL=f'http://127.0.0.1:{supabase_port}',
+               SUPABASE_KEY='stub',
+               GROQ_BASE_URL=f'http://127.0.0.1:{llm_port}',
+               GROQ_API_KEY='stub',
+               JWT_SECRET_KEY=JWT_SECRET,
+               # The client-side Groq budget would otherwise shed most of a burst; --groq-rpm tests shedding
+               GROQ_RPM=str(args.groq_rpm),
+               GROQ_TPM=str(args.groq_rpm * 2000),
+               GROQ_LIMIT_MAX_QUEUE_PER_USER=str(args.burst),
+               # Every virtual user logs in from 127.0.0.1
+               LOGIN_MAX_PER_IP=str(args.users * 10))
+    command = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+               '--timeout', '300', '--backlog', '2048']
+    if args.worker_class == 'uvicorn':
+        command += ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application']
+    else:
+        if args.worker_class == 'gthread':
+            command += ['-k', 'gthread', '--threads', str(args.threads)]
+        command += ['app:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=None if args.verbose else subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('app server did not start')
+
+
+class Recorder:
+    """Latencies and failures per route for one scenario"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    async def request(self, client, route, method, url, expect=200, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code != expect
+        except httpx.HTTPError:
+            response, failed = None, True
+        self.latencies[route].append(time.perf_counter() - started)
+        if failed:
+            self.errors[route] += 1
+        return response
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        result = {}
+        for route, latencies in sorted(self.latencies.items()):
+            result[route] = {
+                'requests': len(latencies),
+                'errors': self.errors[route],
+                'throughput': round(len(latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+                'p50': round(percentile(latencies, 50), 4),
+                'p95': round(percentile(latencies, 95), 4),
+                'p99': round(percentile(latencies, 99), 4),
+            }
+        return result
+
+
+def auth_headers(user_id):
+    token = jwt.encode({'user_id': user_id, 'exp': int(time.time()) + 3600}, JWT_SECRET)
+    return {'Authorization': f'Bearer {token}'}
+
+
+async def login_storm(client, args, rng, recorder):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    user_ids = list(range(1, args.users + 1))
+    rng.shuffle(user_ids)
+
+    async def login(user_id):
+        async with semaphore:
+            await recorder.request(client, 'POST /api/auth/login', 'POST', '/api/auth/login',
+                                   json={'email': f'user{user_id}@bench.local', 'password': SEED_PASSWORD})
+
+    await asyncio.gather(*(login(user_id) for user_id in user_ids))
+
+
+async def dashboard_polling(client, args, rng, recorder):
+    deadline = time.perf_counter() + args.duration
+    # Staggered start offsets, as real dashboards are not opened in lockstep
+    offsets = [rng.uniform(0, args.poll_interval) for _ in range(args.users)]
+
+    async def poll(user_id, offset):
+        headers = auth_headers(user_id)
+        await asyncio.sleep(offset)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await recorder.request(client, 'GET /api/tasks', 'GET', '/api/tasks', headers=headers,
+                                   params={'limit': 20})
+            await recorder.request(client, 'GET /api/analytics', 'GET', '/api/analytics', headers=headers)
+            await asyncio.sleep(max(0.0, args.poll_interval - (time.perf_counter() - started)))
+
+    await asyncio.gather(*(poll(user_id, offset) for user_id, offset in zip(range(1, args.users + 1), offsets)))
+
+
+async def roadmap_burst(client, args, rng, recorder):
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def generate(index):
+        user_id = index % args.users + 1
+        body = {'career_goal': f'Benchmark goal {args.seed}-{index}', 'current_level': rng.choice(ROADMAP_LEVELS),
+                'timeframe': f'{rng.randint(3, 12)} months', 'skills': ['python', 'sql']}
+        async with semaphore:
+            await recorder.request(client, 'POST /api/roadmap/generate', 'POST', '/api/roadmap/generate',
+                                   headers=auth_headers(user_id), json=body)
+
+    await asyncio.gather(*(generate(index) for index in range(args.burst)))
+
+
+SCENARIO_RUNNERS = {'login': login_storm, 'dashboard': dashboard_polling, 'roadmap': roadmap_burst}
+
+
+async def run_scenario(name, port, args):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=300, limits=limits) as client:
+        await SCENARIO_RUNNERS[name](client, args, random.Random(f'{args.seed}-{name}'), recorder)
+    recorder.finish()
+    return recorder.summary()
+
+
+def compare(results, baseline, max_regression):
+    """Regression messages for routes whose p95 or throughput moved past the tolerance"""
+    problems = []
+    for scenario, routes in results.items():
+        for route, current in routes.items():
+            previous = baseline.get(scenario, {}).get(route)
+            if previous is None:
+                continue
+            if previous['p95'] and current['p95'] > previous['p95'] * (1 + max_regression):
+                problems.append(f'{scenario} {route}: p95 {previous["p95"]:.3f}s -> {current["p95"]:.3f}s')
+            if current['throughput'] < previous['throughput'] * (1 - max_regression):
+                problems.append(f'{scenario} {route}: throughput {previous["throughput"]:.1f} -> '
+                                f'{current["throughput"]:.1f} req/s')
+    return problems
+
+
+def print_report(name, routes, upstream):
+    print(f'\n[{name}] supabase calls={upstream["supabase"]} groq calls={upstream["groq"]}')
+    print(f'{"route":<30} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8}')
+    for route, stats in routes.items():
+        print(f'{route:<30} {stats["requests"]:>9} {stats["errors"]:>7} {stats["throughput"]:>8.1f} '
+              f'{stats["p50"] * 1000:>6.1f}ms {stats["p95"] * 1000:>6.1f}ms {stats["p99"] * 1000:>6.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--users', type=int, default=100, help='seeded users, one virtual user each')
+    parser.add_argument('--tasks-per-user', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=100, help='open connections to the app')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of dashboard polling')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--burst', type=int, default=50, help='roadmap requests in the burst')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', choices=('sync', 'gthread', 'uvicorn'), default='sync')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker')
+    parser.add_argument('--db-latency', type=float, default=0.005, help='stub Supabase seconds per request')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='stub LLM seconds before the first byte')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='stub LLM seconds between streamed chunks')
+    parser.add_argument('--no-rpc', action='store_true', help='serve the analytics RPC as missing')
+    parser.add_argument('--groq-rpm', type=int, default=100000, help="the app's GROQ_RPM budget")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    parser.add_argument('--verbose', action='store_true', help="show the app's stderr")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIO_RUNNERS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    supabase = start_stub_supabase(latency=args.db_latency, users=args.users, tasks_per_user=args.tasks_per_user,
+                                   rpc=not args.no_rpc, seed=args.seed)
+    llm = start_stub_llm(latency=args.llm_latency, token_delay=args.token_delay)
+    port = free_port()
+    process = start_app(args, port, supabase.server_port, llm.server_port)
+    print(f'{args.worker_class} workers={args.workers} users={args.users} concurrency={args.concurrency} '
+          f'db latency={args.db_latency}s llm latency={args.llm_latency}s seed={args.seed}')
+
+    results = {}
+    try:
+        for name in scenarios:
+            before = (supabase.requests_served, llm.requests_served)
+            results[name] = asyncio.run(run_scenario(name, port, args))
+            upstream = {'supabase': supabase.requests_served - before[0], 'groq': llm.requests_served - before[1]}
+            print_report(name, results[name], upstream)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        supabase.shutdown()
+        llm.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f'REGRESSION {problem}')
+        if problems:
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.max_regression:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
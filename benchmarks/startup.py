@@ -0,0 +1,143 @@
+"""Measure cold-start time: importing the app and booting gunicorn workers until they serve traffic.
+
+Import: times `import app` in fresh interpreters, as it is now (clients built
+on first use), with the Supabase and Groq clients then built eagerly the way
+the import used to, and with no upstream settings in the environment at all.
+
+Boot: starts the stub Supabase and LLM servers, spawns gunicorn (sync and
+uvicorn workers, with and without WARMUP=1) and records the time until
+/health/live and /health/ready first answer 200, then the latency of the
+first GET /api/tasks and the first AI timeline request against the fresh
+workers next to the median of the requests after them.
+
+    python benchmarks/startup.py --runs 5 --workers 1
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import jwt
+
+from ai_async_vs_sync import ROOT, JWT_SECRET, free_port
+from stub_llm import start_stub_llm
+from stub_supabase import start_stub_supabase
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+if {eager}:
+    app.storage.get()
+    app.groq_client.get()
+print(imported - started, time.perf_counter() - started)
+"""
+UPSTREAM_SETTINGS = ('SUPABASE_URL', 'SUPABASE_KEY', 'GROQ_API_KEY', 'GROQ_BASE_URL')
+
+
+def app_env(supabase_port, llm_port, **extra):
+    return dict(os.environ, SUPABASE_URL=f'http://127.0.0.1:{supabase_port}', SUPABASE_KEY='stub',
+                GROQ_BASE_URL=f'http://127.0.0.1:{llm_port}', GROQ_API_KEY='stub', JWT_SECRET_KEY=JWT_SECRET,
+                LLM_CACHE_DISABLED='timeline', **extra)
+
+
+def time_import(env, eager, runs):
+    """Median (import seconds, import + clients seconds) over fresh interpreters; None if the import fails"""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET.format(eager=eager)], cwd=ROOT, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        samples.append([float(value) for value in result.stdout.split()[-2:]])
+    return tuple(statistics.median(column) for column in zip(*samples))
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f'{url} did not answer 200')
+
+
+def boot(mode, warmup, workers, env):
+    """Seconds to live and ready, plus first and median later latencies of the task list and AI routes"""
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', '-w', str(workers), '--timeout', '120']
+    if mode == 'async':
+        command += ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application']
+    else:
+        command += ['app:app']
+    base = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=dict(env, WARMUP='1' if warmup else '0'),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + 60
+        live = wait_for(f'{base}/health/live', deadline) - started
+        ready = wait_for(f'{base}/health/ready', deadline) - started
+
+        token = jwt.encode({'user_id': 1, 'exp': int(time.time()) + 3600}, JWT_SECRET)
+        latencies = {'tasks': [], 'ai': []}
+        # Connection: close, so the first few requests land on workers that have not served anything yet
+        with httpx.Client(base_url=base, timeout=60,
+                          headers={'Authorization': f'Bearer {token}', 'Connection': 'close'}) as client:
+            for i in range(10):
+                request_started = time.perf_counter()
+                client.get('/api/tasks').raise_for_status()
+                latencies['tasks'].append(time.perf_counter() - request_started)
+                request_started = time.perf_counter()
+                client.post('/api/tasks/ai-timeline',
+                            json={'title': f'Startup benchmark {i}', 'priority': 'high'}).raise_for_status()
+                latencies['ai'].append(time.perf_counter() - request_started)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {'live': live, 'ready': ready,
+            **{f'{route}_first': values[0] for route, values in latencies.items()},
+            **{f'{route}_rest': statistics.median(values[workers:]) for route, values in latencies.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters / boots per variant')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--modes', default='sync,async')
+    args = parser.parse_args()
+
+    supabase = start_stub_supabase(users=10, tasks_per_user=20)
+    llm = start_stub_llm(latency=0.0)
+    env = app_env(supabase.server_port, llm.server_port)
+    bare_env = {name: value for name, value in env.items() if name not in UPSTREAM_SETTINGS}
+
+    print(f'{"import":<22} {"median":>9}')
+    for label, variant_env, eager in (('lazy clients', env, False), ('eager clients', env, True),
+                                      ('no upstream settings', bare_env, False)):
+        timing = time_import(variant_env, eager, args.runs)
+        print(f'{label:<22} {"failed" if timing is None else f"{timing[1] * 1000:>7.1f}ms":>9}')
+
+    print(f'\nboot (workers={args.workers}, median of {args.runs})')
+    print(f'{"mode":<6} {"warmup":<7} {"live":>8} {"ready":>8} {"tasks 1st":>10} {"tasks":>8} '
+          f'{"ai 1st":>8} {"ai":>8}')
+    for mode in args.modes.split(','):
+        for warmup in (False, True):
+            runs = [boot(mode, warmup, args.workers, env) for _ in range(args.runs)]
+            result = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            print(f'{mode:<6} {"on" if warmup else "off":<7} {result["live"]:>6.0f}ms {result["ready"]:>6.0f}ms '
+                  f'{result["tasks_first"]:>8.1f}ms {result["tasks_rest"]:>6.1f}ms '
+                  f'{result["ai_first"]:>6.1f}ms {result["ai_rest"]:>6.1f}ms')
+
+    supabase.shutdown()
+    llm.shutdown()
+
+
+if __name__ == '__main__':
+    main()
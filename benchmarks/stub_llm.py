@@ -0,0 +1,143 @@
+"""Stub Groq (OpenAI-compatible) chat completions server for benchmarks.
+
+Serves POST /openai/v1/chat/completions with a canned markdown response after
+a configurable delay (and GET /openai/v1/models, which warmup calls), either as one JSON body or as a token stream (8
+characters per chunk, `token_delay` apart, usage on the final chunk). Point the
+app at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/stub_llm.py --port 8081 --latency 1.5
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = """## 🚀 Plan
+
+### 📊 Overview
+| Aspect | Details |
+|--------|---------|
+| Duration | 2 days |
+| Effort | Medium |
+
+**Breakdown:**
+- Research the topic
+- Draft the outline
+- Write and review
+
+Keep a steady pace and review your progress daily.
+"""
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, latency=1.0, token_delay=0.0, response_text=DEFAULT_RESPONSE):
+        super().__init__(address, StubLLMHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.response_text = response_text
+        self.requests_served = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests_served += 1
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY a keep-alive client waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if not self.path.endswith('/models'):
+            self.send_error(404)
+            return
+        body = json.dumps({'object': 'list', 'data': [
+            {'id': 'llama3-8b-8192', 'object': 'model', 'created': 0, 'owned_by': 'stub'}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        self.server.count_request()
+        time.sleep(self.server.latency)
+        model = payload.get('model', 'stub')
+        text = self.server.response_text
+        prompt_tokens = sum(len(m.get('content', '')) for m in payload.get('messages', [])) // 4
+        completion_tokens = len(text) // 4
+
+        if payload.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for i in range(0, len(text), 8):
+                chunk = {
+                    'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': text[i:i + 8]}, 'finish_reason': None}],
+                }
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+            # Groq reports usage on a final empty chunk under x_groq
+            final = {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                'x_groq': {'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                                     'total_tokens': prompt_tokens + completion_tokens}},
+            }
+            self.wfile.write(f'data: {json.dumps(final)}\n\n'.encode('utf-8'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.close_connection = True
+            return
+
+        body = json.dumps({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_llm(port=0, latency=1.0, token_delay=0.0):
+    """Start the stub in a background thread; returns the server (its port is server.server_port)"""
+    server = StubLLMServer(('127.0.0.1', port), latency=latency, token_delay=token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before the first byte')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between streamed chunks')
+    args = parser.parse_args()
+    server = StubLLMServer(('127.0.0.1', args.port), latency=args.latency, token_delay=args.token_delay)
+    print(f'Stub LLM listening on http://127.0.0.1:{args.port}')
+    server.serve_forever()
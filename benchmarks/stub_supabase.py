@@ -0,0 +1,425 @@
+"""Stub Supabase (PostgREST) server for benchmarks and load tests.
+
+Serves /rest/v1/<table> and /rest/v1/rpc/user_task_analytics from in-memory
+tables, with the subset of PostgREST the app uses: select projections,
+eq/neq/gt/gte/lt/lte/in/is filters, or=(...) logic trees (keyset
+pagination), order, limit, count=exact, and inserts/updates/deletes that
+return the affected rows. Tables are seeded deterministically: every seeded
+user has the email user<N>@bench.local and the password SEED_PASSWORD.
+Point the app at it with SUPABASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/stub_supabase.py --port 8082 --users 1000 --tasks-per-user 50 --latency 0.005
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from werkzeug.security import generate_password_hash
+
+SEED_PASSWORD = 'benchmark-password'
+TABLES = ('users', 'tasks', 'task_tombstones', 'career_advice', 'learning_roadmaps', 'refresh_tokens')
+# Equality lookups on these columns use a hash index instead of a table scan
+INDEXED_COLUMNS = ('id', 'user_id', 'email')
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'or', 'and', 'columns', 'on_conflict'}
+OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+}
+EDUCATION_LEVELS = ('school', 'college', 'other')
+FIELDS_OF_STUDY = ('Computer Science', 'Biology', 'Economics', 'Design', 'General')
+
+
+def _unquote_value(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+def _split_top_level(text):
+    """Split a PostgREST logic tree body on the commas that are not inside parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quoted and char == '\\':
+            current.append(text[index:index + 2])
+            index += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            index += 1
+            continue
+        current.append(char)
+        index += 1
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def _coerce(sample, value):
+    """Compare a filter value as the type of the stored column"""
+    if isinstance(sample, bool):
+        return value.lower() == 'true'
+    if isinstance(sample, int):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _condition(column, expression):
+    """Row predicate for `column` and a PostgREST operator expression such as "eq.5" or "in.(1,2)" """
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition('.')
+    if op == 'in':
+        values = [_unquote_value(v) for v in _split_top_level(raw.strip('()'))]
+
+        def test(row):
+            value = row.get(column)
+            return value is not None and value in [_coerce(value, v) for v in values]
+    elif op == 'is':
+        expected = {'null': None, 'true': True, 'false': False}[raw]
+
+        def test(row):
+            return row.get(column) is expected
+    elif op in OPERATORS:
+        compare = OPERATORS[op]
+        raw = _unquote_value(raw)
+
+        def test(row):
+            value = row.get(column)
+            return compare(value, _coerce(value, raw)) if value is not None else op == 'neq'
+    else:
+        raise ValueError(f'Unsupported operator: {op}')
+    return (lambda row: not test(row)) if negate else test
+
+
+def _logic_tree(kind, body):
+    """Predicate for an or=(...)/and=(...) parameter body"""
+    conditions = []
+    for part in _split_top_level(body.strip()[1:-1]):
+        if part.startswith(('and(', 'or(')):
+            nested_kind, _, nested_body = part.partition('(')
+            conditions.append(_logic_tree(nested_kind, '(' + nested_body))
+        else:
+            column, _, expression = part.partition('.')
+            conditions.append(_condition(column, expression))
+    combine = any if kind == 'or' else all
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+class Query:
+    """A parsed PostgREST request: filters, projection, order and limit"""
+
+    def __init__(self, params):
+        self.columns = None
+        self.order = []
+        self.limit = None
+        self.offset = 0
+        self.predicates = []
+        # (column, value) equality filters usable with an index
+        self.equalities = []
+        for key, value in params:
+            if key == 'select':
+                columns = [c.strip() for c in value.split(',') if c.strip()]
+                self.columns = None if '*' in columns else columns
+            elif key == 'order':
+                for part in value.split(','):
+                    column, _, direction = part.partition('.')
+                    self.order.append((column, direction.startswith('desc')))
+            elif key == 'limit':
+                self.limit = int(value)
+            elif key == 'offset':
+                self.offset = int(value)
+            elif key in ('or', 'and'):
+                self.predicates.append(_logic_tree(key, value))
+            elif key not in RESERVED_PARAMS:
+                self.predicates.append(_condition(key, value))
+                if value.startswith('eq.'):
+                    self.equalities.append((key, _unquote_value(value[3:])))
+
+    def matches(self, row):
+        return all(predicate(row) for predicate in self.predicates)
+
+    def project(self, row):
+        if self.columns is None:
+            return dict(row)
+        return {column: row.get(column) for column in self.columns}
+
+    def arrange(self, rows):
+        for column, desc in reversed(self.order):
+            # None sorts last ascending, first descending, as PostgreSQL does by default
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else 0),
+                      reverse=desc)
+        rows = rows[self.offset:]
+        if self.limit is not None:
+            rows = rows[:self.limit]
+        return rows
+
+
+class Table:
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.next_id = 1
+        self.indexes = {column: defaultdict(set) for column in INDEXED_COLUMNS}
+
+    def _index(self, row, add):
+        for column, index in self.indexes.items():
+            if row.get(column) is None:
+                continue
+            if add:
+                index[str(row[column])].add(row['id'])
+            else:
+                index[str(row[column])].discard(row['id'])
+
+    def insert(self, record):
+        row = dict(record)
+        row.setdefault('id', self.next_id)
+        if isinstance(row['id'], int):
+            self.next_id = max(self.next_id, row['id']) + 1
+        now = datetime.now().isoformat()
+        row.setdefault('created_at', now)
+        if self.name == 'tasks':
+            row.setdefault('updated_at', now + '+00:00')
+        self.rows[row['id']] = row
+        self._index(row, True)
+        return row
+
+    def select(self, query):
+        candidates = None
+        for column, value in query.equalities:
+            if column in self.indexes:
+                ids = self.indexes[column].get(value, set())
+                candidates = ids if candidates is None else candidates & ids
+        rows = self.rows.values() if candidates is None else (self.rows[i] for i in candidates if i in self.rows)
+        return [row for row in rows if query.matches(row)]
+
+    def update(self, query, changes):
+        updated = []
+        for row in self.select(query):
+            self._index(row, False)
+            row.update(changes)
+            if self.name == 'tasks' and 'updated_at' not in changes:
+                row['updated_at'] = datetime.now().isoformat() + '+00:00'
+            self._index(row, True)
+            updated.append(row)
+        return updated
+
+    def delete(self, query):
+        deleted = self.select(query)
+        for row in deleted:
+            self._index(row, False)
+            del self.rows[row['id']]
+        return deleted
+
+
+class StubSupabaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, latency=0.0, rpc=True):
+        super().__init__(address, StubSupabaseHandler)
+        self.latency = latency
+        # False serves the analytics RPC as missing, exercising the app's scan fallback
+        self.rpc = rpc
+        self.tables = {name: Table(name) for name in TABLES}
+        self.lock = threading.Lock()
+        self.requests_served = 0
+
+    def seed(self, users=100, tasks_per_user=20, roadmaps_per_user=1, seed=42):
+        """Fill the tables deterministically; returns the seeded user ids"""
+        rng = random.Random(seed)
+        # One hash shared by every user: hashing thousands of passwords would dominate start-up
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        epoch = datetime(2025, 1, 1, 9, 0, 0)
+        user_ids = []
+        with self.lock:
+            for n in range(1, users + 1):
+                level = rng.choice(EDUCATION_LEVELS)
+                user = self.tables['users'].insert({
+                    'name': f'Bench User {n}', 'email': f'user{n}@bench.local', 'password_hash': password_hash,
+                    'education_level': level, 'school_grade': '10' if level == 'school' else None,
+                    'academic_year': '2' if level == 'college' else None,
+                    'field_of_study': rng.choice(FIELDS_OF_STUDY), 'institution_name': 'Bench Institute',
+                    'created_at': epoch.isoformat()})
+                user_ids.append(user['id'])
+                for t in range(tasks_per_user):
+                    created = epoch + timedelta(minutes=n * 1000 + t)
+                    self.tables['tasks'].insert({
+                        'user_id': user['id'], 'title': f'Task {t} of user {n}', 'description': 'Seeded task',
+                        'due_date': (created + timedelta(days=rng.randint(-10, 30))).date().isoformat(),
+                        'due_time': '23:59', 'priority': rng.choice(('low', 'medium', 'high')),
+                        'status': 'completed' if rng.random() < 0.4 else 'pending',
+                        'created_at': created.isoformat(), 'updated_at': created.isoformat() + '+00:00'})
+                for r in range(roadmaps_per_user):
+                    self.tables['learning_roadmaps'].insert({
+                        'user_id': user['id'], 'career_goal': 'Data Scientist', 'current_level': 'beginner',
+                        'timeframe': '6 months', 'roadmap_data': '## Roadmap\n\n- Learn Python\n- Learn statistics',
+                        'created_at': (epoch + timedelta(days=r)).isoformat()})
+        return user_ids
+
+    def count_request(self):
+        with self.lock:
+            self.requests_served += 1
+
+
+class StubSupabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY a keep-alive client waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code, message):
+        self._send_json(status, {'code': code, 'message': message, 'details': None, 'hint': None})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null') if length else None
+
+    def _route(self):
+        """(table or rpc name, is_rpc, parsed Query), or None after answering 404"""
+        url = urlsplit(self.path)
+        if not url.path.startswith('/rest/v1/'):
+            self._error(404, 'PGRST000', 'Not found')
+            return None
+        name = unquote(url.path[len('/rest/v1/'):])
+        params = parse_qsl(url.query, keep_blank_values=True)
+        if name.startswith('rpc/'):
+            return name[4:], True, params
+        if name not in self.server.tables:
+            self._error(404, '42P01', f'relation "public.{name}" does not exist')
+            return None
+        return name, False, params
+
+    def _prefers(self, option):
+        return option in self.headers.get('Prefer', '')
+
+    def _handle(self):
+        self.server.count_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        route = self._route()
+        if route is None:
+            return
+        name, is_rpc, params = route
+        # Always drain the body (postgrest-py sends "{}" with deletes) so the kept-alive connection stays in sync
+        body = self._read_body()
+        if is_rpc:
+            self._rpc(name, body or {})
+            return
+        try:
+            query = Query(params)
+        except (ValueError, KeyError) as e:
+            self._error(400, 'PGRST100', str(e))
+            return
+
+        table = self.server.tables[name]
+        with self.server.lock:
+            if self.command in ('GET', 'HEAD'):
+                matched = table.select(query)
+                total = len(matched) if self._prefers('count=') else None
+                rows = query.arrange(matched)
+            elif self.command == 'POST':
+                records = body if isinstance(body, list) else [body]
+                rows = [table.insert(record) for record in records]
+                total = len(rows)
+            elif self.command == 'PATCH':
+                rows = table.update(query, body or {})
+                total = len(rows)
+            else:
+                rows = table.delete(query)
+                total = len(rows)
+            rows = [query.project(row) for row in rows]
+
+        headers = {}
+        if total is not None:
+            headers['Content-Range'] = f'0-{len(rows) - 1}/{total}' if rows else f'*/{total}'
+        status = 201 if self.command == 'POST' else 200
+        if self.command in ('POST', 'PATCH', 'DELETE') and not self._prefers('return=representation'):
+            self._send_json(204 if self.command != 'POST' else 201, None, headers)
+            return
+        self._send_json(status, rows, headers)
+
+    def _rpc(self, name, args):
+        if name != 'user_task_analytics' or not self.server.rpc:
+            self._error(404, 'PGRST202', f'Could not find the function public.{name}')
+            return
+        user_id = str(args.get('p_user_id'))
+        now = str(args.get('p_now'))
+        with self.server.lock:
+            tasks = [self.server.tables['tasks'].rows[i] for i in self.server.tables['tasks'].indexes['user_id'][user_id]]
+            advice = len(self.server.tables['career_advice'].indexes['user_id'][user_id])
+            roadmaps = len(self.server.tables['learning_roadmaps'].indexes['user_id'][user_id])
+        overdue = sum(1 for task in tasks if task.get('status') == 'pending' and
+                      f"{task.get('due_date')}T{task.get('due_time') or '23:59'}" < now)
+        self._send_json(200, [{
+            'total_tasks': len(tasks),
+            'completed_tasks': sum(1 for task in tasks if task.get('status') == 'completed'),
+            'pending_tasks': sum(1 for task in tasks if task.get('status') == 'pending'),
+            'overdue_tasks': overdue,
+            'career_advice_sessions': advice,
+            'learning_roadmaps': roadmaps,
+        }])
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _handle
+
+
+def start_stub_supabase(port=0, latency=0.0, users=100, tasks_per_user=20, rpc=True, seed=42):
+    """Seed and start the stub in a background thread; returns the server (its port is server.server_port)"""
+    server = StubSupabaseServer(('127.0.0.1', port), latency=latency, rpc=rpc)
+    server.seed(users=users, tasks_per_user=tasks_per_user, seed=seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--tasks-per-user', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--no-rpc', action='store_true', help='serve the analytics RPC as missing')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    server = StubSupabaseServer(('127.0.0.1', args.port), latency=args.latency, rpc=not args.no_rpc)
+    server.seed(users=args.users, tasks_per_user=args.tasks_per_user, seed=args.seed)
+    print(f'Stub Supabase listening on http://127.0.0.1:{args.port} '
+          f'({args.users} users, password {SEED_PASSWORD!r})')
+    server.serve_forever()
@@ -0,0 +1,339 @@
+import asyncio
+import importlib
+import os
+import random
+import threading
+import time
+
+import httpx
+
+# Only requests that are safe to repeat are retried; PostgREST reads are GET/HEAD
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUSES = frozenset({502, 503, 504})
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.PoolTimeout,
+                httpx.RemoteProtocolError)
+
+
+class PoolSettings:
+    """Connection pool, timeout and retry settings for one upstream, read from `<PREFIX>_*` env vars.
+
+        <PREFIX>_POOL_MAX_CONNECTIONS   open connections per process (default 20)
+        <PREFIX>_POOL_MAX_KEEPALIVE     idle connections kept open (default 10)
+        <PREFIX>_KEEPALIVE_EXPIRY       seconds an idle connection is kept (default 30)
+        <PREFIX>_HTTP2                  1 to negotiate HTTP/2 (needs the h2 package)
+        <PREFIX>_CONNECT_TIMEOUT        seconds (default 5)
+        <PREFIX>_READ_TIMEOUT           seconds per read (upstream-specific default)
+        <PREFIX>_POOL_TIMEOUT           seconds to wait for a free connection (default 5)
+        <PREFIX>_RETRIES                retries of idempotent requests (default 2)
+        <PREFIX>_RETRY_BACKOFF          base backoff in seconds, full jitter (default 0.2)
+
+    `follow_redirects=False` is for clients posting to user-supplied URLs,
+    whose host is checked before the request: a redirect would skip that check.
+    """
+
+    def __init__(self, prefix, read_timeout=30.0, retries=2, follow_redirects=True):
+        def env(name, default):
+            return os.getenv(f'{prefix}_{name}', default)
+
+        self.prefix = prefix
+        self.max_connections = int(env('POOL_MAX_CONNECTIONS', '20'))
+        self.max_keepalive = int(env('POOL_MAX_KEEPALIVE', '10'))
+        self.keepalive_expiry = float(env('KEEPALIVE_EXPIRY', '30'))
+        self.http2 = env('HTTP2', '0') == '1'
+        self.connect_timeout = float(env('CONNECT_TIMEOUT', '5'))
+        self.read_timeout = float(env('READ_TIMEOUT', str(read_timeout)))
+        self.pool_timeout = float(env('POOL_TIMEOUT', '5'))
+        self.retries = int(env('RETRIES', str(retries)))
+        self.retry_backoff = float(env('RETRY_BACKOFF', '0.2'))
+        self.follow_redirects = follow_redirects
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    def timeout(self):
+        return httpx.Timeout(connect=self.connect_timeout, read=self.read_timeout, write=self.read_timeout,
+                             pool=self.pool_timeout)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(5.0, self.retry_backoff * 2 ** attempt))
+
+
+class _TransportStats:
+    def __init__(self, observer=None):
+        # Called with (request, status, seconds) after every attempt; status is 'error' when none arrived
+        self.observer = observer
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def started(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def finished(self, started, failed, request=None, status='error'):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.in_flight -= 1
+            self.total_seconds += elapsed
+            if failed:
+                self.errors += 1
+        if self.observer is not None and request is not None:
+            self.observer(request, status, elapsed)
+
+    def retried(self):
+        with self.lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'in_flight': self.in_flight, 'retries': self.retries,
+                    'errors': self.errors,
+                    'avg_ms': round(self.total_seconds / self.requests * 1000, 2) if self.requests else 0.0}
+
+
+def _pool_snapshot(pool):
+    # httpcore keeps its connection list public; an unexpected version just reports nothing
+    connections = getattr(pool, 'connections', None)
+    if connections is None:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {'connections': len(connections), 'idle': idle, 'active': len(connections) - idle}
+
+
+class ManagedTransport(httpx.BaseTransport):
+    """Pooled HTTP transport that counts requests and retries idempotent ones with jittered backoff"""
+
+    def __init__(self, settings, observer=None):
+        self.settings = settings
+        self.stats = _TransportStats(observer)
+        self._transport = httpx.HTTPTransport(limits=settings.limits(), http2=settings.http2)
+
+    def handle_request(self, request):
+        retryable = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            started = self.stats.started()
+            try:
+                response = self._transport.handle_request(request)
+            except RETRY_ERRORS:
+                self.stats.finished(started, True, request)
+                if not retryable or attempt >= self.settings.retries:
+                    raise
+            else:
+                failed = response.status_code >= 500
+                self.stats.finished(started, failed, request, response.status_code)
+                if not (failed and retryable and response.status_code in RETRY_STATUSES) or \
+                        attempt >= self.settings.retries:
+                    return response
+                response.close()
+            attempt += 1
+            self.stats.retried()
+            time.sleep(self.settings.backoff(attempt))
+
+    def close(self):
+        self._transport.close()
+
+    def pool_stats(self):
+        return dict(self.stats.snapshot(), **_pool_snapshot(self._transport._pool))
+
+
+class AsyncManagedTransport(httpx.AsyncBaseTransport):
+    """Event-loop twin of ManagedTransport for the ASGI entry point"""
+
+    def __init__(self, settings, observer=None):
+        self.settings = settings
+        self.stats = _TransportStats(observer)
+        self._transport = httpx.AsyncHTTPTransport(limits=settings.limits(), http2=settings.http2)
+
+    async def handle_async_request(self, request):
+        retryable = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            started = self.stats.started()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except RETRY_ERRORS:
+                self.stats.finished(started, True, request)
+                if not retryable or attempt >= self.settings.retries:
+                    raise
+            else:
+                failed = response.status_code >= 500
+                self.stats.finished(started, failed, request, response.status_code)
+                if not (failed and retryable and response.status_code in RETRY_STATUSES) or \
+                        attempt >= self.settings.retries:
+                    return response
+                await response.aclose()
+            attempt += 1
+            self.stats.retried()
+            await asyncio.sleep(self.settings.backoff(attempt))
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def pool_stats(self):
+        return dict(self.stats.snapshot(), **_pool_snapshot(self._transport._pool))
+
+
+class ClientPool:
+    """Per-process httpx clients for each upstream, rebuilt in a child after fork.
+
+    Sockets inherited across a gunicorn fork are shared with the parent, so a
+    child must never reuse them. `http_client(name)` returns this process's
+    client for the upstream, creating it on first use; `reset()` drops every
+    client without closing the parent's sockets and is registered to run in
+    forked children.
+    """
+
+    def __init__(self):
+        self._settings = {}
+        self._hooks = {}
+        self._observers = {}
+        self._clients = {}
+        self._async_clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def configure(self, name, settings, on_response=None, observer=None):
+        """Register an upstream.
+
+        `on_response(status_code, headers)` sees every response the client
+        returns; `observer(request, status, seconds)` is called for every
+        attempt the transport makes, retries included.
+        """
+        self._settings[name] = settings
+        if on_response is not None:
+            self._hooks[name] = on_response
+        if observer is not None:
+            self._observers[name] = observer
+
+    def settings(self, name):
+        return self._settings[name]
+
+    def http_client(self, name):
+        with self._lock:
+            self._check_pid()
+            client = self._clients.get(name)
+            if client is None:
+                settings = self._settings[name]
+                hooks = {}
+                if name in self._hooks:
+                    on_response = self._hooks[name]
+                    hooks['response'] = [lambda response: on_response(response.status_code, response.headers)]
+                client = httpx.Client(transport=ManagedTransport(settings, self._observers.get(name)), timeout=settings.timeout(),
+                                      follow_redirects=settings.follow_redirects, event_hooks=hooks)
+                self._clients[name] = client
+            return client
+
+    def async_http_client(self, name):
+        with self._lock:
+            self._check_pid()
+            client = self._async_clients.get(name)
+            if client is None:
+                settings = self._settings[name]
+                hooks = {}
+                if name in self._hooks:
+                    on_response = self._hooks[name]
+
+                    async def observe(response):
+                        on_response(response.status_code, response.headers)
+                    hooks['response'] = [observe]
+                client = httpx.AsyncClient(transport=AsyncManagedTransport(settings, self._observers.get(name)), timeout=settings.timeout(),
+                                           follow_redirects=settings.follow_redirects, event_hooks=hooks)
+                self._async_clients[name] = client
+            return client
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._clients = {}
+            self._async_clients = {}
+            self._pid = os.getpid()
+
+    def reset(self):
+        # Runs in the child straight after fork; the lock may have been held by another parent thread
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = {}
+        self._pid = os.getpid()
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients = {}
+        for client in clients:
+            await client.aclose()
+
+    def stats(self):
+        with self._lock:
+            clients = [(name, client) for name, client in self._clients.items()] + \
+                [(f'{name}_async', client) for name, client in self._async_clients.items()]
+        result = {'pid': self._pid}
+        for name, client in clients:
+            result[name] = client._transport.pool_stats()
+        return result
+
+
+class LazyClient:
+    """Proxy that builds its client on first use in each process.
+
+    Importing the app stays cheap and does not fail on missing settings:
+    `factory` (which may import the SDK) runs when a request or the warmup
+    hook first touches the client, and again in every forked child, so a
+    gunicorn worker never inherits a client built in the master.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # The lock may have been held by another parent thread at fork time
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = self._factory()
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def ready(self):
+        """True once this process has built its client"""
+        return self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LazyModule:
+    """Module imported on first attribute access, for SDKs whose import is a large share of startup"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
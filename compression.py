@@ -0,0 +1,220 @@
+"""Negotiated gzip/brotli compression and content-hashed static assets.
+
+Compressor compresses JSON/HTML/text responses above a size threshold,
+for the Flask app (an after_request hook) and the natively served ASGI
+routes (a `send` wrapper). Streamed responses (server-sent events) pass
+through untouched. Brotli is used when the `brotli` package is installed
+and the client accepts it, gzip otherwise.
+
+StaticAssets serves the static folder with `?v=<content hash>` URLs from
+url_for('static', ...); a request carrying the current hash is cached by
+the browser for a year as immutable, and the compressed variants of each
+file are built once per process at the highest levels.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, abort, request
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({'application/json', 'text/html', 'text/css', 'text/javascript',
+                                'application/javascript', 'text/plain', 'image/svg+xml'})
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+def negotiate(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for coding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def _mimetype(content_type):
+    return (content_type or '').split(';', 1)[0].strip().lower()
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        # Quality 5 compresses about as fast as gzip -6 and still beats it on size
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._counters = {'responses': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def compress(self, data, encoding, best=False):
+        if encoding == 'br':
+            return brotli.compress(data, quality=11 if best else self.brotli_quality)
+        # mtime=0 keeps the output (and so any ETag derived from it) deterministic
+        return gzip.compress(data, compresslevel=9 if best else self.gzip_level, mtime=0)
+
+    def _count(self, size_in, size_out):
+        with self._lock:
+            self._counters['responses'] += 1
+            self._counters['bytes_in'] += size_in
+            self._counters['bytes_out'] += size_out
+
+    def init_flask(self, app):
+        """Compress eligible Flask responses in an after_request hook"""
+        @app.after_request
+        def compress_response(response):
+            if response.direct_passthrough or response.is_streamed or response.status_code in (204, 206, 304) \
+                    or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+                return response
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.vary.add('Accept-Encoding')
+            encoding = negotiate(request.headers.get('Accept-Encoding'))
+            if encoding is None:
+                return response
+            compressed = self.compress(data, encoding)
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = encoding
+            # The encoded bytes differ, so a strong validator must not be shared with the identity body
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                response.set_etag(etag, weak=True)
+            self._count(len(data), len(compressed))
+            return response
+
+    def asgi_send(self, send, accept_encoding):
+        """Wrap an ASGI `send` so a single-message compressible response is compressed"""
+        encoding = negotiate(accept_encoding)
+        pending_start = None
+
+        async def wrapped(message):
+            nonlocal pending_start
+            if message['type'] == 'http.response.start':
+                headers = {k.lower(): v for k, v in message.get('headers', [])}
+                if _mimetype(headers.get(b'content-type', b'').decode('latin-1')) in COMPRESSIBLE_TYPES \
+                        and b'content-encoding' not in headers:
+                    # Held until the body shows whether it is one message worth compressing
+                    pending_start = message
+                    return
+            elif message['type'] == 'http.response.body' and pending_start is not None:
+                start, pending_start = pending_start, None
+                body = message.get('body', b'')
+                if not message.get('more_body') and len(body) >= self.min_size:
+                    headers = [(k, v) for k, v in start.get('headers', []) if k.lower() != b'vary']
+                    headers.append((b'vary', b'Accept-Encoding'))
+                    if encoding is not None:
+                        compressed = self.compress(body, encoding)
+                        self._count(len(body), len(compressed))
+                        headers = [(k, v) for k, v in headers if k.lower() != b'content-length']
+                        headers += [(b'content-encoding', encoding.encode()),
+                                    (b'content-length', str(len(compressed)).encode())]
+                        message = dict(message, body=compressed)
+                    start = dict(start, headers=headers)
+                await send(start)
+            await send(message)
+
+        return wrapped
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 3) if stats['bytes_in'] else None
+        stats['brotli'] = brotli is not None
+        return stats
+
+
+class _Asset:
+    __slots__ = ('mtime', 'body', 'version', 'mimetype', 'variants')
+
+    def __init__(self, mtime, body, mimetype):
+        self.mtime = mtime
+        self.body = body
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.mimetype = mimetype
+        self.variants = {}
+
+
+class StaticAssets:
+    """Static folder served with content-hashed URLs and precompressed variants (see module docstring)"""
+
+    def __init__(self, folder, compressor):
+        self.folder = folder
+        self.compressor = compressor
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _asset(self, filename):
+        path = safe_join(self.folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.stat(path).st_mtime_ns
+        asset = self._assets.get(filename)
+        if asset is None or asset.mtime != mtime:
+            with open(path, 'rb') as f:
+                body = f.read()
+            asset = _Asset(mtime, body, mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            with self._lock:
+                self._assets[filename] = asset
+        return asset
+
+    def version(self, filename):
+        asset = self._asset(filename)
+        return asset.version if asset is not None else None
+
+    def _variant(self, asset, encoding):
+        body = asset.variants.get(encoding)
+        if body is None:
+            body = self.compressor.compress(asset.body, encoding, best=True)
+            # Only kept when it pays off; tiny files can grow under compression
+            asset.variants[encoding] = body if len(body) < len(asset.body) else asset.body
+        return asset.variants[encoding]
+
+    def serve(self, filename):
+        asset = self._asset(filename)
+        if asset is None:
+            abort(404)
+        encoding = None
+        if asset.mimetype in COMPRESSIBLE_TYPES:
+            encoding = negotiate(request.headers.get('Accept-Encoding'))
+        body = self._variant(asset, encoding) if encoding else asset.body
+        if body is asset.body:
+            encoding = None
+
+        response = Response(body, mimetype=asset.mimetype)
+        response.set_etag(asset.version + (f'-{encoding}' if encoding else ''))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.mimetype in COMPRESSIBLE_TYPES:
+            response.vary.add('Accept-Encoding')
+        # A hashed URL names these exact bytes forever; anything else revalidates against the ETag
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE if request.args.get('v') == asset.version else 'no-cache'
+        return response.make_conditional(request)
+
+    def init_flask(self, app):
+        """Serve app.static_folder through serve() and add ?v=<hash> to url_for('static', ...)"""
+        app.view_functions['static'] = self.serve
+
+        @app.url_defaults
+        def hashed_static_url(endpoint, values):
+            if endpoint == 'static' and 'filename' in values and 'v' not in values:
+                version = self.version(values['filename'])
+                if version:
+                    values['v'] = version
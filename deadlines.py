@@ -0,0 +1,370 @@
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from analytics import parse_due
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOAD_PAGE_SIZE = 1000
+
+
+def log_sink(event):
+    """Default reminder sink: one log line per event"""
+    print(f"Reminder {event['type']}: task {event['task_id']} of user {event['user_id']} due {event['due']}")
+
+
+class WebhookSink:
+    """POST each reminder event as JSON to a URL"""
+
+    def __init__(self, url, client_getter):
+        self.url = url
+        self.client_getter = client_getter
+
+    def __call__(self, event):
+        self.client_getter().post(self.url, json=event).raise_for_status()
+
+
+class _LeaderLock:
+    """Non-blocking exclusive file lock, so one process per host fires reminders"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._pid = None
+
+    def held(self):
+        if self.path is None or fcntl is None:
+            return True
+        if self._pid == os.getpid():
+            return True
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Kept open for the life of the process; the lock is released when it exits
+        self._file, self._pid = handle, os.getpid()
+        return True
+
+
+class _UserDeadlines:
+    """One user's pending tasks as a sorted [(due, task id)] list"""
+    __slots__ = ('dues', 'tasks', 'built_at')
+
+    def __init__(self):
+        self.dues = []
+        self.tasks = {}
+        self.built_at = time.monotonic()
+
+    def add(self, task_id, due):
+        self.tasks[task_id] = due
+        bisect.insort(self.dues, (due, task_id))
+
+    def remove(self, task_id):
+        due = self.tasks.pop(task_id, None)
+        if due is None:
+            return
+        index = bisect.bisect_left(self.dues, (due, task_id))
+        if index < len(self.dues) and self.dues[index] == (due, task_id):
+            del self.dues[index]
+
+
+class DeadlineScheduler:
+    """Due-moment index of pending tasks (due_date + due_time), with reminder events.
+
+    Queries are per user: the first "overdue now" or "due within N hours"
+    for a user loads that user's pending tasks (one indexed query) into a
+    sorted list, so later queries are bisects. The write paths update loaded
+    users in place; a user's list is reloaded once older than `max_age`, so
+    writes handled by other workers show up within that bound, and at most
+    `max_users` users are kept, least recently used first out.
+
+    Reminders wait in a min-heap ordered by firing time: a `due_soon` event
+    `lead` seconds before each due moment (one per entry of `lead_times`)
+    and an `overdue` event at it. Only the process holding the file lock at
+    `lock_path` keeps the heap, so a gunicorn host sends each reminder once;
+    with no lock path every process does. It loads just the tasks due before
+    the next reload (a window of `reconcile_interval` plus the longest lead)
+    every `reconcile_interval` seconds. Events already due when the window
+    is (re)loaded are not sent, so a restart does not replay old reminders.
+
+    Writes that land while a user's list or the window is being read are
+    recorded and replayed onto the fresh copy, so they are not lost.
+    """
+
+    def __init__(self, sink=log_sink, lead_times=(3600,), reconcile_interval=300, lock_path=None, max_age=300,
+                 max_users=10000):
+        self.sink = sink
+        self.lead_times = tuple(sorted(lead_times, reverse=True))
+        self.reconcile_interval = reconcile_interval
+        self.max_age = max_age
+        self.max_users = max_users
+        self._leader = _LeaderLock(lock_path)
+        # user id -> _UserDeadlines, least recently used first
+        self._users = OrderedDict()
+        # Reminder window, leader only: task id -> (user id, due, version); the version retires heap entries
+        # of an earlier state of the task
+        self._window = {}
+        # (fire at, event type, lead seconds, task id, version)
+        self._heap = []
+        self._horizon = None
+        self._versions = 0
+        # user id -> [in-flight load marker]; writes during a load are replayed onto the loaded list
+        self._loading = {}
+        # Writes during a window load, replayed onto the new window; None when no load is running
+        self._window_changes = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._loop_pid = None
+        self._counters = {'user_loads': 0, 'window_loads': 0, 'updates': 0, 'fired': 0, 'sink_errors': 0,
+                          'load_errors': 0}
+
+    @contextmanager
+    def loading(self, user_id):
+        """Bracket a read of a user's pending tasks; pass the marker it yields to set_user()"""
+        marker = {'changes': []}
+        with self._lock:
+            self._loading.setdefault(user_id, []).append(marker)
+        try:
+            yield marker
+        finally:
+            with self._lock:
+                markers = self._loading[user_id]
+                markers.remove(marker)
+                if not markers:
+                    del self._loading[user_id]
+
+    def load_user(self, client, user_id):
+        """Replace a user's list with their pending tasks"""
+        with self.loading(user_id) as marker:
+            rows = client.table('tasks').select("id, due_date, due_time") \
+                .eq('user_id', user_id).eq('status', 'pending').execute().data
+            self.set_user(user_id, rows, marker)
+
+    def set_user(self, user_id, rows, marker=None):
+        """Replace a user's list with the given pending task rows (callers that already read them, inside
+        loading() so writes since the read began are replayed)"""
+        entry = _UserDeadlines()
+        for row in rows:
+            due = parse_due(row.get('due_date'), row.get('due_time'))
+            if due is not None:
+                entry.add(row['id'], due)
+        with self._lock:
+            # The rows may or may not include those writes; replaying a task's latest state is idempotent
+            for change in marker['changes'] if marker is not None else ():
+                change(entry)
+            self._users[user_id] = entry
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            self._counters['user_loads'] += 1
+
+    def _user(self, client, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and time.monotonic() - entry.built_at < self.max_age:
+                self._users.move_to_end(user_id)
+                return
+        self.load_user(client, user_id)
+
+    def _schedule(self, user_id, task_id, due, now):
+        self._versions += 1
+        version = self._versions
+        self._window[task_id] = (user_id, due, version)
+        scheduled = [(due - timedelta(seconds=lead), 'task.due_soon', lead) for lead in self.lead_times]
+        scheduled.append((due, 'task.overdue', 0))
+        for fire_at, kind, lead in scheduled:
+            if fire_at > now:
+                heapq.heappush(self._heap, (fire_at, kind, lead, task_id, version))
+
+    def load_window(self, client, now=None):
+        """Replace the reminder heap with the pending tasks due before the next window load (paged by id)"""
+        now = now or datetime.now()
+        horizon = now + timedelta(seconds=self.reconcile_interval + max(self.lead_times, default=0))
+        # Date bounds as strings, so date-only and full ISO due_date values both compare correctly
+        low, high = (now - timedelta(days=1)).date().isoformat(), (horizon + timedelta(days=1)).date().isoformat()
+        with self._lock:
+            self._window_changes = []
+        try:
+            rows = self._window_rows(client, low, high)
+        except BaseException:
+            with self._lock:
+                self._window_changes = None
+            raise
+
+        with self._wakeup:
+            self._window, self._heap, self._horizon = {}, [], horizon
+            for row in rows:
+                due = parse_due(row.get('due_date'), row.get('due_time'))
+                if due is not None and due <= horizon:
+                    self._schedule(row['user_id'], row['id'], due, now)
+            for change in self._window_changes:
+                change()
+            self._window_changes = None
+            self._counters['window_loads'] += 1
+            self._wakeup.notify_all()
+
+    @staticmethod
+    def _window_rows(client, low, high):
+        rows, last_id = [], None
+        while True:
+            query = client.table('tasks').select("id, user_id, due_date, due_time").eq('status', 'pending') \
+                .gte('due_date', low).lt('due_date', high)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            page = query.order('id').limit(LOAD_PAGE_SIZE).execute().data
+            rows.extend(page)
+            if len(page) < LOAD_PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
+        return rows
+
+    def task_saved(self, user_id, task, now=None):
+        """Record a created or updated task row; anything not pending leaves the index"""
+        task_id = task['id']
+        due = parse_due(task.get('due_date'), task.get('due_time'))
+        pending = task.get('status') == 'pending' and due is not None
+        now = now or datetime.now()
+
+        def change_user(entry):
+            entry.remove(task_id)
+            if pending:
+                entry.add(task_id, due)
+
+        def change_window():
+            if self._horizon is None:
+                return
+            self._window.pop(task_id, None)
+            if pending and due <= self._horizon:
+                self._schedule(user_id, task_id, due, now)
+                # A new earliest reminder has to shorten the loop's sleep
+                self._wakeup.notify_all()
+
+        with self._wakeup:
+            self._apply(user_id, change_user, change_window)
+
+    def task_deleted(self, user_id, task_id):
+        def change_window():
+            self._window.pop(task_id, None)
+
+        with self._wakeup:
+            self._apply(user_id, lambda entry: entry.remove(task_id), change_window)
+
+    def _apply(self, user_id, change_user, change_window):
+        """Apply a write to the loaded list and the window, and record it for loads in flight (lock held)"""
+        for marker in self._loading.get(user_id, ()):
+            marker['changes'].append(change_user)
+        entry = self._users.get(user_id)
+        if entry is not None:
+            change_user(entry)
+        if self._window_changes is not None:
+            self._window_changes.append(change_window)
+        change_window()
+        self._counters['updates'] += 1
+
+    def overdue_count(self, client, user_id, now=None):
+        self._user(client, user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            return bisect.bisect_left(entry.dues, (now or datetime.now(),)) if entry is not None else 0
+
+    def due_between(self, client, user_id, start, end):
+        """[(task id, due)] of the user's pending tasks due in [start, end), soonest first"""
+        self._user(client, user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            dues = entry.dues if entry is not None else []
+            low = bisect.bisect_left(dues, (start,)) if start is not None else 0
+            high = bisect.bisect_left(dues, (end,))
+            return [(task_id, due) for due, task_id in dues[low:high]]
+
+    def overdue(self, client, user_id, now=None):
+        return self.due_between(client, user_id, None, now or datetime.now())
+
+    def due_within(self, client, user_id, seconds, now=None):
+        now = now or datetime.now()
+        return self.due_between(client, user_id, now, now + timedelta(seconds=seconds))
+
+    def fire_due(self, now=None):
+        """Send every reminder whose time has come; returns the number sent"""
+        now = now or datetime.now()
+        events = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, kind, lead, task_id, version = heapq.heappop(self._heap)
+                entry = self._window.get(task_id)
+                if entry is None or entry[2] != version:
+                    continue
+                user_id, due, _ = entry
+                events.append({'type': kind, 'user_id': user_id, 'task_id': task_id, 'due': due.isoformat(),
+                               'lead_seconds': lead})
+        sent = 0
+        for event in events:
+            try:
+                self.sink(event)
+                sent += 1
+            except Exception as e:
+                self._count('sink_errors')
+                print(f"Reminder delivery failed for task {event['task_id']}: {e}")
+        self._count('fired', sent)
+        return sent
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _seconds_to_next(self, now):
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    def start(self, client_getter):
+        """Fire reminders on a daemon thread (once per process); only the lock holder loads the window"""
+        with self._lock:
+            # Threads do not survive a fork, so each gunicorn worker starts its own
+            if self._loop_pid == os.getpid():
+                return
+            self._loop_pid = os.getpid()
+
+        def loop():
+            next_load = time.monotonic()
+            while True:
+                if time.monotonic() >= next_load:
+                    next_load = time.monotonic() + self.reconcile_interval
+                    # Followers retry the lock every interval, so another worker takes over when the leader exits
+                    if self._leader.held():
+                        try:
+                            self.load_window(client_getter())
+                        except Exception as e:
+                            self._count('load_errors')
+                            print(f"Reminder window load failed: {e}")
+                self.fire_due()
+                wait = next_load - time.monotonic()
+                to_next = self._seconds_to_next(datetime.now())
+                if to_next is not None:
+                    wait = min(wait, to_next)
+                with self._wakeup:
+                    self._wakeup.wait(max(0.05, wait))
+
+        threading.Thread(target=loop, name='deadline-scheduler', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['users'] = len(self._users)
+            stats['max_users'] = self.max_users
+            stats['window'] = len(self._window)
+            stats['scheduled'] = len(self._heap)
+        stats['leader'] = self._leader._pid == os.getpid() or self._leader.path is None
+        return stats
@@ -0,0 +1,187 @@
+import re
+
+# Stamped next to stored renderings; bump whenever the HTML output changes
+FORMATTER_VERSION = 2
+
+_BOLD_LINE = re.compile(r'^\*\*([^*].*?)\*\*:?$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_CODE = re.compile(r'`([^`]+)`')
+_NUMBERED_ITEM = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+_TABLE_SEPARATOR = re.compile(r'^\|?(?:\s*:?-{3,}:?\s*\|)+\s*(?::?-{3,}:?\s*)?\|?$')
+_RULE = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$')
+_match_bold_line, _match_numbered_item, _match_rule = _BOLD_LINE.match, _NUMBERED_ITEM.match, _RULE.match
+
+# Markdown header depth -> HTML tag; "#" is reserved for the page, so headings start at h2
+_HEADER_TAGS = {1: 'h2', 2: 'h3', 3: 'h4', 4: 'h5', 5: 'h5', 6: 'h5'}
+
+# First characters of bullet list items and horizontal rules; other lines skip those checks
+_BULLETS = frozenset('-*+')
+_RULE_STARTS = frozenset('-*_')
+
+
+def _inline(text):
+    if '**' in text:
+        text = _BOLD.sub(r'<strong>\1</strong>', text)
+    if '`' in text:
+        text = _CODE.sub(r'<code>\1</code>', text)
+    return text
+
+
+class MarkdownRenderer:
+    """Single-pass, line-at-a-time markdown to HTML renderer for AI responses.
+
+    Handles headers (#..######, and whole-line **bold** as a sub-heading),
+    pipe tables, nested bullet/numbered lists, paragraphs and inline
+    bold/code. Styling comes from the `ai-*` classes in static/style.css
+    rather than inline attributes. Each call to `feed_line` (or `feed_lines`)
+    returns the HTML for whatever blocks those lines completed, so the same
+    renderer drives both whole-text formatting and streaming.
+    """
+
+    def __init__(self):
+        self._in_table = False
+        # Open lists as (indent, tag) from outermost to innermost
+        self._lists = []
+
+    def feed_line(self, line):
+        return self.feed_lines((line,))
+
+    def feed_lines(self, lines):
+        """HTML for the blocks the given complete lines close"""
+        parts = []
+        append = parts.append
+        lists = self._lists
+        for line in lines:
+            stripped = line.strip()
+            if not stripped:
+                if self._in_table or lists:
+                    append(self._close_blocks())
+                continue
+
+            # Dispatch on the first character, so plain paragraphs run no block-level regex at all
+            first = stripped[0]
+            if first == '|' and stripped[-1] == '|' and len(stripped) > 1:
+                # Only rows made of nothing but pipes, dashes, colons and spaces can be the separator
+                if not stripped.strip('|:- \t') and _TABLE_SEPARATOR.match(stripped):
+                    continue
+                if '**' in stripped or '`' in stripped:
+                    cells = [_inline(cell.strip()) for cell in stripped[1:-1].split('|')]
+                else:
+                    cells = map(str.strip, stripped[1:-1].split('|'))
+                if self._in_table:
+                    append('<tr><td>' + '</td><td>'.join(cells) + '</td></tr>\n')
+                else:
+                    # The first row of a table is its header
+                    self._in_table = True
+                    if lists:
+                        append(self._close_lists())
+                    append('<table class="ai-table"><thead><tr><th>' + '</th><th>'.join(cells) +
+                           '</th></tr></thead><tbody>\n')
+                continue
+
+            if self._in_table:
+                append(self._close_table())
+
+            content = None
+            if first in _BULLETS:
+                # A bullet needs whitespace after it, so "**bold**" and "---" lines are not list items
+                start = len(line) - len(line.lstrip())
+                if line[start + 1:start + 2].isspace():
+                    indent, tag, content = line[:start], 'ul', line[start + 1:].lstrip()
+            elif first.isdigit():
+                match = _match_numbered_item(line)
+                if match:
+                    indent, _number, content = match.groups()
+                    tag = 'ol'
+            if content is not None:
+                indent = len(indent.expandtabs(4)) if indent else 0
+                if lists and lists[-1] == (indent, tag):
+                    # Next item of the innermost open list, the common case
+                    append(f'</li>\n<li>{_inline(content)}')
+                else:
+                    append(self._list_item(indent, tag, content))
+                continue
+            if lists:
+                append(self._close_lists())
+
+            if first == '#':
+                # "#" x 1-6, then the text without surrounding spaces or closing #s; string methods rather than a
+                # regex, whose lazy text group would backtrack on every character
+                level = min(len(stripped) - len(stripped.lstrip('#')), 6)
+                tag = _HEADER_TAGS[level]
+                append(f'<{tag}>{_inline(stripped[level:].strip().rstrip("#").rstrip())}</{tag}>\n')
+                continue
+            elif first == '*' and stripped[:2] == '**':
+                match = _match_bold_line(stripped)
+                if match:
+                    append(f'<h4>{_inline(match.group(1))}</h4>\n')
+                    continue
+            if first in _RULE_STARTS and _match_rule(stripped):
+                append('<hr>\n')
+            else:
+                append(f'<p>{_inline(stripped)}</p>\n')
+        return ''.join(parts)
+
+    def close(self):
+        return self._close_blocks()
+
+    def _list_item(self, indent, tag, content):
+        html = ''
+        while self._lists and (indent < self._lists[-1][0] or
+                               (indent == self._lists[-1][0] and tag != self._lists[-1][1])):
+            html += f'</li></{self._lists.pop()[1]}>\n'
+        if self._lists and indent == self._lists[-1][0]:
+            html += '</li>\n'
+        else:
+            html += f'<{tag} class="ai-list">\n'
+            self._lists.append((indent, tag))
+        return html + f'<li>{_inline(content)}'
+
+    def _close_lists(self):
+        html = ''
+        while self._lists:
+            html += f'</li></{self._lists.pop()[1]}>\n'
+        return html
+
+    def _close_table(self):
+        self._in_table = False
+        return '</tbody></table>\n'
+
+    def _close_blocks(self):
+        html = self._close_table() if self._in_table else ''
+        return html + self._close_lists()
+
+
+def format_ai_response_with_tables(response):
+    """Render a complete AI response to HTML"""
+    renderer = MarkdownRenderer()
+    return renderer.feed_lines(response.split('\n')) + renderer.close()
+
+
+class IncrementalFormatter:
+    """Streaming front end for MarkdownRenderer.
+
+    Text is fed in arbitrary chunks; HTML is returned as soon as a line's
+    newline arrives, so paragraphs, list items and table rows are flushed as
+    they close. Concatenating every fragment plus `close()` yields exactly
+    format_ai_response_with_tables() of the full text.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._renderer = MarkdownRenderer()
+
+    def feed(self, text):
+        """Consume a chunk of model output and return the HTML for completed lines."""
+        # Only the new chunk can hold a newline; most token-sized chunks do not
+        if '\n' not in text:
+            self._buffer += text
+            return ''
+        *lines, self._buffer = (self._buffer + text).split('\n')
+        return self._renderer.feed_lines(lines)
+
+    def close(self):
+        """Flush the trailing partial line and close any open blocks."""
+        html = self._renderer.feed_line(self._buffer) if self._buffer else ''
+        self._buffer = ''
+        return html + self._renderer.close()
@@ -0,0 +1,19 @@
+"""Gunicorn hooks, loaded automatically from the working directory.
+
+Every worker starts its background threads (revocation sync, reminders) once
+it has loaded the app. With WARMUP=1 it also warms up (clients, upstream
+connections, formatter, password hasher) before it accepts connections, so
+the first requests a new worker serves do not pay for it. Worker class,
+count and bind address stay on the command line.
+"""
+import os
+
+
+def post_worker_init(worker):
+    # The ASGI entry point does both in its lifespan startup instead, once its event loop is running
+    if 'uvicorn' in type(worker).__module__:
+        return
+    from app import run_warmup, start_background
+    start_background()
+    if os.getenv('WARMUP', '0') == '1':
+        run_warmup()
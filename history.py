@@ -0,0 +1,105 @@
+import base64
+import threading
+import zlib
+
+from formatter import FORMATTER_VERSION, format_ai_response_with_tables
+from task_queries import apply_keyset, encode_cursor
+
+HISTORY_PAGE_SIZE = 20
+
+
+def compress_html(html):
+    """zlib + base64 so the rendering fits a plain text column through PostgREST"""
+    return base64.b64encode(zlib.compress(html.encode('utf-8'), 6)).decode('ascii')
+
+
+def decompress_html(blob):
+    return zlib.decompress(base64.b64decode(blob)).decode('utf-8')
+
+
+def rendered_columns(html):
+    """Columns stored next to the raw model output (see sql/ai_history.sql)"""
+    return {'html_compressed': compress_html(html), 'formatter_version': FORMATTER_VERSION}
+
+
+class HistoryStore:
+    """Paginated history of AI responses served from the stored HTML rendering.
+
+    Rows are written with the formatted HTML compressed alongside the raw
+    text, stamped with FORMATTER_VERSION. Listing reads only the compressed
+    rendering; rows rendered by an older formatter (or saved before the
+    column existed) have their raw text fetched, are re-rendered once and
+    written back, so the cost of a formatter upgrade is paid lazily per row.
+    """
+
+    def __init__(self, table, raw_column, result_key, fields):
+        self.table = table
+        self.raw_column = raw_column
+        self.result_key = result_key
+        self.fields = fields
+        self._lock = threading.Lock()
+        self.served = 0
+        self.rerendered = 0
+
+    def record(self, record, html):
+        """Add the stored rendering to a row about to be inserted"""
+        record.update(rendered_columns(html))
+        return record
+
+    def list(self, client, user_id, limit=HISTORY_PAGE_SIZE, cursor=None):
+        """One page of a user's history newest first, and the cursor of the next page (or None)"""
+        columns = ', '.join(('id', 'created_at') + self.fields + ('html_compressed', 'formatter_version'))
+        query = client.table(self.table).select(columns).eq('user_id', user_id)
+        if cursor:
+            query = apply_keyset(query, cursor)
+        # One extra row tells us whether another page exists
+        rows = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+
+        rendered = {row['id']: self._stored_html(row) for row in rows}
+        stale = [row_id for row_id, html in rendered.items() if html is None]
+        if stale:
+            rendered.update(self._rerender(client, user_id, stale))
+
+        items = []
+        for row in rows:
+            item = {field: row.get(field) for field in ('id', 'created_at') + self.fields}
+            item[self.result_key] = rendered.get(row['id'], '')
+            items.append(item)
+        with self._lock:
+            self.served += len(items)
+            self.rerendered += len(stale)
+        return items, next_cursor
+
+    @staticmethod
+    def _stored_html(row):
+        if row.get('formatter_version') != FORMATTER_VERSION or not row.get('html_compressed'):
+            return None
+        try:
+            return decompress_html(row['html_compressed'])
+        except Exception:
+            return None
+
+    def _rerender(self, client, user_id, row_ids):
+        response = client.table(self.table).select(f"id, {self.raw_column}").eq('user_id', user_id) \
+            .in_('id', row_ids).execute()
+        rendered = {}
+        for row in response.data:
+            raw = row.get(self.raw_column)
+            html = format_ai_response_with_tables(raw if isinstance(raw, str) else str(raw or ''))
+            rendered[row['id']] = html
+            try:
+                client.table(self.table).update(rendered_columns(html)).eq('id', row['id']) \
+                    .eq('user_id', user_id).execute()
+            except Exception as e:
+                # The rendering is still served; the next listing simply tries the write-back again
+                print(f"History re-render write-back failed for {self.table} {row['id']}: {e}")
+        return rendered
+
+    def stats(self):
+        with self._lock:
+            return {'served': self.served, 'rerendered': self.rerendered, 'formatter_version': FORMATTER_VERSION}
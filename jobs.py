@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+JOB_PRIORITIES = {'low': 0, 'normal': 1, 'high': 2}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dedup_key TEXT,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_user_idx ON jobs (user_id, status);
+"""
+
+
+def payload_key(kind, user_id, payload):
+    """Identical pending jobs of one user share this key, so a double submit returns the first job"""
+    material = json.dumps([kind, str(user_id), payload], sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """SQLite-backed job queue with a per-process pool of worker threads.
+
+    Jobs are claimed highest priority first (then oldest), at most
+    `per_user_limit` running at once for any user. Submitting a job that is
+    identical to one of the user's pending or running jobs returns the
+    existing job. Exceptions matching `retry_on` put the job back with
+    jittered exponential backoff until `max_attempts` is reached; anything
+    else fails it; `retry_on` may also be a callable returning the types,
+    for exceptions of a lazily imported SDK. A claimed job holds a lease,
+    so a job whose worker died is picked up again once the lease runs out.
+
+    The outcome of a run is only recorded while the job's lease is still the
+    one it was claimed with, so a worker that overran its lease cannot
+    overwrite the run that took the job over.
+
+    With no `path` (or ':memory:') the queue lives in an in-memory database
+    and is visible only to this process; give every worker the same file
+    path to share one queue between gunicorn workers.
+    """
+
+    def __init__(self, path=None, workers=2, per_user_limit=1, max_attempts=3, retry_on=(), retry_backoff=2.0,
+                 lease_seconds=300, result_ttl=86400, poll_interval=1.0, notify=None):
+        self.memory = path in (None, ':memory:')
+        self.path = path or ':memory:'
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.max_attempts = max_attempts
+        self.retry_on = retry_on if callable(retry_on) else tuple(retry_on)
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        # Called with the job once it succeeds or finally fails (webhook delivery)
+        self.notify = notify
+        self._handlers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._workers_pid = None
+        self._last_purge = 0.0
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'succeeded': 0, 'failed': 0, 'retried': 0,
+                          'lease_lost': 0}
+        # An in-memory database exists only on its one connection, which the threads take turns on
+        self._memory_conn = self._open() if self.memory else None
+        self._memory_lock = threading.Lock()
+        with self._db() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=not self.memory)
+        conn.row_factory = sqlite3.Row
+        if not self.memory:
+            conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @contextmanager
+    def _db(self):
+        if self.memory:
+            with self._memory_lock:
+                yield self._memory_conn
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = self._open()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        yield conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._db() as conn:
+            # IMMEDIATE takes the write lock up front, so concurrent claims cannot pick the same job
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def register(self, kind, handler):
+        """`handler(job)` runs the job and returns a JSON-serializable result"""
+        self._handlers[kind] = handler
+
+    def submit(self, user_id, kind, payload, priority=JOB_PRIORITIES['normal'], callback_url=None):
+        """Queue a job; returns (job, created), where created is False for a deduplicated submit"""
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        dedup_key = payload_key(kind, user_id, payload)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE user_id = ? AND dedup_key = ? "
+                               "AND status IN ('pending', 'running')", (str(user_id), dedup_key)).fetchone()
+            created = row is None
+            if created:
+                job_id = uuid.uuid4().hex
+                conn.execute('INSERT INTO jobs (id, user_id, kind, payload, priority, status, dedup_key, callback_url, '
+                             'created_at, updated_at, available_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (job_id, str(user_id), kind, json.dumps(payload), priority, 'pending', dedup_key,
+                              callback_url, now, now, now))
+                row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        self._count('submitted' if created else 'deduplicated')
+        if created:
+            self.start()
+            with self._wakeup:
+                self._wakeup.notify()
+        return self._job(row), created
+
+    def get(self, job_id, user_id=None):
+        with self._db() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or (user_id is not None and row['user_id'] != str(user_id)):
+            return None
+        return self._job(row)
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    @staticmethod
+    def public(job):
+        """The fields of a job returned to its owner"""
+        view = {field: job[field] for field in ('id', 'kind', 'status', 'attempts')}
+        for field in ('created_at', 'updated_at'):
+            view[field] = datetime.fromtimestamp(job[field], timezone.utc).isoformat()
+        if job['status'] == 'succeeded':
+            view['result'] = job['result']
+        elif job['error']:
+            view['error'] = job['error']
+        return view
+
+    def claim(self):
+        """Lease the next runnable job to the calling worker, or return None"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs whose worker died mid-run go back to the queue, unless that was their last attempt
+            conn.execute("UPDATE jobs SET status = 'failed', error = 'Worker lost', lease_until = NULL, updated_at = ? "
+                         "WHERE status = 'running' AND lease_until <= ? AND attempts >= ?",
+                         (now, now, self.max_attempts))
+            conn.execute("UPDATE jobs SET status = 'pending', lease_until = NULL, available_at = ? "
+                         "WHERE status = 'running' AND lease_until <= ?", (now, now))
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' AND available_at <= ? AND user_id NOT IN "
+                "(SELECT user_id FROM jobs WHERE status = 'running' GROUP BY user_id HAVING COUNT(*) >= ?) "
+                "ORDER BY priority DESC, created_at LIMIT 1", (now, self.per_user_limit)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                         "updated_at = ? WHERE id = ?", (now + self.lease_seconds, now, row['id']))
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+        return self._job(job)
+
+    def run(self, job):
+        """Execute a claimed job and record its outcome"""
+        try:
+            result = self._handlers[job['kind']](job)
+        except Exception as e:
+            now = time.time()
+            retry_on = tuple(self.retry_on()) if callable(self.retry_on) else self.retry_on
+            if isinstance(e, retry_on) and job['attempts'] < self.max_attempts:
+                delay = random.uniform(0.5, 1.0) * self.retry_backoff * 2 ** (job['attempts'] - 1)
+                if self._finish(job, "status = 'pending', error = ?, lease_until = NULL, available_at = ?, "
+                                     "updated_at = ?", (str(e), now + delay, now)):
+                    self._count('retried')
+                return
+            if not self._finish(job, "status = 'failed', error = ?, lease_until = NULL, updated_at = ?", (str(e), now)):
+                return
+            self._count('failed')
+        else:
+            if not self._finish(job, "status = 'succeeded', result = ?, error = NULL, lease_until = NULL, "
+                                     "updated_at = ?", (json.dumps(result), time.time())):
+                return
+            self._count('succeeded')
+
+        # A finished job frees a per-user slot that another worker may be waiting on
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self.notify is not None and job.get('callback_url'):
+            try:
+                self.notify(self.get(job['id']))
+            except Exception as e:
+                print(f"Job webhook failed for {job['id']}: {e}")
+
+    def _finish(self, job, assignments, params):
+        """Apply an outcome if the job still holds the lease it was claimed with; False if it was lost"""
+        with self._db() as conn:
+            updated = conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND status = 'running' "
+                                   "AND lease_until = ?", (*params, job['id'], job['lease_until'])).rowcount
+        if not updated:
+            self._count('lease_lost')
+            print(f"Job {job['id']} lost its lease; outcome of this run discarded")
+        return bool(updated)
+
+    def purge(self):
+        """Delete finished jobs older than `result_ttl`"""
+        cutoff = time.time() - self.result_ttl
+        with self._db() as conn:
+            conn.execute("DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,))
+
+    def start(self):
+        """Start the worker threads (once per process; threads do not survive a fork)"""
+        with self._lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers_pid = os.getpid()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+
+    def _work(self):
+        while True:
+            try:
+                job = self.claim()
+                if job is not None:
+                    self.run(job)
+                    continue
+                if time.monotonic() - self._last_purge > 600:
+                    self._last_purge = time.monotonic()
+                    self.purge()
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def stats(self):
+        with self._db() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        with self._lock:
+            stats = dict(self._counters)
+        stats['queue'] = {row['status']: row['n'] for row in rows}
+        stats['workers'] = self.workers if self._workers_pid == os.getpid() else 0
+        stats['backend'] = 'memory' if self.memory else 'sqlite'
+        return stats
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Bump when prompt templates change so stale completions are not served
+CACHE_KEY_VERSION = 1
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    if isinstance(value, (list, tuple, set)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def build_cache_key(endpoint, model, temperature, max_tokens, **inputs):
+    """Build a stable cache key from the completion parameters and normalized template inputs.
+
+    Strings are lower-cased with whitespace collapsed and lists are sorted, so
+    "Data Scientist" and " data  scientist" with skills in any order share a key.
+    """
+    material = {
+        'v': CACHE_KEY_VERSION,
+        'endpoint': endpoint,
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'inputs': _normalize(inputs),
+    }
+    digest = hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'llm:{endpoint}:{digest}'
+
+
+class LRUCache:
+    """In-process LRU with per-entry TTL and a bound on the number of entries"""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteSharedCache:
+    """Local stand-in for a Redis shared tier.
+
+    Implements the subset of the redis-py interface the cache uses
+    (`get` and `set` with `ex=`), so a `redis.Redis` instance can be swapped in
+    without changing callers. Several worker processes on one host can share
+    the same database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS llm_cache '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            with conn:
+                conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        expires_at = time.time() + (ex or 365 * 24 * 3600)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, value, expires_at))
+        return True
+
+
+class LLMResponseCache:
+    """Two-tier cache for LLM completions: an in-process LRU backed by an optional shared store"""
+
+    def __init__(self, local=None, shared=None, ttl=3600, disabled_endpoints=()):
+        self.local = local or LRUCache(ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self.disabled_endpoints = set(disabled_endpoints)
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+
+    def enabled_for(self, endpoint):
+        return endpoint not in self.disabled_endpoints
+
+    def _count(self, *names):
+        with self._stats_lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits', 'local_hits')
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception:
+                # A broken shared tier must never fail the request
+                self._count('errors')
+                value = None
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            if value is not None:
+                self.local.set(key, value, self.ttl)
+                self._count('hits', 'shared_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value, self.ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ex=self.ttl)
+            except Exception:
+                self._count('errors')
+        self._count('sets')
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        stats['local_evictions'] = self.local.evictions
+        stats['shared_tier'] = type(self.shared).__name__ if self.shared is not None else None
+        stats['disabled_endpoints'] = sorted(self.disabled_endpoints)
+        return stats
+
+
+def create_cache_from_env():
+    """Build the response cache from LLM_CACHE_* environment variables.
+
+    LLM_CACHE_TTL / LLM_CACHE_MAX_ENTRIES size the in-process tier,
+    LLM_CACHE_REDIS_URL or LLM_CACHE_SQLITE_PATH enable a shared tier and
+    LLM_CACHE_DISABLED is a comma-separated list of endpoints to opt out.
+    """
+    ttl = int(os.getenv('LLM_CACHE_TTL', '3600'))
+    max_entries = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024'))
+    disabled = [name.strip() for name in os.getenv('LLM_CACHE_DISABLED', '').split(',') if name.strip()]
+
+    shared = None
+    redis_url = os.getenv('LLM_CACHE_REDIS_URL')
+    sqlite_path = os.getenv('LLM_CACHE_SQLITE_PATH')
+    if redis_url:
+        import redis
+        shared = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+    elif sqlite_path:
+        shared = SQLiteSharedCache(sqlite_path)
+
+    return LLMResponseCache(local=LRUCache(max_entries=max_entries, ttl=ttl), shared=shared, ttl=ttl,
+                            disabled_endpoints=disabled)
@@ -0,0 +1,265 @@
+"""In-process metrics with a Prometheus text exposition.
+
+Histograms and counters are plain lock-protected arrays, so an observation
+costs a bisect and an addition; that is cheap enough to leave on for every
+request. Each process keeps its own registry, so with several gunicorn
+workers every scrape sees the worker that served it (label targets per
+worker, or aggregate with `sum without (instance)`).
+
+Spans time a block of work and record it twice: in the `span_seconds`
+histogram and in the current request's span list, which the sampled slow
+request log prints as a breakdown.
+"""
+import bisect
+import contextvars
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (name, seconds) spans recorded while handling the current request
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ('le',), labels + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            series_labels = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{series_labels} {_format_value(round(total, 6))}')
+            lines.append(f'{self.name}_count{series_labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats_collector(self, stats_fn):
+        """Export the numeric values of `stats_fn()` ({component: stats dict}) as `app_component_stat` gauges"""
+        self._collectors.append(stats_fn)
+
+    def _component_lines(self):
+        lines = ['# HELP app_component_stat Numeric values from the components listed in /internal/stats',
+                 '# TYPE app_component_stat gauge']
+        for stats_fn in self._collectors:
+            try:
+                components = stats_fn()
+            except Exception:
+                continue
+            for component, stats in components.items():
+                if not isinstance(stats, dict):
+                    continue
+                for key, value in _flatten(stats):
+                    labels = _format_labels(('component', 'stat'), (component, key))
+                    lines.append(f'app_component_stat{labels} {_format_value(value)}')
+        return lines
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        if self._collectors:
+            lines.extend(self._component_lines())
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(stats, prefix=''):
+    for key, value in stats.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+        elif isinstance(value, dict):
+            yield from _flatten(value, f'{name}.')
+
+
+registry = MetricsRegistry()
+request_seconds = registry.histogram('http_request_duration_seconds', 'Time to produce the response headers',
+                                     ('method', 'route', 'status'))
+span_seconds = registry.histogram('span_seconds', 'Time spent in instrumented hot-path operations', ('span',))
+upstream_seconds = registry.histogram('upstream_request_seconds', 'HTTP requests to upstream services',
+                                      ('upstream', 'method', 'target', 'status'))
+groq_tokens = registry.counter('groq_tokens_total', 'Tokens reported by Groq completions', ('endpoint', 'kind'))
+groq_calls = registry.counter('groq_calls_total', 'Groq completions by endpoint and mode', ('endpoint', 'mode'))
+slow_requests = registry.counter('slow_requests_total', 'Requests slower than the slow request threshold',
+                                 ('route',))
+
+
+def record_span(name, seconds):
+    span_seconds.observe(seconds, name)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def upstream_target(path):
+    """Low-cardinality label for an upstream URL path: the PostgREST table/RPC, else the path"""
+    if path.startswith('/rest/v1/'):
+        return path[len('/rest/v1/'):].split('?', 1)[0] or '/'
+    return path
+
+
+def record_groq_usage(endpoint, usage):
+    if usage is None:
+        return
+    groq_tokens.inc(usage.prompt_tokens or 0, endpoint, 'prompt')
+    groq_tokens.inc(usage.completion_tokens or 0, endpoint, 'completion')
+
+
+def upstream_observer(upstream):
+    """ManagedTransport callback recording each upstream request as a metric and a request span"""
+    def observe(request, status, seconds):
+        target = upstream_target(request.url.path)
+        upstream_seconds.observe(seconds, upstream, request.method, target, str(status))
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((f'{upstream} {request.method} {target}', seconds))
+    return observe
+
+
+class RequestTimer:
+    """Per-request timing shared by the Flask hooks and the ASGI entry point.
+
+    Requests slower than `slow_seconds` are counted, and a `sample_rate`
+    fraction of them is logged with their span breakdown (names and
+    timings only, never bodies or headers).
+    """
+
+    def __init__(self, slow_seconds=1.0, sample_rate=0.1):
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+
+    def start(self):
+        spans = []
+        _request_spans.set(spans)
+        return time.perf_counter(), spans
+
+    def finish(self, state, method, route, status):
+        started, spans = state
+        elapsed = time.perf_counter() - started
+        _request_spans.set(None)
+        request_seconds.observe(elapsed, method, route, str(status))
+        if elapsed >= self.slow_seconds:
+            slow_requests.inc(1, route)
+            if random.random() < self.sample_rate:
+                breakdown = ', '.join(f'{name}={seconds * 1000:.1f}ms' for name, seconds in spans)
+                print(f"Slow request: {method} {route} {status} {elapsed * 1000:.1f}ms [{breakdown}]")
+        return elapsed
+
+
+def init_flask(app, timer):
+    """Time every Flask request under its URL rule (unmatched paths share one label)"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_timer = timer.start()
+
+    @app.after_request
+    def finish_request_timer(response):
+        state = g.pop('request_timer', None)
+        if state is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            timer.finish(state, request.method, route, response.status_code)
+        return response
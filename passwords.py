@@ -0,0 +1,102 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug's own default, so stored hashes stay current until the cost is tuned
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HasherBusy(Exception):
+    """Raised instead of queueing a hash when the executor's queue is full"""
+
+
+def hash_method(password_hash):
+    """The method and cost parameters a stored hash was made with, e.g. "scrypt:32768:8:1" """
+    return password_hash.split('$', 1)[0] if password_hash else ''
+
+
+class PasswordHasher:
+    """Password hashing with configurable cost on a bounded, per-process thread pool.
+
+    hashlib's scrypt and PBKDF2 release the GIL, so up to `workers` hashes
+    run in parallel while the calling threads wait; at most `max_pending`
+    more may queue, beyond that HasherBusy is raised, so a login storm
+    costs a fixed amount of CPU per process instead of starving every other
+    request. `method` is any Werkzeug method string (PASSWORD_HASH_METHOD,
+    e.g. "scrypt:16384:8:1" or "pbkdf2:sha256:600000"); a stored hash made
+    with other parameters is reported by `needs_rehash` so login can
+    upgrade it once the password has been verified.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=2, max_pending=32):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._canonical_method = None
+        self._dummy_hash = None
+        self._counters = {'verified': 0, 'hashed': 0, 'rehashed': 0, 'rejected': 0}
+
+    def _pool(self):
+        # Threads do not survive a fork, so each worker process starts its own pool
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._executor_pid = os.getpid()
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+            return self._executor
+
+    def _run(self, counter, fn, *args):
+        pool = self._pool()
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise HasherBusy('Too many logins in progress, please retry shortly')
+        try:
+            result = pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+        self._count(counter)
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def hash(self, password):
+        return self._run('hashed', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password; a missing hash (unknown user) costs the same as a real check"""
+        if not password_hash:
+            self._run('verified', check_password_hash, self._dummy(), password)
+            return False
+        return self._run('verified', check_password_hash, password_hash, password)
+
+    def _dummy(self):
+        if self._dummy_hash is None:
+            self._dummy_hash = generate_password_hash(os.urandom(16).hex(), self.method)
+        return self._dummy_hash
+
+    def needs_rehash(self, password_hash):
+        if self._canonical_method is None:
+            # Werkzeug fills in defaults ("pbkdf2" -> "pbkdf2:sha256:<iterations>"), so compare what it produces
+            self._canonical_method = hash_method(self._dummy())
+        return hash_method(password_hash) != self._canonical_method
+
+    def rehash(self, password):
+        result = self.hash(password)
+        self._count('rehashed')
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['method'] = self.method
+        stats['workers'] = self.workers
+        stats['max_pending'] = self.max_pending
+        return stats
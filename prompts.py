@@ -0,0 +1,138 @@
+# Prompt templates and generation settings shared by the sync (Flask) and async (ASGI) AI routes
+
+GENERATION_PARAMS = {
+    'timeline': {'temperature': 0.7, 'max_tokens': 1000},
+    'career_advice': {'temperature': 0.7, 'max_tokens': 2500},
+    'roadmap': {'temperature': 0.3, 'max_tokens': 3000},
+}
+
+def timeline_prompt(title, description, priority):
+    return f"""Analyze this student task and provide a realistic timeline estimate:
+
+Task: {title}
+Description: {description}
+Priority: {priority}
+
+Please provide:
+1. **Estimated Time to Complete** (be specific - hours/days)
+2. **Suggested Breakdown** (subtasks in table format)
+3. **Dependencies & Considerations**
+4. **Tips for Efficient Completion**
+
+Format your response with HTML tables and clear sections."""
+
+
+def career_education_context(user_info):
+    if user_info.get('education_level') == 'school':
+        return f"The student is in {user_info.get('school_grade', 'school')} studying {user_info.get('field_of_study', 'general subjects')}."
+    elif user_info.get('education_level') == 'college':
+        return f"The student is in {user_info.get('academic_year', 'college')} studying {user_info.get('field_of_study', 'their chosen field')}."
+    return ""
+
+
+def career_prompt(user_input, education_context):
+    return f"""You are an expert AI career counselor and academic advisor. {education_context}
+
+Based on the following student query, provide comprehensive, well-structured guidance that matches the quality and formatting of ChatGPT responses:
+
+Student Query: {user_input}
+
+IMPORTANT FORMATTING REQUIREMENTS:
+1. Use proper markdown formatting with headers (##, ###)
+2. Create detailed tables using markdown table syntax
+3. Use bullet points and numbered lists appropriately
+4. Structure your response with clear sections
+5. Make tables comprehensive with multiple columns and detailed information
+6. Use emojis strategically for visual appeal
+7. Provide actionable, specific advice
+
+Structure your response with sections like:
+- **🔥 Strategy Overview** (with emoji headers)
+- **📅 Detailed Plan** (with comprehensive tables)
+- **📚 Resources & Tools** (categorized tables)
+- **💡 Action Steps** (numbered list)
+- **🧠 Tips for Success**
+
+Make sure tables have proper headers, multiple columns, and detailed content. Format everything in clean markdown that will render beautifully."""
+
+
+def roadmap_education_context(user_info):
+    if user_info.get('education_level') == 'school':
+        return f"The student is currently in {user_info.get('school_grade', 'school')}."
+    elif user_info.get('education_level') == 'college':
+        return f"The student is currently in {user_info.get('academic_year', 'college')} studying {user_info.get('field_of_study')}."
+    return ""
+
+
+def skills_text(interests):
+    return ', '.join(interests) if isinstance(interests, list) else str(interests)
+
+
+def roadmap_prompt(career_goal, current_level, timeframe, skills_text, education_context):
+    return f"""Create a comprehensive, professional learning roadmap for becoming a {career_goal}.
+
+Student Context: {education_context}
+Current Level: {current_level}
+Timeframe: {timeframe}
+Current Skills/Interests: {skills_text}
+
+Generate a detailed roadmap with the following structure using markdown formatting:
+
+## 🚀 {career_goal} Learning Roadmap
+
+### 📊 Overview
+| Aspect | Details |
+|--------|---------|
+| Duration | {timeframe} |
+| Starting Level | {current_level} |
+| Target Role | {career_goal} |
+| Total Phases | 3-4 phases |
+
+### 📅 Phase-wise Learning Plan
+
+#### 🔹 Phase 1: Foundation (Month 1-X)
+**Skills to Develop:**
+- Skill 1
+- Skill 2
+- Skill 3
+
+**Resources:**
+| Resource | Type | Description |
+|----------|------|-------------|
+| Resource 1 | Course | Detailed description |
+| Resource 2 | Book | Detailed description |
+
+**Projects:**
+- Project 1
+- Project 2
+
+**Milestones:**
+- Milestone 1
+- Milestone 2
+
+#### 🔹 Phase 2: Development (Month X-Y)
+[Similar structure]
+
+#### 🔹 Phase 3: Specialization (Month Y-Z)
+[Similar structure]
+
+### 🎯 Skills Matrix
+| Technical Skills | Soft Skills |
+|------------------|-------------|
+| Programming | Communication |
+| Databases | Problem Solving |
+
+### 📚 Resource Library
+| Category | Resources |
+|----------|-----------|
+| Free Courses | List of free courses |
+| Paid Certifications | List of certifications |
+| Books | List of books |
+| Practice Platforms | List of platforms |
+
+### 💡 Final Tips
+- Tip 1
+- Tip 2
+- Tip 3
+
+Make this comprehensive, realistic, and tailored to the student's level and timeframe."""
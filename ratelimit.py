@@ -0,0 +1,351 @@
+import asyncio
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+class RateLimited(Exception):
+    """Raised instead of queueing a call that could not start within the limiter's max wait"""
+
+    def __init__(self, retry_after, message='AI service is busy, please retry shortly'):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def parse_duration(value):
+    """Seconds from a rate-limit header value such as "12", "7.66s", "2m59.56s" or "150ms"; None if unparseable"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def estimate_tokens(prompt, max_tokens):
+    # ~4 characters per token for English prompts, plus the completion's worst case
+    return len(prompt) // 4 + 1 + max_tokens
+
+
+class _Bucket:
+    """Token bucket whose level may go negative when calls used more tokens than they reserved"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @property
+    def rate(self):
+        return self.capacity / 60.0
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_after(self, amount, now):
+        """Seconds until `amount` more would be covered, counting any upstream-imposed pause"""
+        shortfall = amount - self.level
+        delay = shortfall / self.rate if shortfall > 0 else 0.0
+        return max(delay, self.paused_until - now)
+
+
+class Reservation:
+    """A caller's claim on the limiter's budget; a queued one must be waited on before the call starts"""
+
+    def __init__(self, limiter, user_id, tokens, granted):
+        self.limiter = limiter
+        self.user_id = user_id
+        self.tokens = tokens
+        self.queued_at = time.monotonic()
+        self._granted = threading.Event()
+        self._wake = None
+        if granted:
+            self._granted.set()
+
+    @property
+    def granted(self):
+        return self._granted.is_set()
+
+    def _grant(self):
+        self._granted.set()
+        wake = self._wake
+        if wake is not None:
+            wake()
+
+    def wait(self):
+        """Block until the limiter grants this reservation"""
+        try:
+            while not self._granted.is_set():
+                # Whoever wakes first hands out the budget that has freed up, in round-robin order
+                self._granted.wait(max(self.limiter.dispatch(), 0.001))
+        except BaseException:
+            self.limiter.cancel(self)
+            raise
+
+    async def wait_async(self):
+        """Wait on the event loop until the limiter grants this reservation"""
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._granted.is_set():
+                delay = self.limiter.dispatch()
+                woken = loop.create_future()
+                self._wake = lambda: loop.call_soon_threadsafe(_resolve, woken)
+                if self._granted.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(woken, max(delay, 0.001))
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self.limiter.cancel(self)
+            raise
+        finally:
+            self._wake = None
+
+
+class GroqRateLimiter:
+    """Client-side requests/min and tokens/min budget for Groq calls.
+
+    Each call reserves one request and its estimated tokens (prompt length
+    plus max_tokens). A call the budget covers starts straight away; the
+    rest wait in per-user queues that are served round-robin as budget
+    frees up, so one user's burst delays their own calls rather than
+    everyone's. A call that would likely not start within `max_wait`, or
+    that would exceed `max_queue` waiting callers (`max_queue_per_user` for
+    one user), is rejected with RateLimited and a Retry-After instead.
+    `observe()` adapts the budget to Groq's x-ratelimit-* response headers
+    and 429s, and `settle()` corrects a reservation with the usage the
+    completion reported.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=30000, max_wait=10.0, max_queue=64,
+                 max_queue_per_user=4):
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self._lock = threading.Lock()
+        # Waiting reservations per user; the first user is next in the round-robin
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._queued_tokens = 0
+        self._counters = {'admitted': 0, 'delayed': 0, 'rejected': 0, 'upstream_429': 0, 'wait_seconds': 0.0,
+                          'reserved_tokens': 0, 'used_tokens': 0}
+
+    def _refill(self, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+
+    def _delay(self, tokens, now, requests=1):
+        return max(self.requests.delay_after(requests, now), self.tokens.delay_after(tokens, now))
+
+    def _take(self, tokens):
+        self.requests.level -= 1
+        self.tokens.level -= tokens
+        self._counters['admitted'] += 1
+        self._counters['reserved_tokens'] += tokens
+
+    def reserve(self, user_id, tokens):
+        """Reserve a request and `tokens`; returns a Reservation (granted, or queued) or raises RateLimited"""
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            # Never ask for more than a full minute's budget, or the call could never start
+            tokens = min(tokens, self.tokens.capacity)
+            if not self._queues and self._delay(tokens, now) <= 0:
+                self._take(tokens)
+                return Reservation(self, user_id, tokens, granted=True)
+            # Worst case for the estimate: everything already queued goes first
+            delay = self._delay(self._queued_tokens + tokens, now, requests=self._queued + 1)
+            queue = self._queues.get(user_id)
+            if delay > self.max_wait or self._queued >= self.max_queue or \
+                    (queue is not None and len(queue) >= self.max_queue_per_user):
+                self._counters['rejected'] += 1
+                raise RateLimited(min(delay, 60.0))
+            reservation = Reservation(self, user_id, tokens, granted=False)
+            if queue is None:
+                queue = self._queues[user_id] = deque()
+            queue.append(reservation)
+            self._queued += 1
+            self._queued_tokens += tokens
+            self._counters['delayed'] += 1
+        return reservation
+
+    def _dispatch(self, now, granted):
+        """Grant queued reservations round-robin while the budget covers them; seconds until the next one fits"""
+        self._refill(now)
+        while self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            head = queue[0]
+            delay = self._delay(head.tokens, now)
+            if delay > 0:
+                return delay
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._queued -= 1
+            self._queued_tokens -= head.tokens
+            self._take(head.tokens)
+            self._counters['wait_seconds'] += now - head.queued_at
+            granted.append(head)
+        return 0.0
+
+    def dispatch(self):
+        """Hand out freed-up budget to waiting reservations; returns seconds until the next one could start"""
+        granted = []
+        with self._lock:
+            delay = self._dispatch(time.monotonic(), granted)
+        for reservation in granted:
+            reservation._grant()
+        return delay
+
+    def cancel(self, reservation):
+        """Drop a reservation whose caller stopped waiting before it was granted"""
+        with self._lock:
+            queue = self._queues.get(reservation.user_id)
+            if reservation.granted or queue is None or reservation not in queue:
+                return
+            queue.remove(reservation)
+            if not queue:
+                del self._queues[reservation.user_id]
+            self._queued -= 1
+            self._queued_tokens -= reservation.tokens
+
+    def acquire(self, user_id, prompt, max_tokens):
+        """Reserve and block until the call may start"""
+        reservation = self.reserve(user_id, estimate_tokens(prompt, max_tokens))
+        reservation.wait()
+        return reservation
+
+    async def acquire_async(self, user_id, prompt, max_tokens):
+        """Reserve and wait on the event loop until the call may start"""
+        reservation = self.reserve(user_id, estimate_tokens(prompt, max_tokens))
+        await reservation.wait_async()
+        return reservation
+
+    def settle(self, reservation, used_tokens):
+        """Give back (or charge) the difference between the estimate and the reported usage"""
+        if reservation is None or not used_tokens:
+            return
+        granted = []
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reservation.tokens - used_tokens)
+            self._counters['used_tokens'] += used_tokens
+            # Unused estimate may be enough for the next waiter
+            if self._queues:
+                self._dispatch(time.monotonic(), granted)
+        for waiting in granted:
+            waiting._grant()
+
+    def observe(self, status_code, headers):
+        """Adapt to Groq's rate-limit headers; call with every upstream response"""
+        now = time.monotonic()
+        with self._lock:
+            token_limit = _number(headers.get('x-ratelimit-limit-tokens'))
+            if token_limit:
+                self.tokens.refill(now)
+                self.tokens.capacity = token_limit
+            remaining_tokens = _number(headers.get('x-ratelimit-remaining-tokens'))
+            if remaining_tokens is not None:
+                # The upstream also counts other processes sharing the key, so it wins when it is stricter
+                self.tokens.refill(now)
+                self.tokens.level = min(self.tokens.level, remaining_tokens)
+            if _number(headers.get('x-ratelimit-remaining-requests')) == 0:
+                reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+                if reset:
+                    self.requests.paused_until = max(self.requests.paused_until, now + reset)
+            if status_code == 429:
+                self._counters['upstream_429'] += 1
+                retry_after = parse_duration(headers.get('retry-after')) or \
+                    parse_duration(headers.get('x-ratelimit-reset-tokens')) or 1.0
+                for bucket in (self.requests, self.tokens):
+                    bucket.paused_until = max(bucket.paused_until, now + retry_after)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            stats = dict(self._counters)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+            stats['queued'] = self._queued
+            stats['queued_users'] = len(self._queues)
+            stats['requests_per_minute'] = self.requests.capacity
+            stats['tokens_per_minute'] = self.tokens.capacity
+            stats['available_requests'] = round(self.requests.level, 2)
+            stats['available_tokens'] = round(self.tokens.level)
+            stats['paused_for'] = round(max(0.0, self.requests.paused_until - now, self.tokens.paused_until - now), 3)
+        return stats
+
+
+class AttemptLimiter:
+    """At most `limit` attempts per key in any `window` seconds (login throttling per email and per client IP).
+
+    Counts are process-local, so with several workers a key gets up to
+    `limit` attempts in each. At most `max_keys` keys are tracked, least
+    recently used first out.
+    """
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def hit(self, key, message='Too many attempts, please retry later'):
+        """Record an attempt, or raise RateLimited if the key has used up its window"""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            self._attempts.move_to_end(key)
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.limit:
+                self.throttled += 1
+                raise RateLimited(attempts[0] + self.window - now, message)
+            attempts.append(now)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._attempts), 'throttled': self.throttled, 'limit': self.limit,
+                    'window': self.window}
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
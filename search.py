@@ -0,0 +1,304 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from storage import function_missing
+from task_queries import InvalidQuery
+
+SEARCH_RPC = 'search_user_history'
+SEARCH_KINDS = ('task', 'advice', 'roadmap')
+MAX_QUERY_LENGTH = 200
+SNIPPET_LENGTH = 160
+# Title matches count like this many body occurrences (setweight 'A' vs 'B' in sql/search.sql)
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# (table, title column, body column) per result kind
+SEARCH_SOURCES = {
+    'task': ('tasks', 'title', 'description'),
+    'advice': ('career_advice', 'user_input', 'ai_response'),
+    'roadmap': ('learning_roadmaps', 'career_goal', 'roadmap_data'),
+}
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have how i if in into is it its me my of on or so that the their '
+    'then there these this to was we what when which who will with you your'.split())
+_WORD = re.compile(r'[^\W_]+')
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def _stem(word):
+    # Just enough folding that "roadmaps"/"roadmap" and "learning"/"learn" meet; query and documents agree
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Lowercased, stemmed terms of a text without stopwords"""
+    if not text:
+        return []
+    return [_stem(word) for word in _WORD.findall(str(text).lower()) if word not in STOPWORDS]
+
+
+def parse_kinds(kinds):
+    """Validate a `types=` filter; None means every kind"""
+    if not kinds:
+        return None
+    selected = {kind.strip() for kind in kinds.split(',') if kind.strip()}
+    unknown = selected - set(SEARCH_KINDS)
+    if unknown:
+        raise InvalidQuery(f"Unknown types: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def _snippet(text):
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= SNIPPET_LENGTH else text[:SNIPPET_LENGTH].rsplit(' ', 1)[0] + '…'
+
+
+class _UserIndex:
+    __slots__ = ('postings', 'docs', 'total_length', 'built_at', 'read_at')
+
+    def __init__(self):
+        # term -> {(kind, id): weighted term frequency}
+        self.postings = {}
+        # (kind, id) -> (weighted length, terms, result fields)
+        self.docs = {}
+        self.total_length = 0
+        self.built_at = self.read_at = time.monotonic()
+
+    def add(self, kind, row):
+        _, title_column, body_column = SEARCH_SOURCES[kind]
+        key = (kind, row['id'])
+        self.remove(key)
+        freqs = Counter()
+        for term in tokenize(row.get(title_column)):
+            freqs[term] += TITLE_WEIGHT
+        freqs.update(tokenize(row.get(body_column)))
+        length = sum(freqs.values())
+        for term, freq in freqs.items():
+            self.postings.setdefault(term, {})[key] = freq
+        result = {'kind': kind, 'id': row['id'], 'title': _snippet(row.get(title_column)),
+                  'snippet': _snippet(row.get(body_column)), 'created_at': row.get('created_at')}
+        self.docs[key] = (length, tuple(freqs), result)
+        self.total_length += length
+
+    def remove(self, key):
+        entry = self.docs.pop(key, None)
+        if entry is None:
+            return
+        length, terms, _ = entry
+        self.total_length -= length
+        for term in terms:
+            posting = self.postings[term]
+            del posting[key]
+            if not posting:
+                del self.postings[term]
+
+    def gather(self, terms, kinds):
+        """Everything ranking needs, copied out so it can run without the index lock.
+
+        (document count, average length, document frequency per term, the
+        matching documents' entries in `docs` and, per term, their frequencies
+        in the same order), or None when some term matches nothing.
+        """
+        postings = [self.postings.get(term) for term in set(terms)]
+        if not postings or not all(postings):
+            return None
+        # Intersect from the rarest term, so the work follows the matches rather than the history size
+        postings.sort(key=len)
+        keys = [key for key in postings[0]
+                if (kinds is None or key[0] in kinds) and all(key in posting for posting in postings[1:])]
+        docs = self.docs
+        return (len(docs), self.total_length / len(docs), [len(posting) for posting in postings],
+                [docs[key] for key in keys], [[posting[key] for key in keys] for posting in postings])
+
+    def search(self, terms, kinds, limit, offset):
+        return _rank(self.gather(terms, kinds), limit, offset)
+
+
+def _rank(gathered, limit, offset):
+    """(total matches, one page of results) from _UserIndex.gather, best BM25 first"""
+    if gathered is None:
+        return 0, []
+    count, average_length, frequencies, docs, columns = gathered
+    k1, b = BM25_K1, BM25_B
+    scores = [0.0] * len(docs)
+    for frequency, column in zip(frequencies, columns):
+        idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+        for i, (freq, doc) in enumerate(zip(column, docs)):
+            scores[i] += idf * freq * (k1 + 1) / (freq + k1 * (1 - b + b * doc[0] / average_length))
+    scored = [(score, doc[2].get('created_at') or '', doc[2]['kind'], doc[2]['id'], i)
+              for i, (score, doc) in enumerate(zip(scores, docs))]
+    page = heapq.nlargest(offset + limit, scored)[offset:]
+    return len(docs), [dict(docs[entry[4]][2], score=round(entry[0], 4)) for entry in page]
+
+
+class SearchIndex:
+    """Per-user inverted index over tasks and AI history, kept current by the write paths.
+
+    The first search for a user builds the index from the three source
+    tables; after that task create/update/delete and AI history inserts
+    update it in place, so a query costs time in proportion to the posting
+    lists of its terms rather than the user's whole history. Like
+    AnalyticsCounters, indexes are process-local: one older than `max_age`
+    is rebuilt on its next search so writes handled by other workers show
+    up, and at most `max_users` are kept, least recently searched first out.
+    Writes that land while an index is being built are replayed onto it.
+    """
+
+    def __init__(self, max_age=300, max_users=1000):
+        self.max_age = max_age
+        self.max_users = max_users
+        self._users = OrderedDict()
+        # user id -> [in-flight rebuild marker]; writes while a rebuild reads the tables are replayed onto it
+        self._rebuilding = {}
+        self._lock = threading.Lock()
+        self._counters = {'searches': 0, 'builds': 0, 'updates': 0}
+
+    def search(self, client, user_id, terms, kinds=None, limit=20, offset=0):
+        # Only the matching postings are copied under the lock; scoring them runs after it is released
+        gathered = None
+        with self._lock:
+            index = self._users.get(user_id)
+            fresh = index is not None and time.monotonic() - index.built_at < self.max_age
+            if fresh:
+                index.read_at = time.monotonic()
+                self._users.move_to_end(user_id)
+                self._counters['searches'] += 1
+                gathered = index.gather(terms, kinds)
+        if not fresh:
+            index = self.rebuild(client, user_id)
+            with self._lock:
+                self._counters['searches'] += 1
+                gathered = index.gather(terms, kinds)
+        return _rank(gathered, limit, offset)
+
+    def rebuild(self, client, user_id):
+        """Index a user's tasks, career advice and roadmaps from the source tables"""
+        marker = {'changes': [], 'stale': False}
+        with self._lock:
+            self._rebuilding.setdefault(user_id, []).append(marker)
+        try:
+            index = _UserIndex()
+            for kind, (table, title_column, body_column) in SEARCH_SOURCES.items():
+                rows = client.table(table).select(f"id, {title_column}, {body_column}, created_at") \
+                    .eq('user_id', user_id).execute().data
+                for row in rows:
+                    index.add(kind, row)
+        finally:
+            with self._lock:
+                markers = self._rebuilding[user_id]
+                markers.remove(marker)
+                if not markers:
+                    del self._rebuilding[user_id]
+
+        with self._lock:
+            # Writes that landed while the tables were read may or may not be in the rows, so they are replayed;
+            # adds and removes of a document are idempotent
+            for change in marker['changes']:
+                change(index)
+            if marker['stale']:
+                index.built_at = float('-inf')
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            self._counters['builds'] += 1
+        return index
+
+    def _apply(self, user_id, change):
+        # Users without an index are indexed on their next search, so there is nothing to update
+        with self._lock:
+            for marker in self._rebuilding.get(user_id, ()):
+                marker['changes'].append(change)
+            index = self._users.get(user_id)
+            if index is not None:
+                change(index)
+                self._counters['updates'] += 1
+
+    def task_saved(self, user_id, task):
+        self._apply(user_id, lambda index: index.add('task', task))
+
+    def task_deleted(self, user_id, task_id):
+        self._apply(user_id, lambda index: index.remove(('task', task_id)))
+
+    def history_saved(self, user_id, kind, record):
+        """Add an inserted career advice or roadmap row; one without an id forces a rebuild instead"""
+        if record.get('id') is None:
+            with self._lock:
+                self._users.pop(user_id, None)
+                for marker in self._rebuilding.get(user_id, ()):
+                    marker['stale'] = True
+            return
+        self._apply(user_id, lambda index: index.add(kind, record))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['users'] = len(self._users)
+            stats['documents'] = sum(len(index.docs) for index in self._users.values())
+        stats['max_users'] = self.max_users
+        stats['max_age'] = self.max_age
+        return stats
+
+
+class HistorySearch:
+    """Ranked, paginated search over a user's tasks, career advice and roadmaps.
+
+    The preferred path is the `search_user_history` database function
+    (sql/search.sql), which ranks matches from GIN-indexed tsvector columns
+    the database keeps current on every write. When it is not installed the
+    search remembers that for `rpc_retry_seconds` and answers from the local
+    SearchIndex instead; any other failed call falls back for that query
+    alone.
+    """
+
+    def __init__(self, index, use_rpc=True, rpc_retry_seconds=300):
+        self.index = index
+        self.use_rpc = use_rpc
+        self.rpc_retry_seconds = rpc_retry_seconds
+        self._rpc_unavailable_until = 0.0
+
+    def search(self, client, user_id, query, kinds=None, limit=20, offset=0):
+        """{'total', 'results'} for a free-text query; raises InvalidQuery for an empty or oversized one"""
+        query = (query or '').strip()
+        if len(query) > MAX_QUERY_LENGTH:
+            raise InvalidQuery(f'Query must be at most {MAX_QUERY_LENGTH} characters')
+        terms = tokenize(query)
+        if not terms:
+            raise InvalidQuery('Query needs at least one searchable word')
+
+        if self.use_rpc and time.monotonic() >= self._rpc_unavailable_until:
+            try:
+                return self._search_rpc(client, user_id, query, kinds, limit, offset)
+            except Exception as e:
+                # A transient failure falls back for this query only; the next one tries the function again
+                if function_missing(e):
+                    self._rpc_unavailable_until = time.monotonic() + self.rpc_retry_seconds
+                else:
+                    print(f"Search RPC failed, answering from the local index: {e}")
+        total, results = self.index.search(client, user_id, terms, kinds, limit, offset)
+        return {'total': total, 'results': results}
+
+    @staticmethod
+    def _search_rpc(client, user_id, query, kinds, limit, offset):
+        rows = client.rpc(SEARCH_RPC, {'p_user_id': user_id, 'p_query': query,
+                                       'p_kinds': sorted(kinds) if kinds else None,
+                                       'p_limit': limit, 'p_offset': offset}).execute().data or []
+        results = [{'kind': row['kind'], 'id': row['id'], 'title': _snippet(row.get('title')),
+                    'snippet': row.get('snippet') or '', 'created_at': row.get('created_at'),
+                    'score': round(float(row.get('score') or 0), 4)} for row in rows]
+        # Every row carries the full match count; a page past the end has none to carry it
+        return {'total': int(rows[0]['total']) if rows else 0, 'results': results}
+
+    def stats(self):
+        stats = self.index.stats()
+        stats['rpc'] = self.use_rpc and time.monotonic() >= self._rpc_unavailable_until
+        return stats
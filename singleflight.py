@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight block until it finishes and receive the same result, or have the
+    same exception raised. Once the call completes the key is forgotten, so
+    later callers trigger a fresh execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executions': 0, 'coalesced': 0, 'errors': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for coroutines on one event loop.
+
+    The shared call runs as its own task, so a caller that is cancelled
+    (for example because its client disconnected) does not cancel the
+    upstream request for the callers still waiting on it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = {'executions': 0, 'coalesced': 0, 'errors': 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            self._stats['executions'] += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled() or task.exception() is not None:
+            self._stats['errors'] += 1
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,12 @@
+-- Stored HTML renderings for the AI history endpoints (history.py).
+-- html_compressed is base64(zlib(html)); formatter_version is formatter.FORMATTER_VERSION at render
+-- time, and rows with an older (or null) version are re-rendered and rewritten on their next read.
+
+alter table public.career_advice add column if not exists html_compressed text;
+alter table public.career_advice add column if not exists formatter_version smallint;
+create index if not exists career_advice_user_created_idx on public.career_advice (user_id, created_at desc, id desc);
+
+alter table public.learning_roadmaps add column if not exists html_compressed text;
+alter table public.learning_roadmaps add column if not exists formatter_version smallint;
+create index if not exists learning_roadmaps_user_created_idx
+    on public.learning_roadmaps (user_id, created_at desc, id desc);
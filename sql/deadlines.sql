@@ -0,0 +1,5 @@
+-- Indexes behind deadlines.DeadlineScheduler.
+-- Per-user due lists read one user's pending tasks (tasks_user_status_due_idx, sql/user_task_analytics.sql);
+-- the reminder leader reads pending tasks due in the next window across all users.
+
+create index if not exists tasks_status_due_idx on public.tasks (status, due_date);
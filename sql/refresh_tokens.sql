@@ -0,0 +1,16 @@
+-- Refresh sessions behind the short-lived access tokens (auth_tokens.TokenService).
+-- token_hash is the SHA-256 of the refresh token's secret part; it changes on every refresh.
+-- Workers poll the revoked_at index for sessions revoked within the last access-token lifetime.
+
+create table if not exists public.refresh_tokens (
+    id uuid primary key,
+    user_id bigint not null,
+    token_hash text not null,
+    created_at timestamptz not null default now(),
+    expires_at timestamptz not null,
+    last_used_at timestamptz,
+    revoked_at timestamptz
+);
+create index if not exists refresh_tokens_user_idx on public.refresh_tokens (user_id);
+create index if not exists refresh_tokens_revoked_idx on public.refresh_tokens (revoked_at)
+    where revoked_at is not null;
@@ -0,0 +1,68 @@
+-- Full-text search over tasks and AI history used by search.HistorySearch (GET /api/search).
+-- Generated tsvector columns are maintained by the database on every insert/update, so the write
+-- paths need nothing extra; without this function the app answers from a per-worker in-memory index.
+
+alter table public.tasks add column if not exists search_vector tsvector
+    generated always as (setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                         setweight(to_tsvector('english', coalesce(description, '')), 'B')) stored;
+create index if not exists tasks_search_idx on public.tasks using gin (search_vector);
+
+alter table public.career_advice add column if not exists search_vector tsvector
+    generated always as (setweight(to_tsvector('english', coalesce(user_input, '')), 'A') ||
+                         setweight(to_tsvector('english', coalesce(ai_response, '')), 'B')) stored;
+create index if not exists career_advice_search_idx on public.career_advice using gin (search_vector);
+
+alter table public.learning_roadmaps add column if not exists search_vector tsvector
+    generated always as (setweight(to_tsvector('english', coalesce(career_goal, '')), 'A') ||
+                         setweight(to_tsvector('english', coalesce(roadmap_data::text, '')), 'B')) stored;
+create index if not exists learning_roadmaps_search_idx on public.learning_roadmaps using gin (search_vector);
+
+create or replace function public.search_user_history(p_user_id bigint, p_query text, p_kinds text[] default null,
+                                                      p_limit int default 20, p_offset int default 0)
+returns table (
+    kind text,
+    id bigint,
+    title text,
+    snippet text,
+    created_at timestamptz,
+    score real,
+    total bigint
+)
+language sql
+stable
+as $$
+    with q as (
+        select websearch_to_tsquery('english', p_query) as query
+    ),
+    hits as (
+        select 'task'::text as kind, t.id, t.title, coalesce(t.description, '') as body,
+               t.created_at::timestamptz as created_at, ts_rank_cd(t.search_vector, q.query) as score
+        from public.tasks t, q
+        where t.user_id = p_user_id and t.search_vector @@ q.query
+          and (p_kinds is null or 'task' = any(p_kinds))
+        union all
+        select 'advice', a.id, a.user_input, coalesce(a.ai_response, ''),
+               a.created_at::timestamptz, ts_rank_cd(a.search_vector, q.query)
+        from public.career_advice a, q
+        where a.user_id = p_user_id and a.search_vector @@ q.query
+          and (p_kinds is null or 'advice' = any(p_kinds))
+        union all
+        select 'roadmap', r.id, r.career_goal, coalesce(r.roadmap_data::text, ''),
+               r.created_at::timestamptz, ts_rank_cd(r.search_vector, q.query)
+        from public.learning_roadmaps r, q
+        where r.user_id = p_user_id and r.search_vector @@ q.query
+          and (p_kinds is null or 'roadmap' = any(p_kinds))
+    ),
+    page as (
+        select h.*, count(*) over () as total
+        from hits h
+        order by h.score desc, h.created_at desc
+        limit p_limit offset p_offset
+    )
+    -- Headlines are only built for the page, not for every match
+    select p.kind, p.id, p.title,
+           ts_headline('english', p.body, q.query, 'MaxWords=30, MinWords=10, MaxFragments=1'),
+           p.created_at, p.score, p.total
+    from page p, q
+    order by p.score desc, p.created_at desc;
+$$;
@@ -0,0 +1,26 @@
+-- Change tracking for GET /api/tasks/changes (delta sync).
+
+alter table public.tasks add column if not exists updated_at timestamptz not null default now();
+create index if not exists tasks_user_updated_idx on public.tasks (user_id, updated_at);
+
+create or replace function public.touch_updated_at() returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists tasks_touch_updated_at on public.tasks;
+create trigger tasks_touch_updated_at
+    before update on public.tasks
+    for each row execute function public.touch_updated_at();
+
+create table if not exists public.task_tombstones (
+    id bigint generated always as identity primary key,
+    task_id bigint not null,
+    user_id bigint not null,
+    deleted_at timestamptz not null default now()
+);
+create index if not exists task_tombstones_user_deleted_idx on public.task_tombstones (user_id, deleted_at);
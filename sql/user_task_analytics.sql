@@ -0,0 +1,32 @@
+-- Single round-trip dashboard analytics used by analytics.AnalyticsEngine.
+-- Apply in the Supabase SQL editor; the app falls back to a narrow scan when it is missing.
+
+create or replace function public.user_task_analytics(p_user_id bigint, p_now timestamp)
+returns table (
+    total_tasks bigint,
+    completed_tasks bigint,
+    pending_tasks bigint,
+    overdue_tasks bigint,
+    career_advice_sessions bigint,
+    learning_roadmaps bigint
+)
+language sql
+stable
+as $$
+    select
+        count(*),
+        count(*) filter (where t.status = 'completed'),
+        count(*) filter (where t.status = 'pending'),
+        count(*) filter (
+            where t.status = 'pending'
+              and t.due_date::date + coalesce(nullif(t.due_time::text, ''), '23:59')::time < p_now
+        ),
+        (select count(*) from public.career_advice a where a.user_id = p_user_id),
+        (select count(*) from public.learning_roadmaps r where r.user_id = p_user_id)
+    from public.tasks t
+    where t.user_id = p_user_id;
+$$;
+
+create index if not exists tasks_user_status_due_idx on public.tasks (user_id, status, due_date);
+create index if not exists career_advice_user_idx on public.career_advice (user_id);
+create index if not exists learning_roadmaps_user_idx on public.learning_roadmaps (user_id);
@@ -82,6 +82,7 @@ async function handleLogin(e) {
 
         if (response.ok) {
             localStorage.setItem('user_token', data.token);
+            localStorage.setItem('refresh_token', data.refresh_token);
             localStorage.setItem('user_data', JSON.stringify(data.user));
             showNotification('Login successful!', 'success');
             setTimeout(() => {
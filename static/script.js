@@ -42,11 +42,64 @@ function loadUserData() {
 }
 
 function logout() {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+        // End the session server-side; keepalive lets the request outlive the navigation
+        fetch(`${API_BASE}/auth/logout`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+            keepalive: true
+        }).catch(() => {});
+    }
     localStorage.removeItem('user_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user_data');
     window.location.href = '/auth';
 }
 
+// Access tokens are short-lived: on a 401 the refresh token buys a new one and the request is retried once.
+// Concurrent 401s share one refresh, since each refresh rotates the refresh token.
+let pendingRefresh = null;
+
+function refreshAccessToken() {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        return Promise.resolve(false);
+    }
+    if (!pendingRefresh) {
+        pendingRefresh = fetch(`${API_BASE}/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        }).then(async response => {
+            if (!response.ok) {
+                return false;
+            }
+            const data = await response.json();
+            localStorage.setItem('user_token', data.token);
+            localStorage.setItem('refresh_token', data.refresh_token);
+            return true;
+        }).catch(() => false).finally(() => {
+            pendingRefresh = null;
+        });
+    }
+    return pendingRefresh;
+}
+
+async function authFetch(url, options = {}) {
+    const response = await fetch(url, options);
+    if (response.status !== 401) {
+        return response;
+    }
+    if (!await refreshAccessToken()) {
+        logout();
+        return response;
+    }
+    const headers = { ...(options.headers || {}), 'Authorization': `Bearer ${localStorage.getItem('user_token')}` };
+    return fetch(url, { ...options, headers });
+}
+
 // Enhanced photo upload functionality
 function handlePhotoUpload(event) {
     const file = event.target.files[0];
@@ -116,7 +169,7 @@ async function generateTaskTimeline() {
     resultDiv.classList.add('show');
 
     try {
-        const response = await fetch(`${API_BASE}/tasks/ai-timeline`, {
+        const response = await authFetch(`${API_BASE}/tasks/ai-timeline`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -252,16 +305,38 @@ function completePomodoro() {
     }, 3000);
 }
 
+const TASK_LIST_FIELDS = 'id,title,description,due_date,due_time,priority,status';
+
+// Local copy of the user's tasks, kept current with /api/tasks/changes deltas
+const taskStore = new Map();
+let taskSyncCursor = null;
+
+function applyTaskChanges(delta) {
+    if (delta.reset) taskStore.clear();
+    delta.changes.forEach(task => taskStore.set(task.id, task));
+    delta.deleted.forEach(id => taskStore.delete(id));
+    taskSyncCursor = delta.cursor;
+}
+
+function storedTasks() {
+    return Array.from(taskStore.values()).sort((a, b) =>
+        (b.created_at || '').localeCompare(a.created_at || '') || b.id - a.id);
+}
+
 async function loadTasks() {
     try {
-        const response = await fetch(`${API_BASE}/tasks`, {
+        let url = `${API_BASE}/tasks/changes?fields=${TASK_LIST_FIELDS}`;
+        if (taskSyncCursor) url += `&since=${encodeURIComponent(taskSyncCursor)}`;
+
+        const response = await authFetch(url, {
             headers: {
                 'Authorization': `Bearer ${localStorage.getItem('user_token')}`
             }
         });
 
         if (response.ok) {
-            const tasks = await response.json();
+            applyTaskChanges(await response.json());
+            const tasks = storedTasks();
             displayTasks(tasks);
             updateAnalytics(tasks);
         }
@@ -329,7 +404,7 @@ function filterTasks(filter) {
     currentFilter = filter;
     document.querySelectorAll('.filter-btn').forEach(btn => btn.classList.remove('active'));
     document.querySelector(`[onclick="filterTasks('${filter}')"]`).classList.add('active');
-    loadTasks();
+    displayTasks(storedTasks());
 }
 
 function openTaskModal() {
@@ -354,7 +429,7 @@ async function handleTaskSubmit(e) {
     };
 
     try {
-        const response = await fetch(`${API_BASE}/tasks`, {
+        const response = await authFetch(`${API_BASE}/tasks`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -377,7 +452,7 @@ async function handleTaskSubmit(e) {
 
 async function completeTask(taskId) {
     try {
-        const response = await fetch(`${API_BASE}/tasks/${taskId}`, {
+        const response = await authFetch(`${API_BASE}/tasks/${taskId}`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -398,7 +473,7 @@ async function completeTask(taskId) {
 async function deleteTask(taskId) {
     if (confirm('Are you sure you want to delete this task?')) {
         try {
-            const response = await fetch(`${API_BASE}/tasks/${taskId}`, {
+            const response = await authFetch(`${API_BASE}/tasks/${taskId}`, {
                 method: 'DELETE',
                 headers: {
                     'Authorization': `Bearer ${localStorage.getItem('user_token')}`
@@ -415,6 +490,60 @@ async function deleteTask(taskId) {
     }
 }
 
+// Stream an AI response as server-sent events, rendering HTML fragments as they close.
+// Resolves with the payload of the final `done` event.
+async function streamAIResponse(url, body, container) {
+    const response = await authFetch(`${url}?stream=1`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            'Authorization': `Bearer ${localStorage.getItem('user_token')}`
+        },
+        body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || 'Request failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let html = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            const payload = data ? JSON.parse(data) : {};
+
+            if (eventName === 'html') {
+                html += payload.html;
+                container.innerHTML = html;
+            } else if (eventName === 'done') {
+                return payload;
+            } else if (eventName === 'error') {
+                throw new Error(payload.error);
+            }
+        }
+    }
+    throw new Error('Stream ended unexpectedly');
+}
+
 // ENHANCED: Career advice with better formatting
 async function getCareerAdvice() {
     const input = document.getElementById('careerInput').value.trim();
@@ -427,23 +556,10 @@ async function getCareerAdvice() {
     adviceDiv.innerHTML = '<div style="text-align: center; padding: 2rem;"><p>🤖 Generating comprehensive career guidance...</p></div>';
 
     try {
-        const response = await fetch(`${API_BASE}/career-advice`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${localStorage.getItem('user_token')}`
-            },
-            body: JSON.stringify({ input })
-        });
-
-        if (response.ok) {
-            const data = await response.json();
-            adviceDiv.innerHTML = data.advice;
-        } else {
-            adviceDiv.innerHTML = '<div style="text-align: center; padding: 2rem;"><p>⚠️ Sorry, I couldn\'t generate advice right now. Please try again.</p></div>';
-        }
+        const data = await streamAIResponse(`${API_BASE}/career-advice`, { input }, adviceDiv);
+        adviceDiv.innerHTML = data.advice;
     } catch (error) {
-        adviceDiv.innerHTML = '<div style="text-align: center; padding: 2rem;"><p>❌ Network error. Please check your connection and try again.</p></div>';
+        adviceDiv.innerHTML = '<div style="text-align: center; padding: 2rem;"><p>⚠️ Sorry, I couldn\'t generate advice right now. Please try again.</p></div>';
     }
 }
 
@@ -470,25 +586,13 @@ async function handleRoadmapSubmit(e) {
     };
 
     try {
-        const response = await fetch(`${API_BASE}/roadmap/generate`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${localStorage.getItem('user_token')}`
-            },
-            body: JSON.stringify(formData)
-        });
-
-        const roadmapData = await response.json();
-        if (response.ok) {
-            displayRoadmap(roadmapData);
-            closeRoadmapModal();
-            showNotification('🚀 Roadmap generated successfully!', 'success');
-        } else {
-            showNotification(roadmapData.error || 'Failed to generate roadmap', 'error');
-        }
+        closeRoadmapModal();
+        const container = document.getElementById('roadmapContainer');
+        const roadmapData = await streamAIResponse(`${API_BASE}/roadmap/generate`, formData, container);
+        displayRoadmap(roadmapData);
+        showNotification('🚀 Roadmap generated successfully!', 'success');
     } catch (error) {
-        showNotification('Network error. Please try again.', 'error');
+        showNotification(error.message || 'Failed to generate roadmap', 'error');
     }
 }
 
@@ -499,7 +603,7 @@ function displayRoadmap(roadmapData) {
 
 async function loadUserRoadmaps() {
     try {
-        const response = await fetch(`${API_BASE}/roadmap/user`, {
+        const response = await authFetch(`${API_BASE}/roadmap/user?limit=1`, {
             headers: {
                 'Authorization': `Bearer ${localStorage.getItem('user_token')}`
             }
@@ -510,7 +614,7 @@ async function loadUserRoadmaps() {
             // Display latest roadmap if available
             if (roadmaps.length > 0) {
                 const latestRoadmap = roadmaps[0];
-                displayRoadmap({ roadmap: latestRoadmap.roadmap_data });
+                displayRoadmap({ roadmap: latestRoadmap.roadmap });
             }
         }
     } catch (error) {
@@ -520,7 +624,7 @@ async function loadUserRoadmaps() {
 
 async function updateAnalytics(tasks = null) {
     try {
-        const response = await fetch(`${API_BASE}/analytics`, {
+        const response = await authFetch(`${API_BASE}/analytics`, {
             headers: {
                 'Authorization': `Bearer ${localStorage.getItem('user_token')}`
             }
@@ -0,0 +1,613 @@
+"""Storage engines behind the app's tables, and a per-user read cache in front of them.
+
+Everything in the app talks to storage through the query builder of the
+Supabase client: `client.table(name).select(...).eq(...).order(...).execute()`
+returning an object with `data` and `count`. Any object offering that
+interface is an engine:
+
+    supabase   the hosted Supabase client (PostgREST over HTTP)
+    sqlite     SQLiteStorage, an embedded SQLite database in WAL mode that
+               runs the same builder chains locally (single node, tests)
+
+CachedStorage wraps either engine and serves repeated per-user reads of the
+users/tasks/career_advice/learning_roadmaps tables from memory. AsyncStorage
+gives a synchronous engine the awaitable `execute()` the ASGI routes use.
+"""
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+STORAGE_BACKENDS = ('supabase', 'sqlite')
+
+# The Supabase tables (see sql/) with the indexes the app's queries need
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT,
+    education_level TEXT,
+    academic_year TEXT,
+    school_grade TEXT,
+    field_of_study TEXT,
+    institution_name TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT,
+    description TEXT,
+    due_date TEXT,
+    due_time TEXT,
+    priority TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_user_created_idx ON tasks (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS tasks_user_updated_idx ON tasks (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS tasks_user_status_due_idx ON tasks (user_id, status, due_date);
+CREATE INDEX IF NOT EXISTS tasks_status_due_idx ON tasks (status, due_date);
+CREATE TABLE IF NOT EXISTS task_tombstones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    deleted_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_tombstones_user_deleted_idx ON task_tombstones (user_id, deleted_at);
+CREATE INDEX IF NOT EXISTS task_tombstones_deleted_idx ON task_tombstones (deleted_at);
+CREATE TABLE IF NOT EXISTS career_advice (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    user_input TEXT,
+    ai_response TEXT,
+    html_compressed TEXT,
+    formatter_version INTEGER,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS career_advice_user_created_idx ON career_advice (user_id, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS learning_roadmaps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    career_goal TEXT,
+    current_level TEXT,
+    timeframe TEXT,
+    roadmap_data TEXT,
+    html_compressed TEXT,
+    formatter_version INTEGER,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS learning_roadmaps_user_created_idx
+    ON learning_roadmaps (user_id, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    token_hash TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    last_used_at TEXT,
+    revoked_at TEXT
+);
+CREATE INDEX IF NOT EXISTS refresh_tokens_user_idx ON refresh_tokens (user_id);
+CREATE INDEX IF NOT EXISTS refresh_tokens_revoked_idx ON refresh_tokens (revoked_at) WHERE revoked_at IS NOT NULL;
+"""
+
+_COMPARISONS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+_IS_VALUES = {'null': 'NULL', 'true': 'TRUE', 'false': 'FALSE'}
+_LOGIC_GROUP = re.compile(r'^(and|or)\((.*)\)$', re.DOTALL)
+
+
+class StorageError(Exception):
+    """A query the engine cannot run: unknown table or column, unsupported operator or function"""
+
+
+def function_missing(error):
+    """True when an RPC failed because the database function is not there, rather than for a transient reason"""
+    # PostgREST's "not in the schema cache", Postgres' undefined_function, or an engine without functions
+    return isinstance(error, StorageError) or getattr(error, 'code', None) in ('PGRST202', '42883')
+
+
+class QueryResult:
+    """What execute() returns: the rows, and the total for count='exact' (like postgrest's APIResponse)"""
+    __slots__ = ('data', 'count')
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _split_top_level(text):
+    """Split a PostgREST logic tree body on the commas that are not inside parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quoted and char == '\\':
+            current.append(text[index:index + 2])
+            index += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            index += 1
+            continue
+        current.append(char)
+        index += 1
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+def _adapt(value):
+    # Structured values go into TEXT columns as JSON, the way PostgREST would hand them to a json column
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+class _SQLiteQuery:
+    """One builder chain against SQLiteStorage; filters and modifiers return the builder"""
+
+    def __init__(self, storage, table):
+        self._storage = storage
+        self._table = table
+        self._columns = storage.columns(table)
+        self._action = 'select'
+        self._select = '*'
+        self._count = None
+        self._head = False
+        self._values = None
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+
+    def _column(self, name):
+        name = name.strip()
+        if name not in self._columns:
+            raise StorageError(f'Unknown column {self._table}.{name}')
+        return f'"{name}"'
+
+    def select(self, *columns, count=None, head=False):
+        text = ','.join(columns) or '*'
+        if text.strip() != '*':
+            self._select = ', '.join(self._column(column) for column in text.split(',') if column.strip())
+        self._count = count
+        self._head = bool(head)
+        return self
+
+    def insert(self, rows, **_options):
+        self._action = 'insert'
+        self._values = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values, **_options):
+        self._action = 'update'
+        self._values = values
+        return self
+
+    def delete(self, **_options):
+        self._action = 'delete'
+        return self
+
+    def _filter(self, sql, params=()):
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def _comparison(self, column, op, value):
+        return f'{self._column(column)} {_COMPARISONS[op]} ?', [_adapt(value)]
+
+    def _membership(self, column, values):
+        values = list(values)
+        if not values:
+            return '0', []
+        return f'{self._column(column)} IN ({", ".join("?" * len(values))})', [_adapt(v) for v in values]
+
+    def _null_test(self, column, value):
+        keyword = _IS_VALUES.get('null' if value is None else str(value).lower())
+        if keyword is None:
+            raise StorageError(f'Unsupported is value: {value}')
+        return f'{self._column(column)} IS {keyword}', []
+
+    def eq(self, column, value):
+        return self._filter(*self._comparison(column, 'eq', value))
+
+    def neq(self, column, value):
+        return self._filter(*self._comparison(column, 'neq', value))
+
+    def gt(self, column, value):
+        return self._filter(*self._comparison(column, 'gt', value))
+
+    def gte(self, column, value):
+        return self._filter(*self._comparison(column, 'gte', value))
+
+    def lt(self, column, value):
+        return self._filter(*self._comparison(column, 'lt', value))
+
+    def lte(self, column, value):
+        return self._filter(*self._comparison(column, 'lte', value))
+
+    def in_(self, column, values):
+        return self._filter(*self._membership(column, values))
+
+    def is_(self, column, value):
+        return self._filter(*self._null_test(column, value))
+
+    def or_(self, filters):
+        sql, params = self._logic('OR', filters)
+        # Parenthesized, since the filters are joined with AND, which binds tighter than OR
+        return self._filter(f'({sql})', params)
+
+    def _logic(self, joiner, body):
+        """SQL for a PostgREST logic tree body such as 'a.lt.1,and(a.eq.1,b.lt.2)'"""
+        parts, params = [], []
+        for item in _split_top_level(body):
+            item = item.strip()
+            group = _LOGIC_GROUP.match(item)
+            if group:
+                sql, values = self._logic(group.group(1).upper(), group.group(2))
+            else:
+                column, op, raw = (item.split('.', 2) + ['', ''])[:3]
+                if op == 'in':
+                    sql, values = self._membership(column, [_unquote(v) for v in _split_top_level(raw.strip('()'))])
+                elif op == 'is':
+                    sql, values = self._null_test(column, raw)
+                elif op in _COMPARISONS:
+                    sql, values = self._comparison(column, op, _unquote(raw))
+                else:
+                    raise StorageError(f'Unsupported operator: {op}')
+            parts.append(f'({sql})')
+            params.extend(values)
+        return f' {joiner} '.join(parts), params
+
+    def order(self, column, desc=False, **_options):
+        self._order.append(f'{self._column(column)} {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, size, **_options):
+        self._limit = int(size)
+        return self
+
+    def execute(self):
+        where = ' AND '.join(self._where) or '1'
+        table = f'"{self._table}"'
+        with self._storage.connection() as conn:
+            if self._action == 'select':
+                count = None
+                if self._count:
+                    count = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', self._params).fetchone()[0]
+                if self._head:
+                    return QueryResult([], count)
+                sql = f'SELECT {self._select} FROM {table} WHERE {where}'
+                if self._order:
+                    sql += ' ORDER BY ' + ', '.join(self._order)
+                if self._limit is not None:
+                    sql += f' LIMIT {self._limit}'
+                return QueryResult([dict(row) for row in conn.execute(sql, self._params)], count)
+
+            if self._action == 'insert':
+                inserted = []
+                # Row by row inside one transaction, so the returned rows keep the order they were sent in
+                with self._storage.transaction(conn):
+                    for row in self._values:
+                        columns = [self._column(column) for column in row]
+                        if columns:
+                            sql = f'INSERT INTO {table} ({", ".join(columns)}) ' \
+                                  f'VALUES ({", ".join("?" * len(columns))}) RETURNING *'
+                        else:
+                            sql = f'INSERT INTO {table} DEFAULT VALUES RETURNING *'
+                        inserted.append(dict(conn.execute(sql, [_adapt(v) for v in row.values()]).fetchone()))
+                return QueryResult(inserted)
+
+            # Like PostgREST, refuse a table-wide write
+            if not self._where:
+                raise StorageError(f'{self._action} on {self._table} needs a filter')
+            if self._action == 'update':
+                assignments = ', '.join(f'{self._column(column)} = ?' for column in self._values)
+                sql = f'UPDATE {table} SET {assignments} WHERE {where} RETURNING *'
+                params = [_adapt(v) for v in self._values.values()] + self._params
+            else:
+                sql = f'DELETE FROM {table} WHERE {where} RETURNING *'
+                params = self._params
+            return QueryResult([dict(row) for row in conn.execute(sql, params).fetchall()])
+
+
+class SQLiteStorage:
+    """Embedded engine running the app's query-builder chains against a local SQLite database.
+
+    Supports the subset of the PostgREST builder the app uses: select with
+    a column list and count='exact'/head, insert/update/delete returning
+    the affected rows, eq/neq/gt/gte/lt/lte/in_/is_ filters, or_ logic
+    trees, order and limit. Database functions (rpc) are not available, so
+    callers take their fallback paths. A file database runs in WAL mode with
+    one connection per thread and process, so gunicorn workers can share it;
+    ':memory:' is private to this process, like JobQueue's.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.memory = path == ':memory:'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queries = 0
+        # An in-memory database exists only on its one connection, which the threads take turns on
+        self._memory_conn = self._open() if self.memory else None
+        self._memory_lock = threading.RLock()
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            self._columns = {table: frozenset(row[1] for row in conn.execute(f'PRAGMA table_info("{table}")'))
+                             for table in tables if not table.startswith('sqlite_')}
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=not self.memory)
+        conn.row_factory = sqlite3.Row
+        if not self.memory:
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Durable at every checkpoint; a power cut can lose only the last transactions, never corrupt
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            self._queries += 1
+        if self.memory:
+            with self._memory_lock:
+                yield self._memory_conn
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = self._open()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        yield conn
+
+    @staticmethod
+    @contextmanager
+    def transaction(conn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def columns(self, table):
+        try:
+            return self._columns[table]
+        except KeyError:
+            raise StorageError(f'Unknown table {table}') from None
+
+    def table(self, name):
+        return _SQLiteQuery(self, name)
+
+    def rpc(self, name, params=None):
+        raise StorageError(f'Database function {name} is not available in the SQLite engine')
+
+    def stats(self):
+        with self._lock:
+            return {'engine': 'sqlite', 'path': self.path, 'queries': self._queries}
+
+
+# Cached tables and the column naming the user a row belongs to
+CACHED_TABLES = {'users': 'id', 'tasks': 'user_id', 'career_advice': 'user_id', 'learning_roadmaps': 'user_id'}
+_WRITE_ACTIONS = ('insert', 'update', 'delete', 'upsert')
+
+
+class _CachedQuery:
+    """Records a builder chain while forwarding it, so execute() knows the user, the action and a cache key"""
+
+    def __init__(self, cache, query, table):
+        self._cache = cache
+        self._query = query
+        self._table = table
+        self._key_column = CACHED_TABLES.get(table)
+        self._calls = []
+        self._action = 'select'
+        self._user = None
+        self._rows = ()
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def call(*args, **kwargs):
+            if name in _WRITE_ACTIONS:
+                self._action = name
+                if name in ('insert', 'upsert'):
+                    self._rows = args[0] if isinstance(args[0], list) else [args[0]]
+            elif name == 'eq' and args[0] == self._key_column:
+                self._user = str(args[1])
+            self._calls.append((name, args, sorted(kwargs.items())))
+            self._query = method(*args, **kwargs)
+            return self
+
+        return call
+
+    def execute(self):
+        if self._key_column is None:
+            return self._query.execute()
+        if self._action == 'select':
+            if self._user is None:
+                return self._query.execute()
+            key = repr(self._calls)
+            result = self._cache.get(self._user, self._table, key)
+            if result is None:
+                marker = self._cache.begin_read(self._user, self._table)
+                try:
+                    result = self._query.execute()
+                finally:
+                    self._cache.end_read(self._user, self._table, marker)
+                self._cache.set(self._user, self._table, key, result, marker)
+            # Callers own the rows they get back; the cached copies stay untouched
+            return QueryResult([dict(row) for row in result.data], result.count)
+
+        result = self._query.execute()
+        users = {self._user} if self._user is not None else set()
+        for row in list(self._rows) + list(result.data or []):
+            if isinstance(row, dict) and row.get(self._key_column) is not None:
+                users.add(str(row[self._key_column]))
+        if users:
+            for user in users:
+                self._cache.invalidate(user, self._table)
+        else:
+            self._cache.invalidate_table(self._table)
+        return result
+
+
+class CachedStorage:
+    """Per-user read cache in front of a storage engine.
+
+    Reads of the users, tasks, career_advice and learning_roadmaps tables
+    filtered to one user (`eq('user_id', ...)`, or `eq('id', ...)` for
+    users) are kept for `ttl` seconds, keyed by the whole builder chain, so
+    a hot user's dashboard, history and profile reads are answered from
+    memory. Every write through this process drops the written users'
+    entries for that table before returning, so a client always reads its
+    own writes; writes made by other workers show up within `ttl`. A read
+    that was in flight when such a write landed may hold the rows from
+    before it, so its result is returned but not cached. At most
+    `max_users` users are cached, least recently used first out.
+    """
+
+    def __init__(self, engine, ttl=30, max_users=10000):
+        self.engine = engine
+        self.ttl = ttl
+        self.max_users = max_users
+        # user -> {table -> {builder chain -> (expires at, result)}}
+        self._users = OrderedDict()
+        # (user, table) -> [in-flight read marker]; a write to that user and table marks them stale
+        self._reading = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'stale_reads': 0}
+
+    def table(self, name):
+        return _CachedQuery(self, self.engine.table(name), name)
+
+    def rpc(self, *args, **kwargs):
+        return self.engine.rpc(*args, **kwargs)
+
+    def get(self, user, table, key):
+        with self._lock:
+            entry = self._users.get(user, {}).get(table, {}).get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._counters['misses'] += 1
+                return None
+            self._users.move_to_end(user)
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def begin_read(self, user, table):
+        """Register a read about to go to the engine; pass the marker to end_read() and set()"""
+        marker = {'stale': False}
+        with self._lock:
+            self._reading.setdefault((user, table), []).append(marker)
+        return marker
+
+    def end_read(self, user, table, marker):
+        with self._lock:
+            markers = self._reading[(user, table)]
+            markers.remove(marker)
+            if not markers:
+                del self._reading[(user, table)]
+
+    def _mark_stale(self, match):
+        for (user, table), markers in self._reading.items():
+            if match(user, table):
+                for marker in markers:
+                    marker['stale'] = True
+
+    def set(self, user, table, key, result, marker=None):
+        with self._lock:
+            if marker is not None and marker['stale']:
+                # A write landed while this read ran, so the rows may predate it
+                self._counters['stale_reads'] += 1
+                return
+            tables = self._users.setdefault(user, {})
+            tables.setdefault(table, {})[key] = (time.monotonic() + self.ttl, result)
+            self._users.move_to_end(user)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user, table=None):
+        user = str(user)
+        with self._lock:
+            self._mark_stale(lambda reading_user, reading_table:
+                             reading_user == user and (table is None or reading_table == table))
+            tables = self._users.get(user)
+            if tables is None:
+                return
+            if table is None:
+                del self._users[user]
+            else:
+                tables.pop(table, None)
+            self._counters['invalidations'] += 1
+
+    def invalidate_table(self, table):
+        with self._lock:
+            self._mark_stale(lambda _, reading_table: reading_table == table)
+            for tables in self._users.values():
+                tables.pop(table, None)
+            self._counters['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['users'] = len(self._users)
+        stats['ttl'] = self.ttl
+        stats['max_users'] = self.max_users
+        engine_stats = getattr(self.engine, 'stats', None)
+        stats['engine'] = engine_stats() if engine_stats is not None else {'engine': 'supabase'}
+        return stats
+
+
+class _AsyncQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def call(*args, **kwargs):
+            self._query = method(*args, **kwargs)
+            return self
+
+        return call
+
+    async def execute(self):
+        return await asyncio.to_thread(self._query.execute)
+
+
+class AsyncStorage:
+    """Awaitable `execute()` over a synchronous engine for the ASGI routes; queries run on worker threads.
+
+    `client_getter` is called per query, so a client replaced after fork is picked up.
+    """
+
+    def __init__(self, client_getter):
+        self._client_getter = client_getter
+
+    def table(self, name):
+        return _AsyncQuery(self._client_getter().table(name))
+
+    def rpc(self, *args, **kwargs):
+        return _AsyncQuery(self._client_getter().rpc(*args, **kwargs))
@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+TASK_FIELDS = ('id', 'user_id', 'title', 'description', 'due_date', 'due_time', 'priority', 'status',
+               'created_at', 'updated_at')
+MAX_PAGE_SIZE = 200
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the (created_at, id) position of a row"""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(created_at), int(task_id)
+    except Exception:
+        raise InvalidQuery('Invalid cursor')
+
+
+def _quote(value):
+    # PostgREST logic trees need values with reserved characters (":", ",", ".") quoted
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def parse_fields(fields, paginated):
+    """Validate a `fields=` projection; keyset pagination needs id and created_at in every row"""
+    if not fields:
+        return '*'
+    selected = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in selected if f not in TASK_FIELDS]
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(unknown)}")
+    if paginated:
+        selected += [f for f in ('created_at', 'id') if f not in selected]
+    return ', '.join(selected)
+
+
+def parse_limit(limit):
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidQuery('limit must be an integer')
+    if limit < 1:
+        raise InvalidQuery('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def apply_task_filters(query, args):
+    """Push status/priority/due-range filters from the query string into the PostgREST query"""
+    for column in ('status', 'priority'):
+        if args.get(column):
+            values = [v.strip() for v in args[column].split(',') if v.strip()]
+            query = query.eq(column, values[0]) if len(values) == 1 else query.in_(column, values)
+    if args.get('due_from'):
+        query = query.gte('due_date', args['due_from'])
+    if args.get('due_to'):
+        query = query.lte('due_date', args['due_to'])
+    return query
+
+
+def apply_keyset(query, cursor):
+    """Continue a created_at DESC, id DESC listing after the row the cursor points at"""
+    created_at, task_id = decode_cursor(cursor)
+    return query.or_(f"created_at.lt.{_quote(created_at)},"
+                     f"and(created_at.eq.{_quote(created_at)},id.lt.{task_id})")
+
+
+def last_modified(rows):
+    """Most recent created_at/updated_at among the rows, for the Last-Modified header"""
+    latest = None
+    for row in rows:
+        stamp = row.get('updated_at') or row.get('created_at')
+        if not stamp:
+            continue
+        try:
+            moment = datetime.fromisoformat(str(stamp).replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        # Naive timestamps are written by this app in server local time
+        moment = moment.astimezone(timezone.utc)
+        if latest is None or moment > latest:
+            latest = moment
+    return latest
+
+
+# Delta sync: cursors are server timestamps, rewound by SYNC_OVERLAP so writes that were
+# still committing when a cursor was issued are delivered again rather than skipped.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def encode_sync_cursor(moment):
+    raw = (moment - SYNC_OVERLAP).isoformat().encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment = datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise InvalidQuery('Invalid cursor')
+    if moment.tzinfo is None:
+        raise InvalidQuery('Invalid cursor')
+    return moment
@@ -0,0 +1,156 @@
+"""MarkdownRenderer and IncrementalFormatter (formatter.py).
+
+Each test renders a small markdown snippet and checks the exact HTML, and
+the streaming tests check that IncrementalFormatter, fed the same text in
+chunks of any size, produces what format_ai_response_with_tables does.
+
+    pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatter import IncrementalFormatter, format_ai_response_with_tables  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'corpus')
+
+MIXED = """# Plan
+Intro with **bold** and `code`.
+
+| Week | Focus |
+|:-----|------:|
+| 1 | **Python** |
+| 2 | `pandas` |
+**Milestones:**
+- Learn basics
+  - Variables
+  - Loops
+    1. for
+    2. while
+- Build a project
+---
+1. First
+2. Second
+Done."""
+
+
+def render(text):
+    return format_ai_response_with_tables(text)
+
+
+def stream(text, chunk_size):
+    formatter = IncrementalFormatter()
+    parts = [formatter.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    parts.append(formatter.close())
+    return ''.join(parts)
+
+
+@pytest.mark.parametrize('markdown, html', [
+    ('# Title', '<h2>Title</h2>\n'),
+    ('## Section ##', '<h3>Section</h3>\n'),
+    ('###Tight', '<h4>Tight</h4>\n'),
+    ('##### Deep', '<h5>Deep</h5>\n'),
+    ('###### Deeper', '<h5>Deeper</h5>\n'),
+    ('**Next steps**', '<h4>Next steps</h4>\n'),
+    ('**Next steps:**', '<h4>Next steps:</h4>\n'),
+])
+def test_headers(markdown, html):
+    assert render(markdown) == html
+
+
+def test_inline_bold_and_code():
+    assert render('Use **pandas** with `df.head()`') == \
+        '<p>Use <strong>pandas</strong> with <code>df.head()</code></p>\n'
+    assert render('# The **key** `idea`') == '<h2>The <strong>key</strong> <code>idea</code></h2>\n'
+
+
+def test_paragraphs_are_stripped_and_blank_lines_dropped():
+    assert render('  one  \n\n\ntwo') == '<p>one</p>\n<p>two</p>\n'
+
+
+@pytest.mark.parametrize('markdown', ['---', '***', '_____'])
+def test_horizontal_rules(markdown):
+    assert render(f'above\n{markdown}\nbelow') == '<p>above</p>\n<hr>\n<p>below</p>\n'
+
+
+def test_bold_line_and_dash_line_are_not_list_items():
+    assert render('**not a bullet** here') == '<p><strong>not a bullet</strong> here</p>\n'
+    assert render('-not a bullet') == '<p>-not a bullet</p>\n'
+
+
+def test_flat_lists():
+    assert render('- a\n* b\n+ c') == '<ul class="ai-list">\n<li>a</li>\n<li>b</li>\n<li>c</li></ul>\n'
+    assert render('1. a\n2) b') == '<ol class="ai-list">\n<li>a</li>\n<li>b</li></ol>\n'
+
+
+def test_nested_lists():
+    markdown = '- a\n  - b\n    1. c\n  - d\n- e'
+    assert render(markdown) == (
+        '<ul class="ai-list">\n<li>a'
+        '<ul class="ai-list">\n<li>b'
+        '<ol class="ai-list">\n<li>c'
+        '</li></ol>\n</li>\n<li>d'
+        '</li></ul>\n</li>\n<li>e'
+        '</li></ul>\n'
+    )
+
+
+def test_switching_list_type_at_the_same_depth_starts_a_new_list():
+    assert render('- a\n1. b') == '<ul class="ai-list">\n<li>a</li></ul>\n<ol class="ai-list">\n<li>b</li></ol>\n'
+
+
+def test_paragraph_and_blank_line_close_lists():
+    assert render('- a\n  - b\nafter') == \
+        '<ul class="ai-list">\n<li>a<ul class="ai-list">\n<li>b</li></ul>\n</li></ul>\n<p>after</p>\n'
+    assert render('- a\n\n- b') == \
+        '<ul class="ai-list">\n<li>a</li></ul>\n<ul class="ai-list">\n<li>b</li></ul>\n'
+
+
+def test_table_header_separator_and_rows():
+    markdown = '| Week | Focus |\n| :--- | ---: |\n| 1 | **SQL** |\n| 2 | `git` |'
+    assert render(markdown) == (
+        '<table class="ai-table"><thead><tr><th>Week</th><th>Focus</th></tr></thead><tbody>\n'
+        '<tr><td>1</td><td><strong>SQL</strong></td></tr>\n'
+        '<tr><td>2</td><td><code>git</code></td></tr>\n'
+        '</tbody></table>\n'
+    )
+
+
+def test_table_is_closed_by_the_next_block():
+    assert render('| a |\n| 1 |\n# Next') == (
+        '<table class="ai-table"><thead><tr><th>a</th></tr></thead><tbody>\n'
+        '<tr><td>1</td></tr>\n</tbody></table>\n<h2>Next</h2>\n'
+    )
+
+
+def test_table_closes_an_open_list():
+    assert render('- a\n| h |') == \
+        '<ul class="ai-list">\n<li>a</li></ul>\n<table class="ai-table"><thead><tr><th>h</th></tr></thead><tbody>\n' \
+        '</tbody></table>\n'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 12, 64, 10000])
+def test_streamed_output_equals_whole_render(chunk_size):
+    assert stream(MIXED, chunk_size) == render(MIXED)
+    assert stream(MIXED + '\n', chunk_size) == render(MIXED + '\n')
+
+
+@pytest.mark.parametrize('name', sorted(name for name in os.listdir(CORPUS_DIR) if name.endswith('.md')))
+def test_streamed_corpus_equals_whole_render(name):
+    with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+        text = f.read()
+    whole = render(text)
+    for chunk_size in (1, 5, 12, 100):
+        assert stream(text, chunk_size) == whole
+
+
+def test_incremental_formatter_flushes_completed_lines():
+    formatter = IncrementalFormatter()
+    assert formatter.feed('# Ti') == ''
+    assert formatter.feed('tle\n- item') == '<h2>Title</h2>\n'
+    assert formatter.feed(' one\n- item two\n') == '<ul class="ai-list">\n<li>item one</li>\n<li>item two'
+    assert formatter.close() == '</li></ul>\n'
+    assert formatter.close() == ''
@@ -0,0 +1,201 @@
+"""SQLiteStorage's translation of the Supabase query builder to SQL, and CachedStorage (storage.py).
+
+Each test runs a builder chain against an in-memory database seeded with a
+few tasks and checks the rows PostgREST would have returned for it.
+
+    pytest tests
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CachedStorage, SQLiteStorage, StorageError  # noqa: E402
+
+TASKS = [
+    {'user_id': 1, 'title': 'Essay', 'priority': 'high', 'status': 'pending', 'due_date': '2026-01-10'},
+    {'user_id': 1, 'title': 'Lab, part 2', 'priority': 'medium', 'status': 'pending', 'due_date': '2026-01-20'},
+    {'user_id': 1, 'title': 'Reading', 'priority': 'low', 'status': 'completed', 'due_date': '2026-01-05'},
+    {'user_id': 1, 'title': 'Revision', 'priority': 'high', 'status': 'pending', 'due_date': None},
+    {'user_id': 2, 'title': 'Project', 'priority': 'high', 'status': 'pending', 'due_date': '2026-01-15'},
+]
+
+
+@pytest.fixture
+def engine():
+    engine = SQLiteStorage()
+    engine.table('tasks').insert(TASKS).execute()
+    return engine
+
+
+def titles(response):
+    return [row['title'] for row in response.data]
+
+
+def test_insert_returns_rows_in_order(engine):
+    response = engine.table('tasks').insert([{'user_id': 3, 'title': 'b'}, {'user_id': 3, 'title': 'a'}]).execute()
+    assert titles(response) == ['b', 'a']
+    assert response.data[0]['id'] < response.data[1]['id']
+
+
+def test_eq_and_neq(engine):
+    response = engine.table('tasks').select('*').eq('user_id', 1).neq('status', 'completed').order('id').execute()
+    assert titles(response) == ['Essay', 'Lab, part 2', 'Revision']
+
+
+def test_range(engine):
+    response = (engine.table('tasks').select('title').gte('due_date', '2026-01-10').lt('due_date', '2026-01-20')
+                .order('due_date').execute())
+    assert titles(response) == ['Essay', 'Project']
+    response = engine.table('tasks').select('title').gt('due_date', '2026-01-10').lte('due_date', '2026-01-20') \
+        .order('due_date').execute()
+    assert titles(response) == ['Project', 'Lab, part 2']
+
+
+def test_in(engine):
+    response = engine.table('tasks').select('title').in_('priority', ['low', 'medium']).order('id').execute()
+    assert titles(response) == ['Lab, part 2', 'Reading']
+
+
+def test_in_empty_matches_nothing(engine):
+    assert engine.table('tasks').select('*').in_('id', []).execute().data == []
+
+
+def test_is_null(engine):
+    assert titles(engine.table('tasks').select('title').is_('due_date', 'null').execute()) == ['Revision']
+    assert titles(engine.table('tasks').select('title').is_('due_date', None).execute()) == ['Revision']
+
+
+def test_or(engine):
+    response = engine.table('tasks').select('title').eq('user_id', 1) \
+        .or_('status.eq.completed,due_date.is.null').order('id').execute()
+    assert titles(response) == ['Reading', 'Revision']
+
+
+def test_or_nested_and_in(engine):
+    response = engine.table('tasks').select('title') \
+        .or_('priority.in.(low,medium),and(priority.eq.high,due_date.lt.2026-01-12)').order('id').execute()
+    assert titles(response) == ['Essay', 'Lab, part 2', 'Reading']
+
+
+def test_or_quoted_value_with_comma(engine):
+    response = engine.table('tasks').select('title').or_('title.eq."Lab, part 2",title.eq.Essay').order('id').execute()
+    assert titles(response) == ['Essay', 'Lab, part 2']
+
+
+def test_or_is_anded_with_other_filters(engine):
+    response = engine.table('tasks').select('title').eq('user_id', 2).or_('priority.eq.high,priority.eq.low') \
+        .execute()
+    assert titles(response) == ['Project']
+
+
+def test_order_and_limit(engine):
+    response = engine.table('tasks').select('title').order('priority').order('id', desc=True).limit(3).execute()
+    assert titles(response) == ['Project', 'Revision', 'Essay']
+
+
+def test_select_columns(engine):
+    row = engine.table('tasks').select('id, title').eq('title', 'Essay').execute().data[0]
+    assert set(row) == {'id', 'title'}
+
+
+def test_count(engine):
+    response = engine.table('tasks').select('id', count='exact').eq('status', 'pending').limit(1).execute()
+    assert response.count == 4
+    assert len(response.data) == 1
+
+
+def test_count_head(engine):
+    response = engine.table('tasks').select('id', count='exact', head=True).eq('user_id', 1).execute()
+    assert response.count == 4
+    assert response.data == []
+
+
+def test_update_and_delete_return_affected_rows(engine):
+    response = engine.table('tasks').update({'status': 'completed'}).eq('user_id', 2).execute()
+    assert [(row['title'], row['status']) for row in response.data] == [('Project', 'completed')]
+    response = engine.table('tasks').delete().eq('status', 'completed').execute()
+    assert sorted(titles(response)) == ['Project', 'Reading']
+    assert engine.table('tasks').select('id', count='exact', head=True).execute().count == 3
+
+
+def test_structured_values_are_stored_as_json(engine):
+    row = engine.table('tasks').insert({'user_id': 3, 'description': {'steps': [1, 2]}}).execute().data[0]
+    assert row['description'] == '{"steps": [1, 2]}'
+
+
+def test_table_wide_writes_are_refused(engine):
+    with pytest.raises(StorageError):
+        engine.table('tasks').update({'status': 'completed'}).execute()
+    with pytest.raises(StorageError):
+        engine.table('tasks').delete().execute()
+
+
+@pytest.mark.parametrize('build', [
+    lambda query: query.select('id, password'),
+    lambda query: query.select('*').eq('owner', 1),
+    lambda query: query.select('*').order('id; DROP TABLE tasks'),
+    lambda query: query.select('*').in_('"id"', [1]),
+    lambda query: query.select('*').or_('id.eq.1,secret.eq.2'),
+    lambda query: query.update({'user_id = 2, title': 'x'}).eq('id', 1),
+    lambda query: query.insert({'title': 'x', 'is_admin': True}),
+], ids=['select', 'eq', 'order', 'in', 'or', 'update', 'insert'])
+def test_unknown_columns_are_rejected(engine, build):
+    with pytest.raises(StorageError, match='Unknown column'):
+        build(engine.table('tasks')).execute()
+    assert engine.table('tasks').select('id', count='exact', head=True).execute().count == len(TASKS)
+
+
+def test_unsupported_operators_are_rejected(engine):
+    with pytest.raises(StorageError, match='Unsupported operator'):
+        engine.table('tasks').select('*').or_('title.like.E*,id.eq.1').execute()
+    with pytest.raises(StorageError, match='Unsupported is value'):
+        engine.table('tasks').select('*').is_('due_date', 'unknown').execute()
+
+
+def test_unknown_table_is_rejected(engine):
+    with pytest.raises(StorageError, match='Unknown table'):
+        engine.table('sqlite_master')
+
+
+def test_cache_serves_repeat_reads_and_drops_them_on_write(engine):
+    cache = CachedStorage(engine, ttl=60)
+    assert titles(cache.table('tasks').select('title').eq('user_id', 2).execute()) == ['Project']
+    assert titles(cache.table('tasks').select('title').eq('user_id', 2).execute()) == ['Project']
+    assert cache.stats()['hits'] == 1
+    cache.table('tasks').update({'title': 'Thesis'}).eq('user_id', 2).execute()
+    assert titles(cache.table('tasks').select('title').eq('user_id', 2).execute()) == ['Thesis']
+
+
+def test_cache_skips_a_read_that_raced_a_write(engine):
+    """A read that ran before a write but finishes after it must not cache the rows from before the write"""
+    read_done, release = threading.Event(), threading.Event()
+
+    class SlowReads:
+        def table(self, name):
+            query = engine.table(name)
+            execute = query.execute
+
+            def slow_execute():
+                result = execute()
+                if query._action == 'select' and not release.is_set():
+                    read_done.set()
+                    release.wait(5)
+                return result
+
+            query.execute = slow_execute
+            return query
+
+    cache = CachedStorage(SlowReads(), ttl=60)
+    reader = threading.Thread(target=lambda: cache.table('tasks').select('title').eq('user_id', 2).execute())
+    reader.start()
+    assert read_done.wait(5)
+    cache.table('tasks').update({'title': 'Thesis'}).eq('user_id', 2).execute()
+    release.set()
+    reader.join(5)
+
+    assert titles(cache.table('tasks').select('title').eq('user_id', 2).execute()) == ['Thesis']
+    assert cache.stats()['stale_reads'] == 1
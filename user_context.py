@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+PROFILE_FIELDS = "id, name, email, education_level, academic_year, school_grade, field_of_study, institution_name"
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT claims keyed on the token's SHA-256.
+
+    Entries are dropped once the token's `exp` passes, so a cached token is
+    never accepted for longer than jwt.decode itself would accept it.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None:
+                exp = claims.get('exp')
+                if exp is not None and exp <= time.time():
+                    del self._entries[key]
+                    claims = None
+                else:
+                    self._entries.move_to_end(key)
+            if claims is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return claims
+
+    def set(self, token, claims):
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class ProfileCache:
+    """Short-TTL cache of user profile rows, invalidated when the profile is updated.
+
+    Each worker has its own copy, so the TTL bounds how long another worker
+    can serve a profile that was changed elsewhere.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, profile):
+        with self._lock:
+            self._entries[user_id] = (profile, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
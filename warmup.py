@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+
+class Warmup:
+    """Named startup steps run once per worker process before it takes traffic.
+
+    Steps are registered with the `step` decorator and run in order by
+    `run()`; each one is timed and a failing step is logged and recorded
+    without stopping the others, since a worker that could not pre-open a
+    connection can still open it on its first request. `run()` is a no-op
+    once it has completed in the current process, so the gunicorn hook and
+    the ASGI lifespan can both call it.
+    """
+
+    def __init__(self):
+        self._steps = []
+        self._lock = threading.Lock()
+        self._pid = None
+        self.report = None
+
+    def step(self, name):
+        def register(fn):
+            self._steps.append((name, fn))
+            return fn
+        return register
+
+    @property
+    def done(self):
+        return self._pid == os.getpid()
+
+    def run(self):
+        with self._lock:
+            if self.done:
+                return self.report
+            started = time.perf_counter()
+            report = {}
+            for name, fn in self._steps:
+                step_started = time.perf_counter()
+                try:
+                    fn()
+                    report[name] = {'ok': True}
+                except Exception as e:
+                    report[name] = {'ok': False, 'error': str(e)}
+                    print(f"Warmup step {name} failed: {e}")
+                report[name]['ms'] = round((time.perf_counter() - step_started) * 1000, 1)
+            total = round((time.perf_counter() - started) * 1000, 1)
+            print(f"Worker {os.getpid()} warmed up in {total}ms")
+            self.report = {'ms': total, 'steps': report}
+            self._pid = os.getpid()
+            return self.report
+
+    def stats(self):
+        return {'done': self.done, 'report': self.report if self.done else None}
+
+
+class ReadinessCheck:
+    """Dependency checks behind the readiness probe.
+
+    Each check raises (or returns a reason string) when its dependency is not
+    usable. Results are cached for `ttl` seconds per process, so a probe
+    every second or two does not turn into a query per probe per worker.
+    """
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._checks = []
+        self._lock = threading.Lock()
+        self._cached = None
+        self._checked_at = 0.0
+        self._pid = None
+
+    def check(self, name):
+        def register(fn):
+            self._checks.append((name, fn))
+            return fn
+        return register
+
+    def run(self):
+        """(ready, {check name: 'ok' or reason})"""
+        now = time.monotonic()
+        with self._lock:
+            if self._pid == os.getpid() and now - self._checked_at < self.ttl:
+                return self._cached
+        results = {}
+        for name, fn in self._checks:
+            try:
+                results[name] = fn() or 'ok'
+            except Exception as e:
+                results[name] = str(e) or type(e).__name__
+        result = (all(value == 'ok' for value in results.values()), results)
+        with self._lock:
+            self._cached, self._checked_at, self._pid = result, now, os.getpid()
+        return result